@@ -1,38 +1,14 @@
 import argparse
-import os
 import datetime
+import os
 from dotenv import load_dotenv
-from dateutil import parser
 
-from src.calendar_client import CalendarClient
-from src.clockify_client import ClockifyClient
-from src.ai_matcher import AIMatcher
-from src.github_client import get_issues
+from src.daemon import Daemon
+from src.sync import SyncSession, get_time_window, load_config
 
 # Load environment variables
 load_dotenv(override=True)
 
-# ANSI Colors
-CYAN = "\033[96m"
-GREEN = "\033[92m"
-YELLOW = "\033[93m"
-RESET = "\033[0m"
-BOLD = "\033[1m"
-
-
-def resolve_names(projects, project_id, task_id):
-    p_name = "Unknown"
-    t_name = "Unknown"
-    for p in projects:
-        if p["id"] == project_id:
-            p_name = p["name"]
-            for t in p["tasks"]:
-                if t["id"] == task_id:
-                    t_name = t["name"]
-                    break
-            break
-    return p_name, t_name
-
 
 def main():
     arg_parser = argparse.ArgumentParser(
@@ -47,325 +23,151 @@ def main():
     arg_parser.add_argument(
         "--today", action="store_true", help="Sync only today (since 00:00 UTC)"
     )
-    args = arg_parser.parse_args()
-
-    # Configuration
-    CLOCKIFY_API_KEY = os.getenv("CLOCKIFY_API_KEY")
-    CLOCKIFY_WORKSPACE_ID = os.getenv("CLOCKIFY_WORKSPACE_ID")
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-    SERVICE_ACCOUNT_FILE = os.getenv(
-        "GOOGLE_SERVICE_ACCOUNT_FILE", "service_account.json"
+    arg_parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running, re-syncing on an interval and on incoming webhooks",
     )
-    CALENDAR_ID = os.getenv("GOOGLE_CALENDAR_ID", "primary")
-    TARGET_PROJECT_NAME = os.getenv("CLOCKIFY_PROJECT_NAME")
-
-    if not all([CLOCKIFY_API_KEY, CLOCKIFY_WORKSPACE_ID, OPENAI_API_KEY]):
+    arg_parser.add_argument(
+        "--interval",
+        type=int,
+        default=int(os.getenv("DAEMON_INTERVAL", 900)),
+        help="Seconds between scheduled syncs in daemon mode (default: 900)",
+    )
+    arg_parser.add_argument(
+        "--host",
+        default=os.getenv("DAEMON_HOST", "127.0.0.1"),
+        help="Address the daemon webhook server binds to (default: 127.0.0.1). "
+        "On other addresses, webhooks need CALENDAR_CHANNEL_TOKEN and "
+        "GITHUB_WEBHOOK_SECRET",
+    )
+    arg_parser.add_argument(
+        "--port",
+        type=int,
+        default=int(os.getenv("DAEMON_PORT", 8080)),
+        help="Port of the daemon webhook server (default: 8080)",
+    )
+    arg_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Only replay journaled entries that were never confirmed by Clockify",
+    )
+    arg_parser.add_argument(
+        "--plan",
+        metavar="FILE",
+        help="Match items and write them to a plan file instead of Clockify",
+    )
+    arg_parser.add_argument(
+        "--apply",
+        metavar="FILE",
+        help="Create the time entries of a plan file (no calendar, GitHub or AI calls)",
+    )
+    arg_parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream AI responses and write each entry as soon as it is matched",
+    )
+    arg_parser.add_argument(
+        "--reconcile",
+        action="store_true",
+        help="Create, update and delete entries so Clockify matches the sources "
+        "for the window",
+    )
+    arg_parser.add_argument(
+        "--ai-batch",
+        action="store_true",
+        help="Match through the OpenAI Batch API: submit a batch job, or collect "
+        "the results of the pending one",
+    )
+    arg_parser.add_argument(
+        "--wait",
+        action="store_true",
+        help="With --ai-batch, poll until the pending batch job is done",
+    )
+    arg_parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=".clockipush/profile",
+        metavar="DIR",
+        help="Profile CPU time and memory per sync phase and write the reports "
+        "to DIR (default: .clockipush/profile)",
+    )
+    args = arg_parser.parse_args()
+    if args.profile and args.daemon:
+        arg_parser.error("--profile can't be used with --daemon")
+
+    config = load_config()
+    if args.stream:
+        config["ai_stream"] = True
+    # Applying a plan or resuming the journal never calls OpenAI
+    needs_ai = not (args.apply or args.resume)
+    if not all(
+        [
+            config["clockify_api_key"],
+            config["clockify_workspace_id"],
+            config["openai_api_key"] or not needs_ai,
+        ]
+    ):
         print("Error: Missing environment variables. Please check .env file.")
         return
 
     # Initialize Clients
     print("Initializing clients...")
-    calendar_client = CalendarClient(service_account_file=SERVICE_ACCOUNT_FILE)
-    clockify_client = ClockifyClient(
-        api_key=CLOCKIFY_API_KEY, workspace_id=CLOCKIFY_WORKSPACE_ID
-    )
-    ai_matcher = AIMatcher(api_key=OPENAI_API_KEY)
-
-    # Fetch Clockify Projects and Tasks
-    print("Fetching Clockify projects and tasks...")
-    projects = clockify_client.get_projects()
-    projects_with_tasks = []
-    for project in projects:
-        # Filter by project name if specified
-        if TARGET_PROJECT_NAME and project["name"] != TARGET_PROJECT_NAME:
-            continue
-
-        tasks = clockify_client.get_tasks(project["id"])
-        project["tasks"] = tasks
-        projects_with_tasks.append(project)
-
-    if not projects_with_tasks:
-        print(
-            f"Error: No projects found matching '{TARGET_PROJECT_NAME}'"
-            if TARGET_PROJECT_NAME
-            else "Error: No projects found."
-        )
-        return
-
-    # Calculate time range
-    now = datetime.datetime.now(datetime.timezone.utc)
-    time_max = now.isoformat().replace("+00:00", "Z")
-
-    if args.today:
-        # Start of today (00:00:00 UTC)
-        start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        time_min = start_of_day.isoformat().replace("+00:00", "Z")
-        # Buffer min is 1 day before start of day
-        buffer_min_dt = start_of_day - datetime.timedelta(days=1)
-    else:
-        time_min = (
-            (now - datetime.timedelta(days=args.days))
-            .isoformat()
-            .replace("+00:00", "Z")
-        )
-        buffer_min_dt = now - datetime.timedelta(days=args.days + 1)
-
-    # Fetch existing time entries to prevent duplicates
-    print("Fetching existing time entries...")
-    try:
-        # Buffer by 1 extra day to catch events that started before time_min but overlap
-        buffer_min = buffer_min_dt.isoformat().replace("+00:00", "Z")
-        existing_entries = clockify_client.get_time_entries(buffer_min, time_max)
-        # Create a set of signatures: (start_time, description)
-        existing_signatures = set()
-        for entry in existing_entries:
-            start = entry["timeInterval"]["start"]
-            desc = entry.get("description", "")
-            existing_signatures.add((start, desc))
-    except Exception as e:
-        print(
-            f"Warning: Could not fetch existing entries ({e}). Duplicate prevention might fail."
-        )
-        existing_signatures = set()
-
-    # List to collect all items that need matching
-    # Each item: {'id': 'unique_id', 'description': '...', 'start_iso': '...', 'end_iso': '...'}
-    items_to_match = []
+    session = SyncSession(config)
+    if args.profile:
+        from src.profiling import PhaseProfiler
 
-    # --- Process Calendar Events ---
-    print(f"Fetching calendar events from {time_min} to {time_max}...")
-    print(f"Target Calendar ID: {CALENDAR_ID}")
-    events = calendar_client.get_events(time_min, time_max, calendar_id=CALENDAR_ID)
+        session.profiler = PhaseProfiler(args.profile)
 
-    # Track total duration of calendar events
-    total_calendar_seconds = 0
-
-    if not events:
-        print("No events found.")
-    else:
-        for i, event in enumerate(events):
-            summary = event.get("summary", "No Title")
-            start = event["start"].get("dateTime", event["start"].get("date"))
-            end = event["end"].get("dateTime", event["end"].get("date"))
-
-            # Skip all-day events for now if they don't have specific times
-            if "T" not in start:
-                print(f"Skipping all-day event: {summary}")
-                continue
-
-            print(f"Processing event: {CYAN}{summary}{RESET} ({start} - {end})")
-
-            # Pre-check for duplicates
-            try:
-                start_dt = parser.parse(start).astimezone(datetime.timezone.utc)
-                end_dt = parser.parse(end).astimezone(datetime.timezone.utc)
-                start_iso = start_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-                end_iso = end_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-
-                # Add to total duration
-                duration = (end_dt - start_dt).total_seconds()
-                total_calendar_seconds += duration
-
-                if (start_iso, summary) in existing_signatures:
-                    print(
-                        f"  -> Skipping duplicate: Entry already exists for {start_iso}"
-                    )
-                    continue
-
-                # Add to batch list
-                item_id = f"evt_{i}"
-                items_to_match.append(
-                    {
-                        "id": item_id,
-                        "description": summary,
-                        "start_iso": start_iso,
-                        "end_iso": end_iso,
-                        "type": "event",
-                    }
-                )
-
-            except Exception as e:
-                print(f"  -> Error checking duplicate or parsing dates: {e}")
-
-    # --- Process GitHub Issues ---
-    print("\nFetching GitHub issues...")
     try:
-        github_issues = get_issues()
-    except Exception as e:
-        print(f"Failed to fetch GitHub issues: {e}")
-        github_issues = []
-
-    eligible_issues = []
-
-    for issue in github_issues:
-        # Determine Status ("In Progress" or "Done")
-        status = None
-        for proj in issue.get("projects", []):
-            # Filter by project name if specified
-            if TARGET_PROJECT_NAME and proj.get("project_name") != TARGET_PROJECT_NAME:
-                continue
+        run(args, session)
+    finally:
+        if session.profiler:
+            session.profiler.report()
 
-            s = proj.get("status", "").lower()
-            if "in progress" in s:
-                status = "In Progress"
-                break
-            elif "done" in s:
-                status = "Done"
-                break
 
-        if not status:
-            continue
-
-        summary = f"#{issue['number']} {issue['issue_name']}"
-
-        # Date Logic
-        target_dt = None
-
-        if status == "Done":
-            updated_at_str = issue.get("updated_at")
-            if not updated_at_str:
-                continue
-            try:
-                updated_dt = parser.parse(updated_at_str).astimezone(
-                    datetime.timezone.utc
-                )
-                time_min_dt = parser.parse(time_min).astimezone(datetime.timezone.utc)
-                time_max_dt = parser.parse(time_max).astimezone(datetime.timezone.utc)
+def run(args, session):
+    if args.apply:
+        session.apply(args.apply, dry_run=args.dry_run)
+        return
 
-                if not (time_min_dt <= updated_dt <= time_max_dt):
-                    continue
-                target_dt = updated_dt
-            except Exception as e:
-                print(f"Error parsing issue date {updated_at_str}: {e}")
-                continue
+    if args.resume:
+        session.resume(dry_run=args.dry_run)
+        return
 
-        elif status == "In Progress":
-            target_dt = datetime.datetime.now(datetime.timezone.utc)
+    if args.ai_batch and session.has_pending_batch():
+        session.collect_batch(dry_run=args.dry_run, plan_path=args.plan, wait=args.wait)
+        return
 
-        if not target_dt:
-            continue
+    if args.daemon:
+        Daemon(
+            session,
+            interval=args.interval,
+            host=args.host,
+            port=args.port,
+            dry_run=args.dry_run,
+        ).run()
+        return
 
-        eligible_issues.append(
-            {"summary": summary, "status": status, "target_dt": target_dt}
+    # Calculate time range
+    now = datetime.datetime.now(datetime.timezone.utc)
+    time_min_dt, time_max_dt, buffer_min_dt = get_time_window(
+        now, days=args.days, today=args.today
+    )
+    if args.reconcile:
+        session.reconcile(
+            time_min_dt, time_max_dt, buffer_min_dt, dry_run=args.dry_run, now=now
         )
-
-    # --- Calculate and Distribute Time for Issues ---
-    WORK_DAY_SECONDS = 8 * 3600
-    remaining_seconds = max(0, WORK_DAY_SECONDS - total_calendar_seconds)
-
-    print(f"\nTime Calculation:")
-    print(f"  Total Calendar Time: {total_calendar_seconds / 3600:.2f} hours")
-    print(f"  Target Work Day: 8.00 hours")
-    print(f"  Remaining Time: {remaining_seconds / 3600:.2f} hours")
-    print(f"  Eligible GitHub Issues: {len(eligible_issues)}")
-
-    if eligible_issues and remaining_seconds > 0:
-        seconds_per_issue = remaining_seconds / len(eligible_issues)
-        print(f"  -> Allocating {seconds_per_issue / 3600:.2f} hours per issue")
-
-        next_start_times = {}  # Key: Date string (YYYY-MM-DD), Value: datetime
-
-        for i, issue in enumerate(eligible_issues):
-            summary = issue["summary"]
-            target_dt = issue["target_dt"]
-            date_key = target_dt.strftime("%Y-%m-%d")
-
-            # Initialize start time for this day if not set (e.g., 09:00 UTC)
-            if date_key not in next_start_times:
-                next_start_times[date_key] = target_dt.replace(
-                    hour=9, minute=0, second=0, microsecond=0
-                )
-
-            start_dt = next_start_times[date_key]
-            end_dt = start_dt + datetime.timedelta(seconds=seconds_per_issue)
-
-            # Update next start time for this day
-            next_start_times[date_key] = end_dt
-
-            start_iso = start_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-            end_iso = end_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-
-            print(
-                f"Processing GitHub Issue ({issue['status']}): {CYAN}{summary}{RESET}"
-            )
-            print(f"  -> Allocated: {start_iso} - {end_iso}")
-
-            # Duplicate Check
-            if (start_iso, summary) in existing_signatures:
-                print(f"  -> Skipping duplicate: Entry already exists for {start_iso}")
-                continue
-
-            # Add to batch list
-            item_id = f"iss_{i}"
-            items_to_match.append(
-                {
-                    "id": item_id,
-                    "description": summary,
-                    "start_iso": start_iso,
-                    "end_iso": end_iso,
-                    "type": "issue",
-                }
-            )
-
-    elif not eligible_issues:
-        print("  -> No eligible GitHub issues found to distribute time.")
     else:
-        print("  -> No remaining time to distribute (Calendar events >= 8 hours).")
-
-    # --- Batch Match and Execute ---
-    if not items_to_match:
-        print("\nNo items to sync.")
-        return
-
-    print(f"\nBatch matching {len(items_to_match)} items with AI...")
-
-    # Prepare items for AI (only ID and description needed)
-    ai_input_items = [
-        {"id": item["id"], "description": item["description"]}
-        for item in items_to_match
-    ]
-
-    matches = ai_matcher.batch_match_tasks(ai_input_items, projects_with_tasks)
-
-    print("\nProcessing Matches and Creating Time Entries...")
-
-    for item in items_to_match:
-        item_id = item["id"]
-        description = item["description"]
-        start_iso = item["start_iso"]
-        end_iso = item["end_iso"]
-
-        match = matches.get(item_id)
-
-        print(f"\nItem: {CYAN}{description}{RESET}")
-
-        if match and match["project_id"] and match["task_id"]:
-            project_id = match["project_id"]
-            task_id = match["task_id"]
-            reasoning = match.get("reasoning", "No reasoning")
-
-            p_name, t_name = resolve_names(projects_with_tasks, project_id, task_id)
-            print(
-                f"  -> Matched: Project='{p_name}' ({project_id}), Task='{GREEN}{t_name}{RESET}' ({task_id})"
-            )
-            print(f"  -> Reasoning: {reasoning}")
-
-            if not args.dry_run:
-                try:
-                    clockify_client.add_time_entry(
-                        description=description,
-                        start_time=start_iso,
-                        end_time=end_iso,
-                        project_id=project_id,
-                        task_id=task_id,
-                    )
-                    print("  -> Time entry added successfully.")
-                except Exception as e:
-                    print(f"  -> Failed to add time entry: {e}")
-            else:
-                print(f"  -> Dry run: Skipping write.")
-        else:
-            print("  -> No suitable match found.")
+        session.sync(
+            time_min_dt,
+            time_max_dt,
+            buffer_min_dt,
+            dry_run=args.dry_run,
+            now=now,
+            plan_path=args.plan,
+            ai_batch=args.ai_batch,
+        )
 
 
 if __name__ == "__main__":
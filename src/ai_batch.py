@@ -0,0 +1,134 @@
+"""
+Batch jobs: AI matching through the OpenAI Batch API, for large backfills.
+
+`--ai-batch` runs sources and dedupe as usual, answers what the history model
+can, and submits the remaining items as one batch job instead of calling chat
+completions directly. The job is saved to a state file:
+
+    {"version": 1, "batch_id": "...", "created_at": "...", "time_min": "...",
+     "time_max": "...", "matches": {item id: match, ...},
+     "items": [
+    {"id": "evt_0", "key": "...", "type": "event", "description": "...", ...},
+    ...
+    ]}
+
+A later `--ai-batch` run finds the state file, collects the results once the
+batch is done and writes the entries to Clockify, or to a plan with `--plan`.
+"""
+
+import datetime
+import json
+
+from src.files import atomic_write
+from src.models import TimeItem, parse_iso
+from src.pipeline import chunked
+
+BATCH_VERSION = 1
+
+
+def submit_batch_job(
+    items,
+    ai_matcher,
+    catalog,
+    path,
+    chunk_size,
+    local_matches=None,
+    meta=None,
+    dry_run=False,
+):
+    """
+    Submits `items` as a batch job and saves the job to `path`.
+
+    :param local_matches: Matches already known (e.g. from history), by item
+        id; only the other items are sent to the batch.
+    :param dry_run: Only print what would be submitted.
+    :return: Dict of counters {'items', 'submitted'}
+    """
+    local_matches = local_matches or {}
+    pending = [item for item in items if item.id not in local_matches]
+    if dry_run:
+        requests = len(list(chunked(pending, chunk_size)))
+        print(
+            f"\nDry run: Would submit {len(pending)} of {len(items)} items "
+            f"as an OpenAI batch job ({requests} requests)."
+        )
+        return {"items": len(items), "submitted": 0}
+
+    batch_id = None
+    if pending:
+        print(f"\nSubmitting {len(pending)} items as an OpenAI batch job...")
+        batch_id = ai_matcher.submit_batch(chunked(pending, chunk_size), catalog)
+        print(f"  -> Batch {batch_id} submitted.")
+
+    state = {
+        "version": BATCH_VERSION,
+        "batch_id": batch_id,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    state.update(meta or {})
+    state["matches"] = local_matches
+    state["items"] = [
+        {
+            "id": item.id,
+            "key": item.key,
+            "type": item.type,
+            "description": item.description,
+            "start": item.start_iso,
+            "end": item.end_iso,
+        }
+        for item in items
+    ]
+
+    with atomic_write(path) as tmp_path, open(tmp_path, "w") as f:
+        json.dump(state, f, separators=(",", ":"))
+
+    print(f"Saved batch job with {len(items)} items to {path}")
+    return {"items": len(items), "submitted": len(pending)}
+
+
+def read_batch_job(path):
+    """
+    Loads a job saved by `submit_batch_job`.
+
+    :return: (state, items) where items are `TimeItem`s with their original ids.
+    """
+    with open(path, "r") as f:
+        state = json.load(f)
+
+    if state.get("version") != BATCH_VERSION:
+        raise ValueError(
+            f"Unsupported batch job version {state.get('version')} "
+            f"(expected {BATCH_VERSION})"
+        )
+
+    items = [
+        TimeItem(
+            id=entry["id"],
+            key=entry["key"],
+            type=entry["type"],
+            description=entry["description"],
+            start=parse_iso(entry["start"]),
+            end=parse_iso(entry["end"]),
+        )
+        for entry in state["items"]
+    ]
+    return state, items
+
+
+def collect_batch_job(state, items, ai_matcher, catalog):
+    """
+    Merges the batch results with the matches saved with the job.
+
+    :return: (status, matches by item id); matches is None while the batch is
+        still running.
+    """
+    matches = dict(state["matches"])
+    if not state["batch_id"]:
+        return "completed", matches
+
+    pending = [item for item in items if item.id not in matches]
+    status, results = ai_matcher.collect_batch(state["batch_id"], pending, catalog)
+    if results is None:
+        return status, None
+    matches.update(results)
+    return status, matches
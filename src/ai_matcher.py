@@ -1,145 +1,465 @@
 import openai
 import json
-import os
+import time
+
+from src import concurrency
+from src.catalog import Catalog
+from src.rule_matcher import RuleMatcher
+
+INSTRUCTIONS = """You are an intelligent assistant that maps calendar events and github issues to time tracking tasks. You output JSON.
+
+Goal: Select the most appropriate Project and Task for each item.
+
+Guidelines:
+1. Analyze the description to understand the work context, look for keywords in the event that match task names.
+2. "Standup", "Sync", "Discussion", "Call", "Retro", "Retrospective", "Refinement", "Sprint" usually map to "Meetings - internal" task.
+3. "Update", "Upgrade", "Deploy" usually map to "Deployments" task.
+4. If it's a JIRA ticket, map to "Consultancy", "Support" tasks.
+5. If the event refers to "Research", "Analyse", "Investigate", falls into the "Research" task.
+6. GitHub issues usually map to "Backlog" unless they fall into the previous tasks.
+7. Calendar events maps to "Meetings" unless they fall into the previous tasks.
+
+Output Format:
+Return a JSON object where keys are the Item IDs and values are objects with:
+- "reasoning": A brief explanation.
+- "projectId": The exact alphanumeric ID of the selected project.
+- "taskId": The exact alphanumeric ID of the selected task.
+- "confidence": How sure you are of the match, from 0 to 1.
+
+Example Output:
+{
+    "item_1": { "reasoning": "...", "projectId": "...", "taskId": "...", "confidence": 0.9 },
+    "item_2": { "reasoning": "...", "projectId": "...", "taskId": "...", "confidence": 0.4 }
+}
+
+If no task fits well, return null for projectId and taskId.
+
+The items to match are in the user message."""
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_PENDING = ("validating", "in_progress", "finalizing", "cancelling")
+# Failures the OpenAI SDK would retry itself: connection errors and timeouts,
+# 5xx and 409 responses
+TRANSIENT_ERRORS = (
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    openai.ConflictError,
+)
+
+
+class JSONObjectStream:
+    """
+    Incremental parser for a streamed top-level JSON object.
+
+    `feed` takes the next piece of text and returns the (key, value) members
+    that were completed by it, so each member can be used as soon as its
+    closing brace arrives instead of after the whole document.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.key_start = None
+        self.key = None
+        self.value_start = None
+
+    def _member(self, end):
+        value = json.loads(self.buffer[self.value_start : end])
+        member = (self.key, value)
+        self.key_start = self.key = self.value_start = None
+        return member
+
+    def feed(self, text):
+        self.buffer += text
+        members = []
+        buf = self.buffer
+
+        for i in range(self.pos, len(buf)):
+            c = buf[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.key is None:
+                        self.key = json.loads(buf[self.key_start : i + 1])
+                continue
+
+            if c == '"':
+                self.in_string = True
+                if self.depth == 1 and self.key is None:
+                    self.key_start = i
+            elif c in "{[":
+                self.depth += 1
+            elif c in "}]":
+                self.depth -= 1
+                if self.value_start is not None:
+                    if self.depth == 1:
+                        # An object or array member just closed
+                        members.append(self._member(i + 1))
+                    elif self.depth == 0:
+                        # A scalar last member, closed by the outer brace
+                        members.append(self._member(i))
+            elif c == ":" and self.depth == 1 and self.value_start is None:
+                self.value_start = i + 1
+            elif c == "," and self.depth == 1 and self.value_start is not None:
+                members.append(self._member(i))
+
+        self.pos = len(buf)
+        return members
 
 
 class AIMatcher:
-    def __init__(self, api_key, model="gpt-4o"):
-        self.client = openai.OpenAI(api_key=api_key)
+    def __init__(
+        self,
+        api_key,
+        model="gpt-4o",
+        stream=False,
+        base_url=None,
+        fallback=None,
+        threshold=0.7,
+        usage=None,
+    ):
+        """
+        :param stream: Stream completions and yield each match as soon as it is
+            complete from `iter_match_tasks`.
+        :param base_url: Endpoint of an OpenAI-compatible API, e.g. a local
+            stand-in; defaults to OpenAI.
+        :param fallback: Matcher (normally a stronger model) that gets the items
+            this model matched below `threshold` confidence or not at all.
+        :param threshold: Minimum confidence to answer without the fallback.
+        :param usage: A `Usage` that accounts tokens, latency and cost. Once its
+            budget is spent, items are matched by keyword rules instead.
+        """
+        # Retries (rate limits and TRANSIENT_ERRORS) are left to the shared
+        # limiter, which adapts the concurrency to them
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        self.limiter = concurrency.limiter("openai")
         self.model = model
+        self.stream = stream
+        self.fallback = fallback
+        self.threshold = threshold
+        self.usage = usage
+        self.rules = RuleMatcher()
+        self.stats = {"items": 0, "matched": 0}
 
-    def batch_match_tasks(self, items, projects_with_tasks):
+    @property
+    def name(self):
+        return self.model
+
+    def _build_instructions(self, catalog):
         """
-        Matches a list of items to relevant Clockify tasks.
+        The system message: instructions, then the catalog. It only depends on
+        the catalog, whose listing is sorted, so every request of a run (and
+        of later runs with the same catalog) starts with the same bytes and
+        OpenAI can serve that prefix from its prompt cache.
+        """
+        return (
+            INSTRUCTIONS
+            + "\n\nAvailable Projects and Tasks:\n"
+            + catalog.prompt_fragment
+        )
+
+    def _build_prompt(self, items):
+        """The user message: only the items, which change with every request."""
+        items_str = ""
+        for item in items:
+            items_str += f'- ID: {item.id} | Description: "{item.description}"\n'
+        return "Items to Match:\n" + items_str
+
+    def _request_body(self, items, catalog):
+        """Chat completion parameters, shared by direct and batch requests."""
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": self._build_instructions(catalog)},
+                {"role": "user", "content": self._build_prompt(items)},
+            ],
+            "temperature": 0,
+            "response_format": {"type": "json_object"},
+        }
+
+    def _call(self, fn, *args, **kwargs):
+        """Calls the OpenAI API through the shared limiter, which retries it."""
+        return self.limiter.call(fn, *args, transient=TRANSIENT_ERRORS, **kwargs)
+
+    def _create(self, items, catalog, **kwargs):
+        # A stream holds its slot until it has been read
+        send = self.limiter.stream if kwargs.get("stream") else self.limiter.call
+        return send(
+            self.client.chat.completions.create,
+            **self._request_body(items, catalog),
+            transient=TRANSIENT_ERRORS,
+            **kwargs,
+        )
+
+    def _validate(self, item_id, match, catalog):
+        """Turns one raw AI result into a match, checked against the catalog."""
+        if not match:
+            print(f"DEBUG: No match returned for item {item_id}")
+            return {
+                "project_id": None,
+                "task_id": None,
+                "reasoning": "No match found by AI.",
+            }
 
-        :param items: List of dicts [{'id': 'unique_id', 'description': 'text'}]
-        :param projects_with_tasks: A list or dict structure containing projects and their tasks.
+        reasoning = match.get("reasoning", "No reasoning provided")
+        project_id = match.get("projectId")
+        task_id = match.get("taskId")
+        try:
+            confidence = min(1.0, max(0.0, float(match.get("confidence"))))
+        except (TypeError, ValueError):
+            confidence = None
+
+        # Validation and Correction
+        if task_id:
+            correct_project_id = catalog.task_project(task_id)
+            if correct_project_id:
+                # If task exists, enforce the correct project ID
+                project_id = correct_project_id
+            else:
+                # If task ID is not found in our list, it's invalid.
+                print(
+                    f"  -> Invalid Task ID returned by AI for {item_id}: {task_id}. Ignoring task."
+                )
+                task_id = None
+
+        return {
+            "project_id": project_id,
+            "task_id": task_id,
+            "reasoning": reasoning,
+            "confidence": confidence,
+        }
+
+    def _match_chunk(self, items, catalog):
+        """
+        Matches a list of items to relevant Clockify tasks with this model only.
+
+        :param items: List of `TimeItem`s (only `id` and `description` are used)
+        :param catalog: A `Catalog`, or a list of projects with their tasks.
         :return: Dict { 'unique_id': {'project_id': '...', 'task_id': '...', 'reasoning': '...'} }
         """
         if not items:
             return {}
 
-        # Prepare the context for the LLM
-        candidates = []
-        for project in projects_with_tasks:
-            p_name = project["name"]
-            p_id = project["id"]
-            candidates.append(f"Project: {p_name} (ID: {p_id})")
-            for task in project.get("tasks", []):
-                t_name = task["name"]
-                t_id = task["id"]
-                candidates.append(f"  - Task: {t_name} (ID: {t_id})")
-            candidates.append("")  # Empty line between projects
+        catalog = Catalog.coerce(catalog)
 
-        candidates_str = "\n".join(candidates)
+        try:
+            started = time.perf_counter()
+            response = self._create(items, catalog)
+            if self.usage:
+                self.usage.record(
+                    self.model,
+                    getattr(response, "usage", None),
+                    time.perf_counter() - started,
+                )
 
-        items_str = ""
-        for item in items:
-            items_str += (
-                f"- ID: {item['id']} | Description: \"{item['description']}\"\n"
+            content = response.choices[0].message.content
+            results = json.loads(content)
+
+            return {
+                item.id: self._validate(item.id, results.get(item.id), catalog)
+                for item in items
+            }
+
+        except Exception as e:
+            print(f"Error during AI matching: {e}")
+            return {}
+
+    def _iter_chunk(self, items, catalog):
+        """
+        Like `_match_chunk`, but yields (item_id, match) pairs.
+
+        In streaming mode each pair is yielded as soon as the model has finished
+        that item, so downstream writes can start before the response is done.
+        Items the model skipped are yielded with a no-match at the end.
+        """
+        if not self.stream:
+            yield from self._match_chunk(items, catalog).items()
+            return
+        if not items:
+            return
+
+        catalog = Catalog.coerce(catalog)
+        pending = {item.id for item in items}
+        parser = JSONObjectStream()
+        started = time.perf_counter()
+        usage = None
+
+        try:
+            stream = self._create(
+                items,
+                catalog,
+                stream=True,
+                stream_options={"include_usage": True},
             )
+            for chunk in stream:
+                # The last chunk carries the usage and no choices
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                for item_id, result in parser.feed(delta):
+                    if item_id not in pending:
+                        continue
+                    pending.discard(item_id)
+                    yield item_id, self._validate(item_id, result, catalog)
+        except Exception as e:
+            print(f"Error during AI matching: {e}")
+            return
+        finally:
+            if self.usage:
+                self.usage.record(self.model, usage, time.perf_counter() - started)
+
+        for item in items:
+            if item.id in pending:
+                yield item.id, self._validate(item.id, None, catalog)
 
-        prompt = f"""
-        You are an intelligent assistant that maps calendar events and github issues to time tracking tasks.
+    def iter_match_tasks(self, items, catalog):
+        """
+        Matches items, yielding (item_id, match) pairs.
 
-        Available Projects and Tasks:
-        {candidates_str}
+        With a fallback, matches below `threshold` confidence and items this
+        model could not match (no match, or a task id not in the catalog) are
+        re-sent to the fallback; the rest are yielded as they arrive.
+        """
+        if not items:
+            return
+        catalog = Catalog.coerce(catalog)
+        if self.usage and self.usage.exhausted():
+            yield from self.rules.iter_match_tasks(items, catalog)
+            return
+        self.stats["items"] += len(items)
 
-        Items to Match:
-        {items_str}
+        answered = set()
+        for item_id, match in self._iter_chunk(items, catalog):
+            if match["task_id"] and (
+                not self.fallback or (match["confidence"] or 0) >= self.threshold
+            ):
+                self.stats["matched"] += 1
+            elif self.fallback:
+                continue
+            answered.add(item_id)
+            yield item_id, match
 
-        Goal: Select the most appropriate Project and Task for each item.
+        if not self.fallback:
+            return
+        # Includes items lost to a failed request
+        uncertain = [item for item in items if item.id not in answered]
+        print(
+            f"  -> {self.model} matched {len(answered)}/{len(items)} items, "
+            f"{len(uncertain)} left for the fallback"
+        )
+        if uncertain:
+            yield from self.fallback.iter_match_tasks(uncertain, catalog)
+
+    def batch_match_tasks(self, items, catalog):
+        """
+        Matches a list of items to relevant Clockify tasks.
 
-        Guidelines:
-        1. Analyze the description to understand the work context, look for keywords in the event that match task names.
-        2. "Standup", "Sync", "Discussion", "Call", "Retro", "Retrospective", "Refinement", "Sprint" usually map to "Meetings - internal" task.
-        3. "Update", "Upgrade", "Deploy" usually map to "Deployments" task.
-        4. If it's a JIRA ticket, map to "Consultancy", "Support" tasks.
-        5. If the event refers to "Research", "Analyse", "Investigate", falls into the "Research" task.
-        6. GitHub issues usually map to "Backlog" unless they fall into the previous tasks.
-        7. Calendar events maps to "Meetings" unless they fall into the previous tasks.
+        :param items: List of `TimeItem`s (only `id` and `description` are used)
+        :param catalog: A `Catalog`, or a list of projects with their tasks.
+        :return: Dict { 'unique_id': {'project_id': '...', 'task_id': '...', 'reasoning': '...'} }
+        """
+        return dict(self.iter_match_tasks(items, catalog))
 
-        Output Format:
-        Return a JSON object where keys are the Item IDs and values are objects with:
-        - "reasoning": A brief explanation.
-        - "projectId": The exact alphanumeric ID of the selected project.
-        - "taskId": The exact alphanumeric ID of the selected task.
-        
-        Example Output:
-        {{
-            "item_1": {{ "reasoning": "...", "projectId": "...", "taskId": "..." }},
-            "item_2": {{ "reasoning": "...", "projectId": "...", "taskId": "..." }}
-        }}
+    # --- Batch API ---
 
-        If no task fits well, return null for projectId and taskId.
+    def submit_batch(self, chunks, catalog):
         """
+        Submits one chat completion request per chunk of items as an OpenAI
+        batch job. Batches are not subject to the per-minute token limits.
 
-        # Build a lookup map for validation: task_id -> project_id
-        task_to_project_map = {}
-        for project in projects_with_tasks:
-            p_id = project["id"]
-            for task in project.get("tasks", []):
-                task_to_project_map[task["id"]] = p_id
+        :param chunks: Lists of `TimeItem`s, one request each.
+        :return: The batch id.
+        """
+        catalog = Catalog.coerce(catalog)
+        lines = []
+        for i, chunk in enumerate(chunks):
+            request = {
+                "custom_id": f"chunk-{i}",
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": self._request_body(chunk, catalog),
+            }
+            lines.append(json.dumps(request, separators=(",", ":")))
 
+        input_file = self._call(
+            self.client.files.create,
+            file=("clockipush-batch.jsonl", "\n".join(lines).encode() + b"\n"),
+            purpose="batch",
+        )
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful assistant that outputs JSON.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0,
-                response_format={"type": "json_object"},
+            batch = self._call(
+                self.client.batches.create,
+                input_file_id=input_file.id,
+                endpoint=BATCH_ENDPOINT,
+                completion_window="24h",
             )
+        except Exception:
+            # Don't leave the uploaded input behind
+            try:
+                self._call(self.client.files.delete, input_file.id)
+            except Exception as e:
+                print(f"Warning: Could not delete batch input {input_file.id}: {e}")
+            raise
+        return batch.id
 
-            content = response.choices[0].message.content
-            results = json.loads(content)
-
-            final_matches = {}
+    def collect_batch(self, batch_id, items, catalog):
+        """
+        Reads the results of a batch submitted with `submit_batch`.
 
-            for item in items:
-                item_id = item["id"]
-                match = results.get(item_id)
+        Expired and cancelled batches still return the requests they finished;
+        items without a result get a no-match.
+        :return: (status, matches) where matches is None while the batch is
+            still running, else a dict like `batch_match_tasks` returns.
+        """
+        batch = self._call(self.client.batches.retrieve, batch_id)
+        if batch.status in BATCH_PENDING:
+            return batch.status, None
+        if batch.status == "failed":
+            # Nothing was processed; the job is dropped so the next run
+            # submits these items again instead of failing on it forever
+            print(
+                f"Warning: Batch {batch_id} failed ({batch.errors}); its items "
+                f"are left unmatched. Run --ai-batch again to resubmit them."
+            )
+            return batch.status, {}
 
-                if not match:
-                    print(f"DEBUG: No match returned for item {item_id}")
-                    final_matches[item_id] = {
-                        "project_id": None,
-                        "task_id": None,
-                        "reasoning": "No match found by AI.",
-                    }
+        catalog = Catalog.coerce(catalog)
+        results = {}
+        if batch.output_file_id:
+            output = self._call(self.client.files.content, batch.output_file_id).text
+            for line in output.splitlines():
+                if not line.strip():
                     continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                if record.get("error") or response.get("status_code") != 200:
+                    print(
+                        f"Warning: Batch request {record.get('custom_id')} failed: "
+                        f"{record.get('error') or response.get('status_code')}"
+                    )
+                    continue
+                if self.usage:
+                    self.usage.record(
+                        self.model, response["body"].get("usage"), batch=True
+                    )
+                content = response["body"]["choices"][0]["message"]["content"]
+                try:
+                    results.update(json.loads(content))
+                except ValueError as e:
+                    print(f"Warning: Unreadable batch result: {e}")
 
-                reasoning = match.get("reasoning", "No reasoning provided")
-                project_id = match.get("projectId")
-                task_id = match.get("taskId")
-
-                # Validation and Correction
-                if task_id:
-                    if task_id in task_to_project_map:
-                        # If task exists, enforce the correct project ID
-                        correct_project_id = task_to_project_map[task_id]
-                        if project_id != correct_project_id:
-                            # print(f"  -> AI Mismatch corrected for {item_id}: Task {task_id} belongs to Project {correct_project_id}, not {project_id}")
-                            project_id = correct_project_id
-                    else:
-                        # If task ID is not found in our list, it's invalid.
-                        print(
-                            f"  -> Invalid Task ID returned by AI for {item_id}: {task_id}. Ignoring task."
-                        )
-                        task_id = None
-
-                final_matches[item_id] = {
-                    "project_id": project_id,
-                    "task_id": task_id,
-                    "reasoning": reasoning,
-                }
-
-            return final_matches
-
-        except Exception as e:
-            print(f"Error during AI matching: {e}")
-            return {}
+        matches = {
+            item.id: self._validate(item.id, results.get(item.id), catalog)
+            for item in items
+        }
+        return batch.status, matches
@@ -6,6 +6,8 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from google.oauth2 import service_account
 
+from src import concurrency
+
 SCOPES = ["https://www.googleapis.com/auth/calendar.readonly"]
 
 
@@ -14,6 +16,7 @@ class CalendarClient:
         self.creds = None
         self.service = None
         self.service_account_file = service_account_file
+        self.limiter = concurrency.limiter("calendar")
 
     def authenticate(self):
         """Authenticates with Google Calendar API."""
@@ -44,20 +47,55 @@ class CalendarClient:
         self.service = build("calendar", "v3", credentials=self.creds)
 
     def get_events(self, time_min, time_max, calendar_id="primary"):
-        """Fetches events within the specified time range."""
+        """Fetches all events within the specified time range, page by page."""
         if not self.service:
             self.authenticate()
 
-        events_result = (
-            self.service.events()
-            .list(
-                calendarId=calendar_id,
-                timeMin=time_min,
-                timeMax=time_max,
-                singleEvents=True,
-                orderBy="startTime",
+        events = []
+        page_token = None
+        while True:
+            events_result = self.limiter.call(
+                self.service.events()
+                .list(
+                    calendarId=calendar_id,
+                    timeMin=time_min,
+                    timeMax=time_max,
+                    singleEvents=True,
+                    orderBy="startTime",
+                    maxResults=2500,
+                    pageToken=page_token,
+                )
+                .execute
             )
-            .execute()
+            events.extend(events_result.get("items", []))
+            page_token = events_result.get("nextPageToken")
+            if not page_token:
+                return events
+
+    def watch_events(self, address, channel_id, token=None, calendar_id="primary"):
+        """
+        Registers a push notification channel for calendar changes.
+
+        Google POSTs to `address` (must be HTTPS) whenever an event changes.
+        :return: The channel resource, including 'resourceId' and 'expiration' (ms).
+        """
+        if not self.service:
+            self.authenticate()
+
+        body = {"id": channel_id, "type": "web_hook", "address": address}
+        if token:
+            body["token"] = token
+        return self.limiter.call(
+            self.service.events().watch(calendarId=calendar_id, body=body).execute
+        )
+
+    def stop_channel(self, channel_id, resource_id):
+        """Stops a push notification channel."""
+        if not self.service:
+            self.authenticate()
+
+        self.limiter.call(
+            self.service.channels()
+            .stop(body={"id": channel_id, "resourceId": resource_id})
+            .execute
         )
-        events = events_result.get("items", [])
-        return events
@@ -0,0 +1,140 @@
+"""
+Indexed Clockify project/task catalog.
+
+Built once per run from the projects (with their tasks) fetched from Clockify
+and shared by the AI matcher, the sinks and the plan writer, so lookups are
+O(1) and the prompt text describing the catalog is formatted only once.
+"""
+
+import bisect
+import json
+
+from src.files import atomic_write
+
+
+def normalize_name(name):
+    """Case- and whitespace-insensitive form of a project or task name."""
+    return " ".join((name or "").casefold().split())
+
+
+class Catalog:
+    def __init__(self, projects_with_tasks):
+        """
+        :param projects_with_tasks: List of Clockify projects, each with a
+            'tasks' list, as returned by the Clockify API.
+        """
+        self.projects = {}  # project id -> {'id', 'name'}
+        self.tasks = {}  # task id -> {'id', 'name', 'project_id'}
+        self.project_tasks = {}  # project id -> [task id, ...]
+        self._task_names = {}  # normalized task name -> [task id, ...]
+        self._project_names = {}  # normalized project name -> project id
+        self._prompt_fragment = None
+
+        for project in projects_with_tasks:
+            p_id = project["id"]
+            self.projects[p_id] = {"id": p_id, "name": project["name"]}
+            self._project_names[normalize_name(project["name"])] = p_id
+            self.project_tasks[p_id] = []
+            for task in project.get("tasks") or []:
+                self.tasks[task["id"]] = {
+                    "id": task["id"],
+                    "name": task["name"],
+                    "project_id": p_id,
+                }
+                self.project_tasks[p_id].append(task["id"])
+                self._task_names.setdefault(normalize_name(task["name"]), []).append(
+                    task["id"]
+                )
+
+        self._sorted_task_names = sorted(self._task_names)
+
+    @classmethod
+    def coerce(cls, value):
+        """Returns `value` as a Catalog, building one from a project list."""
+        return value if isinstance(value, cls) else cls(value)
+
+    def __len__(self):
+        return len(self.projects)
+
+    def task_project(self, task_id):
+        """The id of the project `task_id` belongs to, or None if unknown."""
+        task = self.tasks.get(task_id)
+        return task["project_id"] if task else None
+
+    def names(self, project_id, task_id):
+        """Returns (project name, task name), "Unknown" for ids not in the catalog."""
+        project = self.projects.get(project_id)
+        task = self.tasks.get(task_id)
+        return (
+            project["name"] if project else "Unknown",
+            task["name"] if task and task["project_id"] == project_id else "Unknown",
+        )
+
+    def find_project(self, name):
+        """Project id for an exact (normalized) project name, or None."""
+        return self._project_names.get(normalize_name(name))
+
+    def find_tasks(self, name):
+        """Task ids whose normalized name equals `name`."""
+        return list(self._task_names.get(normalize_name(name), ()))
+
+    def find_tasks_by_prefix(self, prefix):
+        """Task ids whose normalized name starts with `prefix`."""
+        prefix = normalize_name(prefix)
+        names = self._sorted_task_names
+        task_ids = []
+        for i in range(bisect.bisect_left(names, prefix), len(names)):
+            if not names[i].startswith(prefix):
+                break
+            task_ids.extend(self._task_names[names[i]])
+        return task_ids
+
+    @property
+    def prompt_fragment(self):
+        """
+        The catalog as listed in the AI matching prompt (formatted once).
+
+        Projects and tasks are sorted by name and id, so the same catalog always
+        gives the same text whatever order Clockify returned it in.
+        """
+        if self._prompt_fragment is None:
+            candidates = []
+            for project in sorted(
+                self.projects.values(), key=lambda p: (p["name"], p["id"])
+            ):
+                p_id = project["id"]
+                candidates.append(f"Project: {project['name']} (ID: {p_id})")
+                for task in sorted(
+                    (self.tasks[t_id] for t_id in self.project_tasks[p_id]),
+                    key=lambda t: (t["name"], t["id"]),
+                ):
+                    candidates.append(f"  - Task: {task['name']} (ID: {task['id']})")
+                candidates.append("")  # Empty line between projects
+            self._prompt_fragment = "\n".join(candidates)
+        return self._prompt_fragment
+
+    def to_list(self):
+        """The catalog as a list of projects with their tasks."""
+        return [
+            {
+                "id": p_id,
+                "name": project["name"],
+                "tasks": [
+                    {"id": t_id, "name": self.tasks[t_id]["name"]}
+                    for t_id in self.project_tasks[p_id]
+                ],
+            }
+            for p_id, project in self.projects.items()
+        ]
+
+    def save(self, path, **meta):
+        """Writes the catalog, plus any `meta` fields, to a JSON file."""
+        with atomic_write(path) as tmp_path, open(tmp_path, "w") as f:
+            json.dump(dict(meta, projects=self.to_list()), f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path):
+        """Reads a file written by `save`. :return: (catalog, meta)"""
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls(data.pop("projects")), data
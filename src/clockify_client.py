@@ -1,24 +1,52 @@
 import requests
 import os
 
+from src import concurrency
+
 
 class ClockifyClient:
     def __init__(self, api_key, workspace_id):
         self.base_url = "https://api.clockify.me/api/v1"
         self.headers = {"X-Api-Key": api_key, "Content-Type": "application/json"}
         self.workspace_id = workspace_id
+        # Reuse connections and the user id across calls (and syncs in daemon
+        # mode); requests from all threads share one adaptive concurrency limit
+        self.session = concurrency.LimitedSession(concurrency.limiter("clockify"))
+        self.session.headers.update(self.headers)
+        self.user_id = None
+
+    def get_projects(self, name=None, archived=False, hydrated=False, page_size=500):
+        """
+        Fetches the projects in the workspace, page by page.
 
-    def get_projects(self):
-        """Fetches all projects in the workspace."""
+        :param name: Only the project with exactly this name (filtered by Clockify).
+        :param archived: Include archived projects (None for both).
+        :param hydrated: Embed each project's tasks under 'tasks', saving one
+            `get_tasks` call per project.
+        """
         url = f"{self.base_url}/workspaces/{self.workspace_id}/projects"
-        response = requests.get(url, headers=self.headers)
-        response.raise_for_status()
-        return response.json()
+        params = {"page-size": page_size, "hydrated": str(hydrated).lower()}
+        if name:
+            params["name"] = name
+            params["strict-name-search"] = "true"
+        if archived is not None:
+            params["archived"] = str(archived).lower()
+
+        projects = []
+        page = 1
+        while True:
+            response = self.session.get(url, params=dict(params, page=page))
+            response.raise_for_status()
+            batch = response.json()
+            projects.extend(batch)
+            if len(batch) < page_size:
+                return projects
+            page += 1
 
     def get_tasks(self, project_id):
         """Fetches tasks for a specific project."""
         url = f"{self.base_url}/workspaces/{self.workspace_id}/projects/{project_id}/tasks"
-        response = requests.get(url, headers=self.headers)
+        response = self.session.get(url)
         response.raise_for_status()
         return response.json()
 
@@ -34,7 +62,38 @@ class ClockifyClient:
             "projectId": project_id,
             "taskId": task_id,
         }
-        response = requests.post(url, headers=self.headers, json=payload)
+        response = self.session.post(url, json=payload)
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            print(f"Clockify Error: {response.text}")
+            raise e
+        return response.json()
+
+    def update_time_entry(
+        self, entry_id, description, start_time, end_time, project_id, task_id=None
+    ):
+        """Replaces the fields of an existing time entry."""
+        url = f"{self.base_url}/workspaces/{self.workspace_id}/time-entries/{entry_id}"
+        payload = {
+            "description": description,
+            "start": start_time,
+            "end": end_time,
+            "projectId": project_id,
+            "taskId": task_id,
+        }
+        response = self.session.put(url, json=payload)
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            print(f"Clockify Error: {response.text}")
+            raise e
+        return response.json()
+
+    def delete_time_entries(self, entry_ids):
+        """Deletes several of the current user's time entries in one request."""
+        url = f"{self.base_url}/workspaces/{self.workspace_id}/user/{self.get_current_user_id()}/time-entries"
+        response = self.session.delete(url, params={"time-entry-ids": list(entry_ids)})
         try:
             response.raise_for_status()
         except requests.exceptions.HTTPError as e:
@@ -50,13 +109,35 @@ class ClockifyClient:
             "end": end_time,
             "page-size": 1000,  # Fetch enough to cover the day
         }
-        response = requests.get(url, headers=self.headers, params=params)
+        response = self.session.get(url, params=params)
         response.raise_for_status()
         return response.json()
 
+    def iter_time_entries(self, start_time, end_time, page_size=1000):
+        """Yields all time entries within a time range, page by page."""
+        url = f"{self.base_url}/workspaces/{self.workspace_id}/user/{self.get_current_user_id()}/time-entries"
+        page = 1
+        while True:
+            params = {
+                "start": start_time,
+                "end": end_time,
+                "page": page,
+                "page-size": page_size,
+            }
+            response = self.session.get(url, params=params)
+            response.raise_for_status()
+            entries = response.json()
+            yield from entries
+            if len(entries) < page_size:
+                break
+            page += 1
+
     def get_current_user_id(self):
         """Fetches the current user's ID."""
+        if self.user_id:
+            return self.user_id
         url = f"{self.base_url}/user"
-        response = requests.get(url, headers=self.headers)
+        response = self.session.get(url)
         response.raise_for_status()
-        return response.json()["id"]
+        self.user_id = response.json()["id"]
+        return self.user_id
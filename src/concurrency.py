@@ -0,0 +1,300 @@
+"""
+Adaptive concurrency limits for the outbound API clients.
+
+Every service (Clockify, GitHub, Google Calendar, OpenAI) gets one shared
+`Limiter` that caps its requests in flight, whichever thread sends them. The
+cap is adjusted AIMD-style, like TCP congestion control:
+
+    success                          -> +1 per round trip (additive increase)
+    429/503                          -> halve, pause for Retry-After, retry
+                                        (writes: only 429 or with Retry-After)
+    latency well above its baseline  -> shrink by 10%
+    5xx or transient error           -> shrink by 10%
+    other errors                     -> no change
+
+so parallel stages run close to what each service allows, without manual
+tuning and without bursts of throttling errors. Decreases happen at most once
+per round trip, so one burst of 429s only halves the limit once.
+"""
+
+import contextlib
+import email.utils
+import threading
+import time
+
+import requests
+
+# (initial, maximum) requests in flight per service
+DEFAULT_LIMITS = {
+    "clockify": (4, 16),
+    "github": (4, 8),
+    "calendar": (2, 8),
+    "openai": (4, 16),
+}
+THROTTLE_STATUSES = (429, 503)
+# Not safe to send twice: a 503 from a proxy may come after the write went through
+NON_IDEMPOTENT_METHODS = ("POST", "PATCH")
+MAX_RETRIES = 3
+# Pause after a throttled response without Retry-After (or before retrying a
+# transient error), doubled per attempt
+BASE_BACKOFF = 1.0
+# Recent latency this many times the long-run average counts as overload
+LATENCY_TOLERANCE = 3.0
+LATENCY_DECREASE = 0.9
+# Weight of a new sample in the recent and in the long-run average
+SMOOTHING = 0.2
+BASELINE_SMOOTHING = 0.02
+
+
+def _retry_after(headers):
+    """Seconds to wait from a Retry-After header (seconds or HTTP date)."""
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(
+            0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        )
+    except (TypeError, ValueError):
+        return None
+
+
+def _throttle_info(outcome):
+    """
+    (status code, Retry-After seconds) of a response or of the exception a
+    client raised: requests responses, googleapiclient `HttpError` (`.resp`)
+    and OpenAI `APIStatusError` (`.response`).
+    """
+    resp = getattr(outcome, "resp", None)
+    if resp is not None:
+        return getattr(resp, "status", None), _retry_after(resp)
+    response = getattr(outcome, "response", None)
+    if response is not None and hasattr(response, "status_code"):
+        return response.status_code, _retry_after(response.headers)
+    status = getattr(outcome, "status_code", None)
+    headers = getattr(outcome, "headers", None)
+    if status is None or headers is None:
+        return status, None
+    return status, _retry_after(headers)
+
+
+class Limiter:
+    def __init__(self, name, initial=4, maximum=16, minimum=1):
+        self.name = name
+        self.limit = float(initial)
+        self.maximum = maximum
+        self.minimum = minimum
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.latency = None  # Recent average latency
+        self.baseline = None  # Long-run average latency
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self.stats = self._empty()
+
+    @staticmethod
+    def _empty():
+        return {"calls": 0, "throttled": 0, "failed": 0, "peak": 0}
+
+    @contextlib.contextmanager
+    def slot(self):
+        """Holds one of the requests in flight, waiting for a free one."""
+        with self._cond:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    break
+                self._cond.wait(timeout=wait if wait > 0 else None)
+            self.in_flight += 1
+            self.stats["calls"] += 1
+            self.stats["peak"] = max(self.stats["peak"], self.in_flight)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def _decrease(self, factor, now):
+        # Once per round trip: the responses of requests already in flight
+        # say nothing about the new limit
+        if now - self._last_decrease < (self.latency or 0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * factor)
+
+    def record(
+        self, latency, throttled=False, pause=None, failed=False, overloaded=False
+    ):
+        """
+        Adjusts the limit after a request that took `latency` seconds.
+
+        :param throttled: Rejected with 429/503; `pause` is its Retry-After.
+        :param failed: Failed otherwise; the limit only shrinks if the service
+            looked `overloaded` (5xx, connection error), and never grows.
+        """
+        now = time.monotonic()
+        with self._cond:
+            if throttled:
+                self.stats["throttled"] += 1
+                self._decrease(0.5, now)
+                if pause:
+                    self.paused_until = max(self.paused_until, now + pause)
+            elif failed:
+                self.stats["failed"] += 1
+                if overloaded:
+                    self._decrease(LATENCY_DECREASE, now)
+            else:
+                if self.latency is None:
+                    self.latency = self.baseline = latency
+                else:
+                    self.latency += SMOOTHING * (latency - self.latency)
+                    self.baseline += BASELINE_SMOOTHING * (latency - self.baseline)
+                if self.latency > LATENCY_TOLERANCE * self.baseline:
+                    self._decrease(LATENCY_DECREASE, now)
+                else:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def _finish(self, attempt, latency, result, error, transient, idempotent=True):
+        """Records an attempt; returns True if it should be retried."""
+        status, retry_after = _throttle_info(error if error else result)
+        throttled = status in THROTTLE_STATUSES
+        # A 429 or a Retry-After means the request was refused, not processed
+        refused = status == 429 or retry_after is not None
+        retryable = (throttled and (idempotent or refused)) or isinstance(
+            error, transient
+        )
+        if retry_after is None:
+            retry_after = BASE_BACKOFF * 2**attempt
+        self.record(
+            latency,
+            throttled=throttled,
+            pause=retry_after if throttled else None,
+            failed=error is not None or (status or 0) >= 400,
+            overloaded=(status or 0) >= 500 or isinstance(error, transient),
+        )
+        if not retryable or attempt >= MAX_RETRIES:
+            return False
+        reason = status if throttled else type(error).__name__
+        print(
+            f"  -> {self.name} request failed ({reason}), retrying in {retry_after:.1f}s"
+        )
+        if not throttled:
+            # Only this call backs off; throttling pauses the whole service
+            time.sleep(retry_after)
+        return True
+
+    def call(self, fn, *args, transient=(), idempotent=True, **kwargs):
+        """
+        Calls `fn` within the limit. Throttled calls (429/503, returned or
+        raised) are retried up to `MAX_RETRIES` times after their Retry-After,
+        which pauses every request to the service.
+
+        :param transient: Exception types that are safe to retry as well (e.g.
+            connection errors of an idempotent call), after a backoff.
+        :param idempotent: False for writes that must not be sent twice; they
+            are only retried on 429 or with a Retry-After, and other failures
+            are left to the caller (the journal and --resume).
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            error = result = None
+            with self.slot():
+                started = time.monotonic()
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    error = e
+                latency = time.monotonic() - started
+
+            if self._finish(attempt, latency, result, error, transient, idempotent):
+                continue
+            if error:
+                raise error
+            return result
+
+    def stream(self, fn, *args, transient=(), **kwargs):
+        """
+        Like `call` for a `fn` that returns a stream: yields its chunks while
+        holding the slot, so the request counts as in flight (and its latency
+        is measured) until the stream is read to the end. Only opening the
+        stream is retried.
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            error = None
+            with self.slot():
+                started = time.monotonic()
+                try:
+                    chunks = fn(*args, **kwargs)
+                except Exception as e:
+                    error = e
+                else:
+                    try:
+                        yield from chunks
+                    except Exception:
+                        self.record(
+                            time.monotonic() - started, failed=True, overloaded=True
+                        )
+                        raise
+                    self.record(time.monotonic() - started)
+                    return
+                latency = time.monotonic() - started
+
+            if not self._finish(attempt, latency, None, error, transient):
+                raise error
+
+
+class LimitedSession(requests.Session):
+    """A `requests.Session` whose requests go through a `Limiter`."""
+
+    def __init__(self, limiter):
+        super().__init__()
+        self.limiter = limiter
+
+    def request(self, method, url, *args, **kwargs):
+        return self.limiter.call(
+            super().request,
+            method,
+            url,
+            *args,
+            idempotent=method.upper() not in NON_IDEMPOTENT_METHODS,
+            **kwargs,
+        )
+
+
+_limiters = {}
+_lock = threading.Lock()
+
+
+def limiter(name):
+    """The process-wide `Limiter` of a service."""
+    with _lock:
+        if name not in _limiters:
+            initial, maximum = DEFAULT_LIMITS.get(name, (4, 16))
+            _limiters[name] = Limiter(name, initial=initial, maximum=maximum)
+        return _limiters[name]
+
+
+def report():
+    """
+    Prints the current limit of every service used since the last report,
+    then resets the counts. The limits themselves carry over to later runs.
+    """
+    parts = []
+    for name, lim in sorted(_limiters.items()):
+        stats = lim.stats
+        if not stats["calls"]:
+            continue
+        part = f"{name} {int(lim.limit)} (peak {stats['peak']}, {stats['calls']} calls"
+        if stats["throttled"]:
+            part += f", {stats['throttled']} throttled"
+        if stats["failed"]:
+            part += f", {stats['failed']} failed"
+        parts.append(part + ")")
+        lim.stats = lim._empty()
+    if parts:
+        print("Concurrency limits: " + ", ".join(parts))
@@ -0,0 +1,260 @@
+"""
+Long-running sync daemon.
+
+Keeps a single SyncSession (clients, HTTP connections, project catalog) warm
+and re-syncs when:
+
+- the interval elapses (today's window),
+- Google Calendar POSTs a push notification to /calendar (today; the
+  notification does not say which event changed),
+- GitHub POSTs an `issues` webhook to /github (only that issue is re-synced).
+
+Triggers arriving close together are coalesced into a single sync per day.
+"""
+
+import datetime
+import hashlib
+import hmac
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.sync import get_day_window
+
+# Renew the calendar channel when it has less than this left (seconds)
+CHANNEL_RENEW_MARGIN = 3600
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+
+def _today():
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+
+def verify_github_signature(secret, body, signature):
+    """Checks the X-Hub-Signature-256 header of a GitHub webhook."""
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature[len("sha256=") :])
+
+
+def github_triggers(event, payload):
+    """
+    Translates a GitHub webhook into sync triggers.
+
+    :return: List of (day, issue_ref) tuples; issue_ref None means the whole day.
+    """
+    if event == "issues":
+        issue = payload.get("issue") or {}
+        repo = (payload.get("repository") or {}).get("full_name")
+        if not issue.get("number") or not repo:
+            return []
+        return [(_today(), f"{repo}#{issue['number']}")]
+    if event == "projects_v2_item":
+        # Project item events only carry node ids, so re-sync today's issues
+        return [(_today(), None)]
+    return []
+
+
+def coalesce(triggers):
+    """
+    Merges triggers into {day: set of issue refs, or None for the whole day}.
+    """
+    days = {}
+    for day, ref in triggers:
+        if ref is None:
+            days[day] = None
+        elif days.get(day, set()) is not None:
+            days.setdefault(day, set()).add(ref)
+    return days
+
+
+def issue_predicate(refs):
+    """Returns a sync item filter that keeps only the given issues."""
+    prefixes = tuple(f"issue:{ref}:" for ref in refs)
+
+    def predicate(item):
+        return item.key.startswith(prefixes)
+
+    return predicate
+
+
+def make_handler(triggers, calendar_token=None, github_secret=None, public=False):
+    """
+    :param public: The server is reachable from other hosts; webhooks without
+        a configured token or secret are then refused (403), since anyone could
+        trigger syncs that spend OpenAI credit.
+    """
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def _reply(self, status):
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            self._reply(200 if self.path == "/healthz" else 404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+
+            if self.path == "/calendar":
+                if calendar_token:
+                    if self.headers.get("X-Goog-Channel-Token") != calendar_token:
+                        return self._reply(403)
+                elif public:
+                    return self._reply(403)
+                # "sync" is the handshake sent right after the channel is created
+                if self.headers.get("X-Goog-Resource-State") != "sync":
+                    triggers.put((_today(), None))
+                return self._reply(202)
+
+            if self.path == "/github":
+                if github_secret:
+                    if not verify_github_signature(
+                        github_secret, body, self.headers.get("X-Hub-Signature-256")
+                    ):
+                        return self._reply(403)
+                elif public:
+                    return self._reply(403)
+                try:
+                    payload = json.loads(body or b"{}")
+                except ValueError:
+                    return self._reply(400)
+                for trigger in github_triggers(
+                    self.headers.get("X-GitHub-Event"), payload
+                ):
+                    triggers.put(trigger)
+                return self._reply(202)
+
+            self._reply(404)
+
+        def log_message(self, format, *args):
+            print(f"[webhook] {self.address_string()} {format % args}")
+
+    return WebhookHandler
+
+
+class Daemon:
+    def __init__(
+        self,
+        session,
+        interval=900,
+        host="127.0.0.1",
+        port=8080,
+        dry_run=False,
+        debounce=2,
+    ):
+        self.session = session
+        self.interval = interval
+        self.host = host
+        self.port = port
+        self.dry_run = dry_run
+        self.debounce = debounce
+        self.triggers = queue.Queue()
+        self.calendar_webhook_url = os.getenv("CALENDAR_WEBHOOK_URL")
+        self.calendar_token = os.getenv("CALENDAR_CHANNEL_TOKEN")
+        self.github_secret = os.getenv("GITHUB_WEBHOOK_SECRET")
+        self.channel = None
+
+    def start_server(self):
+        public = self.host not in LOOPBACK_HOSTS
+        if public and not self.calendar_token:
+            print("Warning: /calendar is disabled; set CALENDAR_CHANNEL_TOKEN.")
+        if public and not self.github_secret:
+            print("Warning: /github is disabled; set GITHUB_WEBHOOK_SECRET.")
+        handler = make_handler(
+            self.triggers, self.calendar_token, self.github_secret, public=public
+        )
+        server = ThreadingHTTPServer((self.host, self.port), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Listening for webhooks on {self.host}:{self.port}")
+        return server
+
+    def renew_calendar_channel(self):
+        """Registers (or renews) the calendar push channel if a URL is configured."""
+        if not self.calendar_webhook_url:
+            return
+        if self.channel:
+            expires_in = int(self.channel["expiration"]) / 1000 - time.time()
+            if expires_in > CHANNEL_RENEW_MARGIN:
+                return
+
+        calendar_client = self.session.calendar_client
+        try:
+            channel = calendar_client.watch_events(
+                self.calendar_webhook_url,
+                str(uuid.uuid4()),
+                token=self.calendar_token,
+                calendar_id=self.session.config["calendar_id"],
+            )
+        except Exception as e:
+            print(f"Warning: Could not register calendar push channel ({e}).")
+            return
+
+        if self.channel:
+            try:
+                calendar_client.stop_channel(
+                    self.channel["id"], self.channel["resourceId"]
+                )
+            except Exception as e:
+                print(f"Warning: Could not stop old calendar channel ({e}).")
+        self.channel = channel
+        print(f"Calendar push channel registered: {channel['id']}")
+
+    def sync_day(self, day, refs=None):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        time_min_dt, time_max_dt, buffer_min_dt = get_day_window(day, now)
+
+        predicate = issue_predicate(refs) if refs else None
+        if refs:
+            print(f"\nRe-syncing {', '.join(sorted(refs))} on {day}")
+        else:
+            print(f"\nSyncing {day}")
+
+        try:
+            self.session.sync(
+                time_min_dt,
+                time_max_dt,
+                buffer_min_dt,
+                dry_run=self.dry_run,
+                predicate=predicate,
+                now=now,
+            )
+        except Exception as e:
+            print(f"Sync failed: {e}")
+
+    def run(self):
+        self.start_server()
+        next_run = time.monotonic()
+
+        while True:
+            self.renew_calendar_channel()
+
+            timeout = max(0, next_run - time.monotonic())
+            try:
+                first = self.triggers.get(timeout=timeout)
+            except queue.Empty:
+                first = None
+
+            if first is None:
+                pending = {_today(): None}
+                next_run = time.monotonic() + self.interval
+            else:
+                # Give bursts of notifications a moment to arrive, then merge them
+                time.sleep(self.debounce)
+                triggers = [first]
+                while True:
+                    try:
+                        triggers.append(self.triggers.get_nowait())
+                    except queue.Empty:
+                        break
+                pending = coalesce(triggers)
+
+            for day, refs in sorted(pending.items()):
+                self.sync_day(day, refs)
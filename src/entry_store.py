@@ -0,0 +1,213 @@
+"""
+Local SQLite mirror of the user's Clockify time entries.
+
+Dedupe, resume and the history model used to download the entries of a
+window on each run. The mirror keeps the entries on disk, indexed by start
+time and description, and tracks the span it covers. A refresh only re-reads
+the last `overlap_days` of that span (to catch late edits and deletions) plus
+whatever lies outside it; entries ClockiPush writes are added locally as they
+are created.
+"""
+
+import datetime
+import sqlite3
+import threading
+
+from src.files import ensure_dir
+from src.models import ExistingEntry, format_iso, parse_iso
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id TEXT PRIMARY KEY,
+    description TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT,
+    project_id TEXT,
+    task_id TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_start ON entries (start, description);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+# Mirrors written with another schema are rebuilt from Clockify
+SCHEMA_VERSION = "2"
+
+
+def _iso(value):
+    """Normalizes a datetime or ISO string to the format Clockify stores."""
+    if isinstance(value, str):
+        value = parse_iso(value)
+    return format_iso(value)
+
+
+class EntryStore:
+    def __init__(self, path, owner=None, overlap_days=3):
+        """
+        :param path: SQLite database file.
+        :param owner: Identifies whose entries are mirrored (e.g. workspace and
+            user id); the mirror is cleared when it changes.
+        :param overlap_days: Days at the end of the mirrored span re-read on
+            every refresh.
+        """
+        ensure_dir(path)
+        # Dedupe runs in a pipeline thread, so the connection is shared behind a lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.overlap_days = overlap_days
+        with self._lock, self._db:
+            self._db.executescript(SCHEMA)
+        if self._meta("schema") != SCHEMA_VERSION:
+            with self._lock:
+                self._db.executescript("DROP TABLE entries; DROP TABLE meta;" + SCHEMA)
+            self._set_meta("schema", SCHEMA_VERSION)
+        if owner is not None and self._meta("owner") != owner:
+            self.clear()
+            self._set_meta("owner", owner)
+
+    def _meta(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM meta WHERE key != 'schema'")
+
+    @property
+    def span(self):
+        """(start, end) ISO strings of the span the mirror covers, or None."""
+        start, end = self._meta("covered_from"), self._meta("covered_to")
+        return (start, end) if start and end else None
+
+    # --- Writes ---
+
+    def _upsert(self, entries):
+        self._db.executemany(
+            """
+            INSERT OR REPLACE INTO entries (id, description, start, end, project_id, task_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    e.id,
+                    e.description,
+                    e.start_iso,
+                    e.end and _iso(e.end),
+                    e.project_id,
+                    e.task_id,
+                )
+                for e in entries
+                if e.id and e.start
+            ],
+        )
+
+    def add(self, entry):
+        """Records an entry ClockiPush just created or updated (API resource)."""
+        with self._lock, self._db:
+            self._upsert([ExistingEntry.from_api(entry)])
+
+    def delete(self, entry_ids):
+        with self._lock, self._db:
+            self._db.executemany(
+                "DELETE FROM entries WHERE id = ?", [(i,) for i in entry_ids]
+            )
+
+    def replace_range(self, start, end, entries):
+        """Makes the mirror hold exactly `entries` (API resources) in [start, end)."""
+        start, end = _iso(start), _iso(end)
+        entries = [ExistingEntry.from_api(e) for e in entries]
+        with self._lock, self._db:
+            self._db.execute("CREATE TEMP TABLE IF NOT EXISTS fetched (id TEXT)")
+            self._db.execute("DELETE FROM fetched")
+            self._db.executemany(
+                "INSERT INTO fetched (id) VALUES (?)", [(e.id,) for e in entries]
+            )
+            self._db.execute(
+                "DELETE FROM entries WHERE start >= ? AND start < ? "
+                "AND id NOT IN (SELECT id FROM fetched)",
+                (start, end),
+            )
+            self._upsert(entries)
+
+    def refresh(self, clockify_client, start, end):
+        """
+        Brings the mirror up to date for [start, end).
+
+        Only the part of the range outside the mirrored span, plus the last
+        `overlap_days` of the span, is fetched from Clockify.
+        :return: Number of entries fetched.
+        """
+        start, end = _iso(start), _iso(end)
+        span = self.span
+        if span and span[0] <= start <= span[1]:
+            overlap = parse_iso(span[1]) - datetime.timedelta(days=self.overlap_days)
+            fetch_from = max(start, format_iso(overlap))
+            covered_from, covered_to = span[0], max(end, span[1])
+        elif span and start < span[0] <= end:
+            # Extends the span backwards; the whole range is fetched
+            fetch_from = start
+            covered_from, covered_to = start, max(end, span[1])
+        else:
+            fetch_from = start
+            covered_from, covered_to = start, end
+
+        fetched = 0
+        if fetch_from < end:
+            print(f"Refreshing local entry mirror from {fetch_from} to {end}...")
+            entries = list(clockify_client.iter_time_entries(fetch_from, end))
+            self.replace_range(fetch_from, end, entries)
+            fetched = len(entries)
+        self._set_meta("covered_from", covered_from)
+        self._set_meta("covered_to", covered_to)
+        return fetched
+
+    # --- Lookups ---
+
+    def signatures(self, start, end):
+        """The (start, description) of every entry starting in [start, end)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT start, description FROM entries WHERE start >= ? AND start < ?",
+                (_iso(start), _iso(end)),
+            ).fetchall()
+        return set(rows)
+
+    def find(self, start, description):
+        """Id of an entry with this exact start and description, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id FROM entries WHERE start = ? AND description = ?",
+                (_iso(start), description),
+            ).fetchone()
+        return row[0] if row else None
+
+    def entries(self, start, end):
+        """The entries starting in [start, end), as `ExistingEntry`s."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, description, start, end, project_id, task_id "
+                "FROM entries WHERE start >= ? AND start < ?",
+                (_iso(start), _iso(end)),
+            ).fetchall()
+        return [
+            ExistingEntry(
+                entry_id,
+                description,
+                parse_iso(start),
+                parse_iso(end) if end else None,
+                project_id,
+                task_id,
+            )
+            for entry_id, description, start, end, project_id, task_id in rows
+        ]
+
+    def close(self):
+        self._db.close()
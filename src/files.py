@@ -0,0 +1,47 @@
+"""
+Helpers for the state files ClockiPush keeps (catalog cache, history model,
+journal, batch job, usage ledger, entry mirror).
+"""
+
+import contextlib
+import os
+
+
+def ensure_dir(path):
+    """Creates the directory that will hold the file `path`."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+
+def fsync_dir(path):
+    """Makes the creation or replacement of the file `path` durable."""
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextlib.contextmanager
+def atomic_write(path, suffix=".tmp", durable=False):
+    """
+    Yields a temporary path to write the new contents of `path` to. When the
+    block completes, it replaces `path` in one step, so a crash never leaves
+    a half-written file; if the block raises, `path` is left as it was.
+
+    :param suffix: Of the temporary file (numpy appends .npz to other names).
+    :param durable: Also fsync the contents and the directory entry.
+    """
+    ensure_dir(path)
+    tmp_path = path + suffix
+    try:
+        yield tmp_path
+        if durable:
+            with open(tmp_path, "rb") as f:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if durable:
+        fsync_dir(path)
@@ -1,8 +1,17 @@
+import argparse
+import concurrent.futures
+import datetime
 import os
-import requests
 import json
 import sys
 
+from src import concurrency
+from src.models import Issue, IssueProject, parse_iso
+
+# Shared so that repeated queries (e.g. in daemon mode) reuse the connection,
+# and so that parallel shards share one adaptive concurrency limit
+session = concurrency.LimitedSession(concurrency.limiter("github"))
+
 
 def run_query(query, variables=None):
     token = os.environ.get("GITHUB_TOKEN") or os.environ.get("PERSONAL_GITHUB_TOKEN")
@@ -14,7 +23,7 @@ def run_query(query, variables=None):
         sys.exit(1)
 
     headers = {"Authorization": f"Bearer {token}"}
-    request = requests.post(
+    request = session.post(
         "https://api.github.com/graphql",
         json={"query": query, "variables": variables},
         headers=headers,
@@ -31,41 +40,48 @@ def run_query(query, variables=None):
         )
 
 
-def get_issues():
-    query = """
-    query($cursor: String) {
-      search(query: "is:issue assignee:@me sort:updated-desc", type: ISSUE, first: 100, after: $cursor) {
-        pageInfo {
-          hasNextPage
-          endCursor
+# GitHub search returns at most this many results per query
+SEARCH_RESULT_CAP = 1000
+# Shards with more results are split by updated date, so no shard takes more
+# than a few sequential pages
+MAX_SHARD_RESULTS = 300
+DEFAULT_CONCURRENCY = 4
+# Updated-date range of the first split; nothing on GitHub is older
+EARLIEST_UPDATE = datetime.datetime(2008, 1, 1, tzinfo=datetime.timezone.utc)
+
+ISSUES_QUERY = """
+query($q: String!, $cursor: String) {
+  search(query: $q, type: ISSUE, first: 100, after: $cursor) {
+    issueCount
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+    nodes {
+      ... on Issue {
+        title
+        number
+        state
+        updatedAt
+        repository {
+          name
+          owner {
+            login
+          }
         }
-        nodes {
-          ... on Issue {
-            title
-            number
-            state
-            updatedAt
-            repository {
-              name
-              owner {
-                login
-              }
+        projectItems(first: 10) {
+          nodes {
+            isArchived
+            project {
+              title
             }
-            projectItems(first: 10) {
+            fieldValues(first: 20) {
               nodes {
-                isArchived
-                project {
-                  title
-                }
-                fieldValues(first: 20) {
-                  nodes {
-                    ... on ProjectV2ItemFieldSingleSelectValue {
+                ... on ProjectV2ItemFieldSingleSelectValue {
+                  name
+                  field {
+                    ... on ProjectV2FieldCommon {
                       name
-                      field {
-                        ... on ProjectV2FieldCommon {
-                          name
-                        }
-                      }
                     }
                   }
                 }
@@ -75,65 +91,156 @@ def get_issues():
         }
       }
     }
+  }
+}
+"""
+
+
+def _issue_from_node(node):
+    # Process projects
+    projects = []
+    for proj_node in node["projectItems"]["nodes"] or []:
+        status = "No Status"
+
+        # Find status field
+        for field_value in proj_node["fieldValues"]["nodes"]:
+            # We look for the field named "Status"
+            if (
+                hasattr(field_value, "get")
+                and field_value.get("field", {}).get("name") == "Status"
+            ):
+                status = field_value.get("name")
+                break
+
+        projects.append(
+            IssueProject(
+                name=proj_node["project"]["title"],
+                status=status,
+                is_archived=proj_node["isArchived"],
+            )
+        )
+
+    return Issue(
+        number=node["number"],
+        title=node["title"],
+        state=node["state"],
+        updated_at=parse_iso(node["updatedAt"]) if node["updatedAt"] else None,
+        org=node["repository"]["owner"]["login"],
+        repo=node["repository"]["name"],
+        projects=tuple(projects),
+    )
+
+
+def _search_time(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+
+def initial_shards(scopes=()):
+    """
+    Search shards for the configured scopes: one per org ("acme") or repository
+    ("acme/api"), plus one for everything else. Without scopes the whole search
+    is a single shard, which is split by date as needed.
+
+    :return: List of (qualifiers, updated range or None) shards.
     """
+    orgs = [s for s in scopes if "/" not in s]
+    repos = [s for s in scopes if "/" in s]
+    shards = []
+    for org in orgs:
+        # Repositories with their own shard are left out of their org's shard
+        excluded = [f"-repo:{r}" for r in repos if r.split("/")[0] == org]
+        shards.append((" ".join([f"org:{org}"] + excluded), None))
+    for repo in repos:
+        shards.append((f"repo:{repo}", None))
+    rest = [f"-org:{o}" for o in orgs] + [
+        f"-repo:{r}" for r in repos if r.split("/")[0] not in orgs
+    ]
+    shards.append((" ".join(rest), None))
+    return shards
+
+
+def _split(shard, now):
+    """Halves the updated-date range of a shard, or returns None if it can't."""
+    qualifiers, updated = shard
+    start, end = updated or (EARLIEST_UPDATE, now)
+    if end - start < datetime.timedelta(seconds=2):
+        return None
+    middle = (start + (end - start) / 2).replace(microsecond=0)
+    return [(qualifiers, (start, middle)), (qualifiers, (middle, end))]
+
+
+def _fetch_shard(shard, now):
+    """
+    Fetches the issues of one shard. If it holds more than `MAX_SHARD_RESULTS`
+    issues (or more than search returns) it is split instead.
+
+    :return: (issues, child shards)
+    """
+    qualifiers, updated = shard
+    search = f"is:issue assignee:@me {qualifiers}".strip()
+    if updated:
+        search += f" updated:{_search_time(updated[0])}..{_search_time(updated[1])}"
+    search += " sort:updated-desc"
 
     issues = []
     cursor = None
-
     while True:
-        variables = {"cursor": cursor}
-        result = run_query(query, variables)
+        result = run_query(ISSUES_QUERY, {"q": search, "cursor": cursor})
 
         if "errors" in result:
             print(f"GraphQL errors: {result['errors']}", file=sys.stderr)
             break
 
         data = result["data"]["search"]
+        # Search can sometimes return None nodes or we might have filtered types
+        issues.extend(_issue_from_node(node) for node in data["nodes"] if node)
 
-        for node in data["nodes"]:
-            if (
-                not node
-            ):  # Search can sometimes return None nodes or we might have filtered types
-                continue
-            issue_data = {
-                "issue_name": node["title"],
-                "number": node["number"],
-                "status": node["state"],
-                "updated_at": node["updatedAt"],
-                "org": node["repository"]["owner"]["login"],
-                "repo": node["repository"]["name"],
-                "projects": [],
-            }
+        if cursor is None and data["issueCount"] > MAX_SHARD_RESULTS:
+            children = _split(shard, now)
+            if children:
+                # The first page is kept; duplicates are merged by the caller
+                return issues, children
+            if data["issueCount"] > SEARCH_RESULT_CAP:
+                print(
+                    f"Warning: '{search}' matches {data['issueCount']} issues; "
+                    f"only the first {SEARCH_RESULT_CAP} can be fetched.",
+                    file=sys.stderr,
+                )
 
-            # Process projects
-            if node["projectItems"]["nodes"]:
-                for proj_node in node["projectItems"]["nodes"]:
-                    project_info = {
-                        "project_name": proj_node["project"]["title"],
-                        "status": "No Status",
-                        "is_archived": proj_node["isArchived"],
-                    }
+        if not data["pageInfo"]["hasNextPage"]:
+            break
 
-                    # Find status field
-                    for field_value in proj_node["fieldValues"]["nodes"]:
-                        # We look for the field named "Status"
-                        if (
-                            hasattr(field_value, "get")
-                            and field_value.get("field", {}).get("name") == "Status"
-                        ):
-                            project_info["status"] = field_value.get("name")
-                            break
+        cursor = data["pageInfo"]["endCursor"]
 
-                    issue_data["projects"].append(project_info)
+    return issues, []
 
-            issues.append(issue_data)
 
-        if not data["pageInfo"]["hasNextPage"]:
-            break
+def get_issues(scopes=(), concurrency=DEFAULT_CONCURRENCY):
+    """
+    Fetches all issues assigned to the current user as `Issue` records.
 
-        cursor = data["pageInfo"]["endCursor"]
+    The search is split into shards (per org or repository in `scopes`, and by
+    updated-date range when a shard is too large or hits the search result
+    cap) that are fetched `concurrency` at a time, so the wall time follows the
+    largest shard rather than the total issue count. Issues found by several
+    shards are merged by org/repo#number.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    issues = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = {pool.submit(_fetch_shard, s, now) for s in initial_shards(scopes)}
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                shard_issues, children = future.result()
+                for issue in shard_issues:
+                    issues[(issue.org, issue.repo, issue.number)] = issue
+                pending.update(pool.submit(_fetch_shard, s, now) for s in children)
 
-    return issues
+    epoch = datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+    return sorted(issues.values(), key=lambda i: i.updated_at or epoch, reverse=True)
 
 
 if __name__ == "__main__":
@@ -151,38 +258,32 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     try:
-        all_issues = get_issues()
+        all_issues = get_issues([args.org] if args.org else ())
 
         filtered_issues = []
         for issue in all_issues:
             # Filter by Org
-            if args.org and args.org.lower() != issue["org"].lower():
+            if args.org and args.org.lower() != issue.org.lower():
                 continue
 
             # Filter by Project, Status, and Archived
             # If project, status, or is_archived is specified, we need to check the projects list
             if args.project or args.status or args.is_archived:
                 project_match = False
-                for proj in issue["projects"]:
+                for proj in issue.projects:
                     p_name_match = True
                     p_status_match = True
                     p_archived_match = True
 
-                    if (
-                        args.project
-                        and args.project.lower() not in proj["project_name"].lower()
-                    ):
+                    if args.project and args.project.lower() not in proj.name.lower():
                         p_name_match = False
 
-                    if (
-                        args.status
-                        and args.status.lower() not in proj["status"].lower()
-                    ):
+                    if args.status and args.status.lower() not in proj.status.lower():
                         p_status_match = False
 
                     if args.is_archived:
                         target_archived = args.is_archived.lower() == "true"
-                        if proj["is_archived"] != target_archived:
+                        if proj.is_archived != target_archived:
                             p_archived_match = False
 
                     if p_name_match and p_status_match and p_archived_match:
@@ -194,7 +295,7 @@ if __name__ == "__main__":
 
             filtered_issues.append(issue)
 
-        print(json.dumps(filtered_issues, indent=2))
+        print(json.dumps([issue.to_dict() for issue in filtered_issues], indent=2))
     except Exception as e:
         print(f"An error occurred: {e}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,348 @@
+"""
+Nearest-neighbour matcher trained on the user's past Clockify entries.
+
+Every historical entry with a project and task becomes a row of a sparse,
+L2-normalized matrix of hashed word and character 3-gram counts (identical
+description/task pairs share a row with a weight). A new item is answered by
+cosine similarity against all rows at once, a vote over its k nearest rows,
+and a confidence score. Items below the confidence threshold are passed on to
+the fallback matcher (normally `AIMatcher`).
+
+The model is saved as a compressed .npz and updated incrementally with the
+entries created since the last update, just before it is first needed in a
+run (see `before_match`). Every entry id is remembered with its
+row, so an entry moved to another task (a manual correction) moves its weight
+to the new label when it is read again.
+"""
+
+import datetime
+import math
+import os
+import re
+import zlib
+
+import numpy as np
+from scipy import sparse
+
+from src.catalog import Catalog, normalize_name
+from src.files import atomic_write
+from src.models import ExistingEntry, format_iso, parse_iso
+
+N_FEATURES = 2**18
+QUERY_CHUNK = 256
+# entry_rows values for entries without a row
+UNLABELLED = -1  # seen without project, task or description
+UNKNOWN = -2  # seen by a model saved before rows were recorded
+_WORD = re.compile(r"\w+")
+
+
+def _hashed_features(text):
+    """Maps text to {feature index: count} over words and character 3-grams."""
+    text = normalize_name(text)
+    counts = {}
+    padded = f" {text} "
+    grams = [f"w:{w}" for w in _WORD.findall(text)]
+    grams += [f"c:{padded[i : i + 3]}" for i in range(len(padded) - 2)]
+    for gram in grams:
+        index = zlib.crc32(gram.encode()) % N_FEATURES
+        counts[index] = counts.get(index, 0) + 1
+    return counts
+
+
+def vectorize(texts):
+    """Returns a CSR matrix with one L2-normalized, sublinear-tf row per text."""
+    indptr = [0]
+    indices = []
+    data = []
+    for text in texts:
+        counts = _hashed_features(text)
+        values = [1 + math.log(c) for c in counts.values()]
+        norm = math.sqrt(sum(v * v for v in values)) or 1.0
+        indices.extend(counts.keys())
+        data.extend(v / norm for v in values)
+        indptr.append(len(indices))
+    return sparse.csr_matrix(
+        (
+            np.asarray(data, dtype=np.float32),
+            np.asarray(indices, dtype=np.int32),
+            np.asarray(indptr, dtype=np.int64),
+        ),
+        shape=(len(texts), N_FEATURES),
+    )
+
+
+class HistoryMatcher:
+    def __init__(self, fallback=None, path=None, k=5, threshold=0.6, before_match=None):
+        """
+        :param fallback: Matcher for low-confidence items (same interface).
+        :param path: Where the model is persisted (.npz), or None.
+        :param k: Number of neighbours that vote.
+        :param threshold: Minimum confidence to answer without the fallback.
+        :param before_match: Called before items are matched, e.g. to update
+            the model, so runs with nothing to match don't read any history.
+        """
+        self.fallback = fallback
+        self.path = path
+        self.k = k
+        self.threshold = threshold
+        self.before_match = before_match
+
+        self.matrix = sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+        self.labels = []  # row -> (project_id, task_id)
+        self.weights = []  # row -> number of entries
+        self.rows = {}  # (normalized description, project_id, task_id) -> row
+        self.entry_rows = {}  # entry id -> row, or UNLABELLED / UNKNOWN
+        self.trained_until = None  # latest entry start seen, ISO string
+        self.stats = {"items": 0, "matched": 0}
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def name(self):
+        return "history"
+
+    # --- Training ---
+
+    def add_entries(self, entries):
+        """
+        Adds Clockify entries (`ExistingEntry`) to the model.
+
+        Entries without project, task or description are skipped. An entry
+        seen before counts again only if its description or task changed; its
+        weight then moves from the old row to the new one.
+        :return: Number of entries added or relabelled.
+        """
+        new_texts = []
+        added = 0
+        for entry in entries:
+            if entry.start_iso and (
+                self.trained_until is None or entry.start_iso > self.trained_until
+            ):
+                self.trained_until = entry.start_iso
+            old_row = self.entry_rows.get(entry.id)
+            if old_row == UNKNOWN:
+                continue
+            if not (entry.description and entry.project_id and entry.task_id):
+                if old_row is not None and old_row >= 0:
+                    self.weights[old_row] -= 1
+                self.entry_rows[entry.id] = UNLABELLED
+                continue
+
+            key = (normalize_name(entry.description), entry.project_id, entry.task_id)
+            row = self.rows.get(key)
+            if old_row is not None and old_row == row:
+                continue
+            if old_row is not None and old_row >= 0:
+                self.weights[old_row] -= 1
+
+            added += 1
+            if row is not None:
+                self.weights[row] += 1
+            else:
+                row = self.rows[key] = len(self.labels)
+                self.labels.append((entry.project_id, entry.task_id))
+                self.weights.append(1)
+                new_texts.append(entry.description)
+            self.entry_rows[entry.id] = row
+
+        if new_texts:
+            self.matrix = sparse.vstack(
+                [self.matrix, vectorize(new_texts)], format="csr"
+            )
+        return added
+
+    def _update_start(self, days, overlap_days):
+        """Start of the entries an update reads, and the end (now)."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if self.trained_until:
+            start = parse_iso(self.trained_until) - datetime.timedelta(
+                days=overlap_days
+            )
+        else:
+            start = now - datetime.timedelta(days=days)
+        print(f"Updating history model from entries since {format_iso(start)}...")
+        return format_iso(start), format_iso(now)
+
+    def _update(self, entries):
+        added = self.add_entries(entries)
+        print(f"  -> {added} new entries, {len(self)} distinct description/task pairs")
+        if added and self.path:
+            self.save(self.path)
+        return added
+
+    def update_from_clockify(self, clockify_client, days=365, overlap_days=7):
+        """
+        Pulls entries created since the last update (or the last `days` days on
+        the first run). The last `overlap_days` are re-read to catch entries
+        booked or corrected late; unchanged entries are skipped.
+        """
+        start, end = self._update_start(days, overlap_days)
+        entries = clockify_client.iter_time_entries(start, end)
+        return self._update(map(ExistingEntry.from_api, entries))
+
+    def update_from_store(self, store, clockify_client, days=365, overlap_days=7):
+        """
+        Like `update_from_clockify`, but reads the entries from the local mirror
+        (`EntryStore`). Only what the mirror does not cover yet (the first
+        `days` of history) is fetched from Clockify.
+        """
+        start, end = self._update_start(days, overlap_days)
+        span = store.span
+        if not span or start < span[0]:
+            store.refresh(clockify_client, start, span[0] if span else end)
+        return self._update(store.entries(start, end))
+
+    # --- Persistence ---
+
+    def save(self, path):
+        descriptions = [None] * len(self.labels)
+        for (description, _, _), row in self.rows.items():
+            descriptions[row] = description
+
+        with atomic_write(path, suffix=".tmp.npz") as tmp_path:
+            np.savez_compressed(
+                tmp_path,
+                data=self.matrix.data,
+                indices=self.matrix.indices,
+                indptr=self.matrix.indptr,
+                labels=np.asarray(self.labels, dtype=str).reshape(-1, 2),
+                weights=np.asarray(self.weights, dtype=np.int64),
+                descriptions=np.asarray(descriptions, dtype=str),
+                entry_ids=np.asarray(list(self.entry_rows), dtype=str),
+                entry_rows=np.asarray(list(self.entry_rows.values()), dtype=np.int64),
+                trained_until=np.asarray(self.trained_until or ""),
+            )
+
+    def load(self, path):
+        with np.load(path) as model:
+            n_rows = len(model["weights"])
+            self.matrix = sparse.csr_matrix(
+                (model["data"], model["indices"], model["indptr"]),
+                shape=(n_rows, N_FEATURES),
+            )
+            self.labels = [tuple(label) for label in model["labels"].tolist()]
+            self.weights = model["weights"].tolist()
+            self.rows = {
+                (description, *label): row
+                for row, (description, label) in enumerate(
+                    zip(model["descriptions"].tolist(), self.labels)
+                )
+            }
+            entry_ids = model["entry_ids"].tolist()
+            if "entry_rows" in model:
+                rows = model["entry_rows"].tolist()
+            else:
+                rows = [UNKNOWN] * len(entry_ids)
+            self.entry_rows = dict(zip(entry_ids, rows))
+            self.trained_until = str(model["trained_until"]) or None
+
+    # --- Matching ---
+
+    def query(self, descriptions, catalog=None):
+        """
+        Finds the best (project_id, task_id) for each description.
+
+        Neighbours whose task no longer exists in `catalog` are ignored.
+        :return: List of (project_id, task_id, confidence); ids are None when
+            no neighbour qualifies.
+        """
+        if not len(self) or not descriptions:
+            return [(None, None, 0.0)] * len(descriptions)
+
+        weights = np.asarray(self.weights, dtype=np.float32)
+        # Rows whose entries were all moved to other tasks no longer vote
+        valid = weights > 0
+        if catalog is not None:
+            valid &= np.fromiter(
+                (catalog.task_project(t) == p for p, t in self.labels),
+                dtype=bool,
+                count=len(self),
+            )
+        boost = 1 + np.log(np.maximum(weights, 1))
+        k = min(self.k, len(self))
+
+        results = []
+        for start in range(0, len(descriptions), QUERY_CHUNK):
+            chunk = descriptions[start : start + QUERY_CHUNK]
+            similarities = (vectorize(chunk) @ self.matrix.T).toarray()
+            similarities[:, ~valid] = 0
+            neighbours = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+
+            for i, rows in enumerate(neighbours):
+                scores = {}
+                best_similarity = {}
+                for row in rows:
+                    similarity = similarities[i, row]
+                    if similarity <= 0:
+                        continue
+                    label = self.labels[row]
+                    scores[label] = scores.get(label, 0) + similarity * boost[row]
+                    best_similarity[label] = max(
+                        best_similarity.get(label, 0), similarity
+                    )
+                if not scores:
+                    results.append((None, None, 0.0))
+                    continue
+
+                label = max(scores, key=scores.get)
+                # Share of the vote, scaled by how close the nearest example is
+                confidence = (
+                    scores[label] / sum(scores.values()) * best_similarity[label]
+                )
+                results.append((label[0], label[1], min(1.0, float(confidence))))
+        return results
+
+    def split(self, items, catalog):
+        """
+        Matches what history can answer with enough confidence.
+
+        :return: (matches, uncertain) where matches maps item id to match, with
+            a 'confidence' between 0 and 1, and uncertain lists the other items.
+        """
+        if self.before_match:
+            self.before_match()
+        matches = {}
+        uncertain = []
+        results = self.query([item.description for item in items], catalog)
+        for item, (project_id, task_id, confidence) in zip(items, results):
+            if task_id and confidence >= self.threshold:
+                matches[item.id] = {
+                    "project_id": project_id,
+                    "task_id": task_id,
+                    "reasoning": f"Similar to past entries ({confidence:.2f}).",
+                    "confidence": confidence,
+                }
+            else:
+                uncertain.append(item)
+
+        self.stats["items"] += len(items)
+        self.stats["matched"] += len(matches)
+        print(
+            f"  -> History matched {len(matches)}/{len(items)} items, "
+            f"{len(uncertain)} left for the fallback"
+        )
+        return matches, uncertain
+
+    def iter_match_tasks(self, items, catalog):
+        """
+        Matches items from history, passing low-confidence ones to the fallback.
+
+        Same interface as `AIMatcher.iter_match_tasks`: yields (item_id, match)
+        pairs, local matches first.
+        """
+        if not items:
+            return
+        catalog = Catalog.coerce(catalog)
+
+        matches, uncertain = self.split(items, catalog)
+        yield from matches.items()
+        if uncertain and self.fallback:
+            yield from self.fallback.iter_match_tasks(uncertain, catalog)
+
+    def batch_match_tasks(self, items, catalog):
+        """Same as `iter_match_tasks`, collected into a dict."""
+        return dict(self.iter_match_tasks(items, catalog))
@@ -0,0 +1,211 @@
+"""
+Write-ahead journal of the Clockify time entries ClockiPush creates.
+
+Every entry is journaled as planned before it is submitted and as confirmed,
+with its Clockify id, after. The file is append-only JSON lines and every
+record is fsync'd, so after a crash the journal tells exactly which entries
+may not have reached Clockify. Records are keyed by the item's stable source
+key (see pipeline.normalize_events / normalize_issues).
+
+Record fields are kept short so months of history stay small:
+
+    {"k": key, "s": "p"|"c"|"f", "d": description, "st": start, "en": end,
+     "p": project_id, "t": task_id, "id": clockify_id, "ts": unix_time}
+
+s is planned, confirmed, failed or deleted (by reconcile). A planned record
+with an id is an update of that entry. Later records for a key replace earlier
+ones.
+
+Appends and compaction hold an exclusive lock on a sidecar file
+(<journal>.lock), so a daemon and a one-off run can share the journal.
+"""
+
+import contextlib
+import fcntl
+import json
+import os
+import time
+
+from src.files import atomic_write, ensure_dir, fsync_dir
+
+PLANNED = "p"
+CONFIRMED = "c"
+FAILED = "f"
+DELETED = "x"
+
+
+class Journal:
+    def __init__(self, path, retention_days=180):
+        self.path = path
+        self.retention_days = retention_days
+        self.records = {}
+        self._lines = 0
+        self._file = None
+        # Records replaced by the planned updates of this process
+        self._updating = {}
+        if os.path.exists(self.path):
+            with self._locked():
+                self._load()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Holds the journal lock, waiting for other processes to release it."""
+        ensure_dir(self.path)
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _replaced(self):
+        """True if another process compacted the journal since it was opened."""
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    def _load(self):
+        self.records = {}
+        self._lines = 0
+        if not os.path.exists(self.path):
+            return
+        valid_size = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # A torn last line from a crash mid-write; the record was
+                    # never acknowledged, so it is safe to drop.
+                    break
+                valid_size += len(line)
+                self._lines += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self.records[record["k"]] = record
+
+        if valid_size < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_size)
+                os.fsync(f.fileno())
+
+    def _append(self, record):
+        with self._locked():
+            if self._file is not None and self._replaced():
+                self.close()
+            if self._file is None:
+                created = not os.path.exists(self.path)
+                self._file = open(self.path, "a")
+                if created:
+                    fsync_dir(self.path)
+
+            record["ts"] = int(time.time())
+            self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._lines += 1
+        self.records[record["k"]] = record
+
+    def plan(self, item, project_id, task_id, entry_id=None):
+        """
+        Records an entry that is about to be submitted.
+
+        :param entry_id: The existing Clockify entry, if it is being updated.
+        """
+        record = {
+            "k": item.key,
+            "s": PLANNED,
+            "d": item.description,
+            "st": item.start_iso,
+            "en": item.end_iso,
+            "p": project_id,
+            "t": task_id,
+        }
+        if entry_id:
+            record["id"] = entry_id
+            self._updating[item.key] = self.records.get(item.key)
+        self._append(record)
+
+    def confirm(self, key, entry_id):
+        """Records that the planned entry for `key` exists in Clockify."""
+        record = dict(self.records[key], s=CONFIRMED, id=entry_id)
+        self._updating.pop(key, None)
+        self._append(record)
+
+    def fail(self, key):
+        """Records that Clockify rejected the planned entry for `key`."""
+        record = dict(self.records[key], s=FAILED)
+        self._updating.pop(key, None)
+        self._append(record)
+
+    def abort_update(self, key):
+        """
+        Records that the planned update for `key` did not go through while its
+        entry still exists, putting the previous record back so the entry
+        stays known (and is updated again by the next run).
+        """
+        previous = self._updating.pop(key, None)
+        if previous:
+            self._append(dict(previous))
+
+    def delete(self, key):
+        """Records that the entry for `key` was deleted from Clockify."""
+        record = dict(self.records[key], s=DELETED)
+        self._append(record)
+
+    def entry_id(self, key):
+        """The Clockify id of the confirmed entry for `key`, or None."""
+        record = self.records.get(key)
+        if record and record["s"] == CONFIRMED:
+            return record.get("id")
+        return None
+
+    def confirmed(self):
+        """Returns the entries that exist in Clockify."""
+        return [r for r in self.records.values() if r["s"] == CONFIRMED]
+
+    def is_synced(self, item):
+        """True if this exact item (same key, start and description) was confirmed."""
+        record = self.records.get(item.key)
+        return bool(
+            record
+            and record["s"] == CONFIRMED
+            and record["st"] == item.start_iso
+            and record["d"] == item.description
+        )
+
+    def unconfirmed(self):
+        """Returns the entries that were planned but never confirmed."""
+        return [r for r in self.records.values() if r["s"] == PLANNED]
+
+    def compact(self):
+        """
+        Rewrites the journal with one record per key, dropping records older
+        than `retention_days`. Pending records are always kept.
+        """
+        with self._locked():
+            # Re-read the file: other processes may have appended to it
+            self.close()
+            self._load()
+            cutoff = time.time() - self.retention_days * 86400
+            records = {
+                key: record
+                for key, record in self.records.items()
+                if record["s"] == PLANNED or record["ts"] >= cutoff
+            }
+
+            with atomic_write(self.path, durable=True) as tmp_path:
+                with open(tmp_path, "w") as f:
+                    for record in records.values():
+                        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+        self.records = records
+        self._lines = len(records)
+
+    def maybe_compact(self):
+        """Compacts once superseded records make up a large part of the file."""
+        if self._lines > 1.5 * len(self.records) + 100:
+            self.compact()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,161 @@
+"""
+Typed records shared across the sync path.
+
+Timestamps are parsed once, when a record is built from an API response, into
+aware UTC datetimes. All classes are frozen slotted dataclasses, which keeps
+them small on large backfills and safe to share between pipeline threads.
+"""
+
+import datetime
+from dataclasses import dataclass, field
+
+UTC = datetime.timezone.utc
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def parse_iso(value):
+    """
+    Parses the ISO-8601 timestamps Google Calendar, GitHub and Clockify return
+    ("2026-10-18T09:00:00Z", "2026-10-18T09:00:00+02:00",
+    "2026-10-18T09:00:00.123Z", "2026-10-18") into aware UTC datetimes.
+
+    Much cheaper than dateutil.parser.parse, which these formats don't need.
+    Naive values are taken to be UTC.
+    """
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    dt = datetime.datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=UTC)
+    return dt.astimezone(UTC)
+
+
+def format_iso(dt):
+    """Formats a UTC datetime the way Clockify stores it (second precision, Z)."""
+    return dt.strftime(ISO_FORMAT)
+
+
+@dataclass(frozen=True, slots=True)
+class CalendarEvent:
+    id: str
+    summary: str
+    start: datetime.datetime
+    end: datetime.datetime
+    all_day: bool
+
+    @classmethod
+    def from_api(cls, event):
+        """Builds an event from a Google Calendar API resource."""
+        start = event["start"].get("dateTime", event["start"].get("date"))
+        end = event["end"].get("dateTime", event["end"].get("date"))
+        return cls(
+            id=event.get("id", ""),
+            summary=event.get("summary", "No Title"),
+            start=parse_iso(start),
+            end=parse_iso(end),
+            all_day="T" not in start,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class IssueProject:
+    name: str
+    status: str
+    is_archived: bool
+
+
+@dataclass(frozen=True, slots=True)
+class Issue:
+    number: int
+    title: str
+    state: str
+    updated_at: datetime.datetime
+    org: str
+    repo: str
+    projects: tuple = ()
+
+    @property
+    def ref(self):
+        """Unique reference across repositories: org/repo#number."""
+        return f"{self.org}/{self.repo}#{self.number}"
+
+    def to_dict(self):
+        """JSON-friendly form, as printed by `python -m src.github_client`."""
+        return {
+            "issue_name": self.title,
+            "number": self.number,
+            "status": self.state,
+            "updated_at": format_iso(self.updated_at) if self.updated_at else None,
+            "org": self.org,
+            "repo": self.repo,
+            "projects": [
+                {
+                    "project_name": p.name,
+                    "status": p.status,
+                    "is_archived": p.is_archived,
+                }
+                for p in self.projects
+            ],
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class ExistingEntry:
+    id: str
+    description: str
+    start: datetime.datetime
+    end: datetime.datetime  # None while the timer runs
+    project_id: str = None
+    task_id: str = None
+    # Cached ISO form of `start`, as TimeItem.start_iso
+    start_iso: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        start_iso = format_iso(self.start) if self.start else None
+        object.__setattr__(self, "start_iso", start_iso)
+
+    @classmethod
+    def from_api(cls, entry):
+        """Builds an entry from a Clockify time entry resource."""
+        interval = entry.get("timeInterval") or {}
+        start, end = interval.get("start"), interval.get("end")
+        return cls(
+            id=entry.get("id"),
+            description=entry.get("description") or "",
+            start=parse_iso(start) if start else None,
+            end=parse_iso(end) if end else None,
+            project_id=entry.get("projectId"),
+            task_id=entry.get("taskId"),
+        )
+
+    @property
+    def signature(self):
+        """(start, description) in the form `TimeItem` compares with."""
+        return (self.start_iso, self.description)
+
+
+@dataclass(frozen=True, slots=True)
+class TimeItem:
+    """
+    A prospective time entry produced by the pipeline.
+
+    :param id: Short id, unique within one run, used to address the AI.
+    :param key: Stable source key (event:<id> or issue:<org/repo#n>:<date>).
+    """
+
+    id: str
+    key: str
+    type: str
+    description: str
+    start: datetime.datetime
+    end: datetime.datetime
+    start_iso: str = field(init=False, repr=False, compare=False)
+    end_iso: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "start_iso", format_iso(self.start))
+        object.__setattr__(self, "end_iso", format_iso(self.end))
+
+    @property
+    def duration(self):
+        return (self.end - self.start).total_seconds()
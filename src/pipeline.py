@@ -0,0 +1,458 @@
+"""
+Sync pipeline stages.
+
+A sync is a chain of generators:
+
+    sources -> normalize -> dedupe -> match -> sink
+
+Every stage consumes an iterable and yields to the next one, so stages can be
+tested or benchmarked on their own and new sources or sinks can be plugged in
+without touching the others. `prefetch` runs the upstream part of the chain in
+a background thread behind a bounded queue, so writes can start while later
+items are still being matched and a slow sink applies backpressure upstream.
+"""
+
+import datetime
+import queue
+import threading
+import requests
+
+from src.github_client import get_issues
+from src.models import CalendarEvent, TimeItem
+
+# ANSI Colors
+CYAN = "\033[96m"
+GREEN = "\033[92m"
+RESET = "\033[0m"
+
+WORK_DAY_SECONDS = 8 * 3600
+DEFAULT_CHUNK_SIZE = 25
+
+_DONE = object()
+# Seconds a blocked prefetch producer waits before checking for a stop
+PREFETCH_POLL = 0.1
+
+
+def prefetch(iterable, maxsize=DEFAULT_CHUNK_SIZE):
+    """
+    Drives `iterable` from a background thread through a bounded queue.
+
+    The producer blocks once `maxsize` results are waiting, so downstream stages
+    set the pace. Exceptions raised upstream are re-raised in the consumer. If
+    the consumer stops early (it raised, or the generator was closed), the
+    producer stops too instead of blocking on the full queue forever.
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(entry):
+        """Queues `entry`; returns False if the consumer is gone."""
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=PREFETCH_POLL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for value in iterable:
+                if not put((value, None)):
+                    break
+        except BaseException as e:
+            put((_DONE, e))
+            return
+        finally:
+            close = getattr(iterable, "close", None)
+            if stop.is_set() and close:
+                close()
+        put((_DONE, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    try:
+        while True:
+            value, error = buffer.get()
+            if value is _DONE:
+                if error:
+                    raise error
+                return
+            yield value
+    finally:
+        stop.set()
+
+
+# --- Sources ---
+
+
+def calendar_source(
+    calendar_client, time_min, time_max, calendar_id="primary", stats=None
+):
+    """
+    Yields the Google Calendar events of the window as `CalendarEvent`s.
+
+    Events that can't be parsed are skipped and set stats["calendar_incomplete"],
+    since the window then no longer lists every event.
+    """
+    print(f"Fetching calendar events from {time_min} to {time_max}...")
+    print(f"Target Calendar ID: {calendar_id}")
+    events = calendar_client.get_events(time_min, time_max, calendar_id=calendar_id)
+    if not events:
+        print("No events found.")
+
+    for event in events:
+        try:
+            yield CalendarEvent.from_api(event)
+        except (KeyError, ValueError) as e:
+            print(f"  -> Error parsing event {event.get('summary')}: {e}")
+            if stats is not None:
+                stats["calendar_incomplete"] = True
+
+
+def github_source(scopes=(), concurrency=4):
+    """
+    Yields the GitHub issues assigned to the current user as `Issue`s.
+
+    :param scopes: Orgs and owner/repo names fetched as separate shards.
+    :param concurrency: Shards fetched at a time.
+    """
+    print("\nFetching GitHub issues...")
+    try:
+        github_issues = get_issues(scopes, concurrency=concurrency)
+    except Exception as e:
+        print(f"Failed to fetch GitHub issues: {e}")
+        github_issues = []
+    yield from github_issues
+
+
+# --- Normalize ---
+
+
+def normalize_events(events, stats):
+    """
+    Turns calendar events into sync items.
+
+    Adds the duration of every timed event to stats["calendar_seconds"], which
+    `normalize_issues` uses to size the remaining work day.
+    """
+    stats.setdefault("calendar_seconds", 0)
+
+    for i, event in enumerate(events):
+        # Skip all-day events for now if they don't have specific times
+        if event.all_day:
+            print(f"Skipping all-day event: {event.summary}")
+            continue
+
+        item = TimeItem(
+            id=f"evt_{i}",
+            key=f"event:{event.id or i}",
+            type="event",
+            description=event.summary,
+            start=event.start,
+            end=event.end,
+        )
+        print(
+            f"Processing event: {CYAN}{item.description}{RESET} "
+            f"({item.start_iso} - {item.end_iso})"
+        )
+
+        stats["calendar_seconds"] += item.duration
+        yield item
+
+
+def _issue_status(issue, target_project_name):
+    for proj in issue.projects:
+        # Filter by project name if specified
+        if target_project_name and proj.name != target_project_name:
+            continue
+
+        s = (proj.status or "").lower()
+        if "in progress" in s:
+            return "In Progress"
+        elif "done" in s:
+            return "Done"
+    return None
+
+
+def normalize_issues(
+    issues, stats, time_min_dt, time_max_dt, target_project_name=None, now=None
+):
+    """
+    Turns GitHub issues into sync items.
+
+    "In Progress" issues are booked today, "Done" issues on the day they were
+    last updated if that falls inside the window. The time left in the work day
+    after calendar events is split equally between them, so this stage must run
+    after `normalize_events` has been exhausted.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    eligible_issues = []
+
+    for issue in issues:
+        status = _issue_status(issue, target_project_name)
+        if not status:
+            continue
+
+        if status == "Done":
+            updated_dt = issue.updated_at
+            if not updated_dt or not (time_min_dt <= updated_dt <= time_max_dt):
+                continue
+            target_dt = updated_dt
+        else:
+            target_dt = now
+
+        eligible_issues.append((issue, status, target_dt))
+
+    total_calendar_seconds = stats.get("calendar_seconds", 0)
+    remaining_seconds = max(0, WORK_DAY_SECONDS - total_calendar_seconds)
+
+    print("\nTime Calculation:")
+    print(f"  Total Calendar Time: {total_calendar_seconds / 3600:.2f} hours")
+    print(f"  Target Work Day: {WORK_DAY_SECONDS / 3600:.2f} hours")
+    print(f"  Remaining Time: {remaining_seconds / 3600:.2f} hours")
+    print(f"  Eligible GitHub Issues: {len(eligible_issues)}")
+
+    if not eligible_issues:
+        print("  -> No eligible GitHub issues found to distribute time.")
+        return
+    if remaining_seconds <= 0:
+        print("  -> No remaining time to distribute (Calendar events >= 8 hours).")
+        return
+
+    seconds_per_issue = remaining_seconds / len(eligible_issues)
+    print(f"  -> Allocating {seconds_per_issue / 3600:.2f} hours per issue")
+
+    next_start_times = {}  # Key: Date string (YYYY-MM-DD), Value: datetime
+
+    for i, (issue, status, target_dt) in enumerate(eligible_issues):
+        date_key = target_dt.strftime("%Y-%m-%d")
+
+        # Initialize start time for this day if not set (e.g., 09:00 UTC)
+        if date_key not in next_start_times:
+            next_start_times[date_key] = target_dt.replace(
+                hour=9, minute=0, second=0, microsecond=0
+            )
+
+        start_dt = next_start_times[date_key]
+        end_dt = start_dt + datetime.timedelta(seconds=seconds_per_issue)
+        next_start_times[date_key] = end_dt
+
+        item = TimeItem(
+            id=f"iss_{i}",
+            key=f"issue:{issue.ref}:{date_key}",
+            type="issue",
+            description=f"#{issue.number} {issue.title}",
+            start=start_dt,
+            end=end_dt,
+        )
+        print(f"Processing GitHub Issue ({status}): {CYAN}{item.description}{RESET}")
+        print(f"  -> Allocated: {item.start_iso} - {item.end_iso}")
+        yield item
+
+
+def select(items, predicate):
+    """Passes on only the items for which `predicate(item)` is true."""
+    for item in items:
+        if predicate(item):
+            yield item
+
+
+# --- Dedupe ---
+
+
+def dedupe(items, load_signatures, journal=None):
+    """
+    Drops items that already exist in Clockify.
+
+    Items the journal confirms as synced are dropped without any remote lookup.
+    `load_signatures` returns the set of (start, description) already in
+    Clockify; it is only called, once, if some item is not in the journal.
+    """
+    existing_signatures = None
+    for item in items:
+        if journal and journal.is_synced(item):
+            print(f"  -> Skipping journaled entry for {item.start_iso}")
+            continue
+
+        if existing_signatures is None:
+            existing_signatures = load_signatures()
+        if (item.start_iso, item.description) in existing_signatures:
+            print(f"  -> Skipping duplicate: Entry already exists for {item.start_iso}")
+            continue
+        yield item
+
+
+# --- Match ---
+
+
+def chunked(iterable, size):
+    """Groups an iterable into lists of at most `size` elements."""
+    chunk = []
+    for value in iterable:
+        chunk.append(value)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def match(items, matcher, catalog, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Matches items to Clockify tasks, `chunk_size` items per matcher call.
+
+    :param matcher: Anything with `iter_match_tasks(items, catalog)`, e.g.
+        `AIMatcher` or `HistoryMatcher`.
+    Yields (item, match) pairs as the matcher produces them, so with a
+    streaming matcher writes start before the whole chunk is matched; match
+    is None when nothing was matched.
+    """
+    for chunk in chunked(items, chunk_size):
+        print(f"\nBatch matching {len(chunk)} items...")
+        pending = {item.id: item for item in chunk}
+
+        for item_id, item_match in matcher.iter_match_tasks(chunk, catalog):
+            item = pending.pop(item_id, None)
+            if item:
+                yield item, item_match
+
+        for item in pending.values():
+            yield item, None
+
+
+# --- Sink ---
+
+
+def matcher_tiers(matcher):
+    """The matcher followed by its chain of fallbacks."""
+    while matcher is not None:
+        yield matcher
+        matcher = getattr(matcher, "fallback", None)
+
+
+def report_tiers(matcher):
+    """Prints how many items each matcher tier answered, then resets the counts."""
+    parts = []
+    tiers = list(matcher_tiers(matcher))
+    # Keyword rules stand in for AI tiers whose budget is spent
+    tiers += [tier.rules for tier in tiers if getattr(tier, "rules", None)]
+    for tier in tiers:
+        stats = getattr(tier, "stats", None)
+        if not stats or not stats["items"]:
+            continue
+        rate = stats["matched"] / stats["items"]
+        parts.append(f"{tier.name} {stats['matched']}/{stats['items']} ({rate:.0%})")
+        stats["items"] = stats["matched"] = 0
+    if parts:
+        print("Matched by tier: " + ", ".join(parts))
+
+
+def rejected(error, updated):
+    """
+    True if Clockify rejected a write, so there is nothing to resume. A
+    rejected update leaves the old entry in place unless it no longer exists,
+    so only that case is final.
+    """
+    if not isinstance(error, requests.exceptions.HTTPError):
+        return False
+    if updated:
+        return error.response is not None and error.response.status_code == 404
+    return True
+
+
+def _write_entry(clockify_client, entry_id, **fields):
+    """
+    Updates entry `entry_id`, or creates a new entry if there is none (or it
+    was deleted in Clockify since).
+    """
+    if entry_id:
+        try:
+            return clockify_client.update_time_entry(entry_id, **fields)
+        except requests.exceptions.HTTPError as e:
+            if e.response is None or e.response.status_code != 404:
+                raise
+    return clockify_client.add_time_entry(**fields)
+
+
+def clockify_sink(
+    matched, clockify_client, catalog, dry_run=False, journal=None, store=None
+):
+    """
+    Creates a Clockify time entry for every matched item.
+
+    With a journal, each entry is journaled before it is submitted and
+    confirmed with its Clockify id after. An item whose source key already has
+    a confirmed entry (a moved or renamed meeting) updates that entry instead
+    of creating a second one. With a store (`EntryStore`), written entries are
+    added to the local mirror.
+
+    :return: Dict of counters {'items', 'matched', 'written', 'failed'}
+    """
+    summary = {"items": 0, "matched": 0, "written": 0, "failed": 0}
+
+    for item, item_match in matched:
+        if not summary["items"]:
+            print("\nProcessing Matches and Creating Time Entries...")
+        summary["items"] += 1
+
+        description = item.description
+        print(f"\nItem: {CYAN}{description}{RESET}")
+
+        if not (item_match and item_match["project_id"] and item_match["task_id"]):
+            print("  -> No suitable match found.")
+            continue
+
+        summary["matched"] += 1
+        project_id = item_match["project_id"]
+        task_id = item_match["task_id"]
+        reasoning = item_match.get("reasoning", "No reasoning")
+
+        p_name, t_name = catalog.names(project_id, task_id)
+        print(
+            f"  -> Matched: Project='{p_name}' ({project_id}), "
+            f"Task='{GREEN}{t_name}{RESET}' ({task_id})"
+        )
+        print(f"  -> Reasoning: {reasoning}")
+
+        if dry_run:
+            print("  -> Dry run: Skipping write.")
+            continue
+
+        entry_id = journal.entry_id(item.key) if journal else None
+        if journal:
+            journal.plan(item, project_id, task_id, entry_id=entry_id)
+        try:
+            entry = _write_entry(
+                clockify_client,
+                entry_id,
+                description=description,
+                start_time=item.start_iso,
+                end_time=item.end_iso,
+                project_id=project_id,
+                task_id=task_id,
+            )
+        except Exception as e:
+            summary["failed"] += 1
+            print(f"  -> Failed to add time entry: {e}")
+            if journal and rejected(e, bool(entry_id)):
+                journal.fail(item.key)
+            elif journal and entry_id:
+                # The old entry is still there; a later run updates it again
+                journal.abort_update(item.key)
+            continue
+
+        if journal:
+            journal.confirm(item.key, entry.get("id"))
+        if store:
+            store.add(entry)
+        summary["written"] += 1
+        if entry_id and entry.get("id") == entry_id:
+            print("  -> Time entry updated successfully.")
+        else:
+            print("  -> Time entry added successfully.")
+
+    if not summary["items"]:
+        print("\nNo items to sync.")
+
+    return summary
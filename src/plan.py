@@ -0,0 +1,124 @@
+"""
+Sync plans: the matched output of a sync, saved to apply later.
+
+`--plan out.json` runs sources, dedupe and AI matching and writes the result
+here instead of to Clockify. `--apply out.json` reads it back and writes the
+entries without any calendar, GitHub or OpenAI calls.
+
+The file is JSON with one compact line per item so it can be reviewed and
+diffed:
+
+    {"version": 1, "created_at": "...", "time_min": "...", "time_max": "...",
+     "items": [
+    {"key": "...", "type": "event", "description": "...", "start": "...", ...},
+    ...
+    ]}
+"""
+
+import datetime
+import json
+
+from src.catalog import Catalog
+from src.models import TimeItem, parse_iso
+from src.pipeline import CYAN, GREEN, RESET
+
+PLAN_VERSION = 1
+
+
+def plan_sink(matched, path, catalog, meta=None):
+    """
+    Writes matched items to a plan file instead of Clockify.
+
+    :return: Dict of counters {'items', 'matched'}
+    """
+    summary = {"items": 0, "matched": 0}
+    lines = []
+
+    for item, match in matched:
+        match = match or {}
+        project_id = match.get("project_id")
+        task_id = match.get("task_id")
+        p_name, t_name = catalog.names(project_id, task_id)
+
+        summary["items"] += 1
+        print(f"\nItem: {CYAN}{item.description}{RESET}")
+        if project_id and task_id:
+            summary["matched"] += 1
+            print(f"  -> Planned: Project='{p_name}', Task='{GREEN}{t_name}{RESET}'")
+        else:
+            print("  -> No suitable match found.")
+
+        entry = {
+            "key": item.key,
+            "type": item.type,
+            "description": item.description,
+            "start": item.start_iso,
+            "end": item.end_iso,
+            "project_id": project_id,
+            "project": p_name if project_id else None,
+            "task_id": task_id,
+            "task": t_name if task_id else None,
+            "reasoning": match.get("reasoning"),
+        }
+        lines.append(json.dumps(entry, separators=(",", ":")))
+
+    header = {
+        "version": PLAN_VERSION,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    header.update(meta or {})
+    # Splice the items in one per line so the plan stays easy to review
+    head = json.dumps(dict(header, items=[]), separators=(",", ":"))[:-3]
+    with open(path, "w") as f:
+        f.write(head + "[\n" + ",\n".join(lines) + "\n]}\n")
+
+    print(f"\nWrote plan with {summary['items']} items to {path}")
+    return summary
+
+
+def read_plan(path):
+    """
+    Loads a plan written by `plan_sink`.
+
+    :return: (items, matches, catalog) where items are `TimeItem`s, matches
+        maps item key to match and catalog is the part of the Clockify
+        catalog the plan refers to (for display only).
+    """
+    with open(path, "r") as f:
+        plan = json.load(f)
+
+    if plan.get("version") != PLAN_VERSION:
+        raise ValueError(
+            f"Unsupported plan version {plan.get('version')} (expected {PLAN_VERSION})"
+        )
+
+    items = []
+    matches = {}
+    projects = {}
+    for entry in plan["items"]:
+        items.append(
+            TimeItem(
+                id=entry["key"],
+                key=entry["key"],
+                type=entry["type"],
+                description=entry["description"],
+                start=parse_iso(entry["start"]),
+                end=parse_iso(entry["end"]),
+            )
+        )
+        matches[entry["key"]] = {
+            "project_id": entry["project_id"],
+            "task_id": entry["task_id"],
+            "reasoning": entry.get("reasoning"),
+        }
+        if entry["project_id"]:
+            project = projects.setdefault(
+                entry["project_id"],
+                {"id": entry["project_id"], "name": entry["project"], "tasks": []},
+            )
+            if entry["task_id"] and all(
+                t["id"] != entry["task_id"] for t in project["tasks"]
+            ):
+                project["tasks"].append({"id": entry["task_id"], "name": entry["task"]})
+
+    return items, matches, Catalog(projects.values())
@@ -0,0 +1,136 @@
+"""
+Per-phase CPU and memory profiling for `--profile`.
+
+Each phase of a sync (catalog, calendar, github, existing entries, matching,
+writes, ...) gets its own cProfile profiler. Phases nest as the generator
+stages pull from each other, so only the innermost active phase is profiled
+and timed at any moment, and every phase reports its own (exclusive) CPU time,
+wall time and peak traced memory.
+
+Nothing here is imported or called unless `--profile` is given; the sync path
+then wraps its stages with `PhaseProfiler.wrap` and runs them in one thread.
+"""
+
+import cProfile
+import contextlib
+import io
+import os
+import pstats
+import time
+import tracemalloc
+
+TOP_FUNCTIONS = 15
+TOP_ALLOCATIONS = 10
+
+
+class PhaseProfiler:
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.phases = {}  # name -> {'profile', 'seconds', 'calls', 'peak', 'net'}
+        self._stack = []  # [(name, started, memory at start)]
+        tracemalloc.start()
+
+    def _phase(self, name):
+        if name not in self.phases:
+            self.phases[name] = {
+                "profile": cProfile.Profile(),
+                "seconds": 0.0,
+                "calls": 0,
+                "peak": 0,
+                "net": 0,
+            }
+        return self.phases[name]
+
+    def _pause(self):
+        """Stops accounting to the innermost phase."""
+        name, started, memory = self._stack[-1]
+        phase = self.phases[name]
+        phase["profile"].disable()
+        phase["seconds"] += time.perf_counter() - started
+        current, peak = tracemalloc.get_traced_memory()
+        phase["peak"] = max(phase["peak"], peak)
+        phase["net"] += current - memory
+
+    def _resume(self):
+        """Starts (again) accounting to the innermost phase."""
+        name = self._stack[-1][0]
+        tracemalloc.reset_peak()
+        self._stack[-1] = (
+            name,
+            time.perf_counter(),
+            tracemalloc.get_traced_memory()[0],
+        )
+        self.phases[name]["profile"].enable()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Accounts everything run in the block to `name`."""
+        self._phase(name)["calls"] += 1
+        if self._stack:
+            self._pause()
+        self._stack.append((name, 0.0, 0))
+        self._resume()
+        try:
+            yield
+        finally:
+            self._pause()
+            self._stack.pop()
+            if self._stack:
+                self._resume()
+
+    def wrap(self, iterable, name):
+        """Yields from `iterable`, accounting the work of each step to `name`."""
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    value = next(iterator)
+                except StopIteration:
+                    return
+            yield value
+
+    def report(self):
+        """
+        Writes the report (profile.txt) and cProfile files loadable by pstats,
+        snakeviz and similar viewers: one per phase and one for the whole run.
+        :return: Path of the text report.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        out = io.StringIO()
+        out.write("Phase                 wall (s)     calls   peak (MiB)   net (MiB)\n")
+        for name, phase in sorted(
+            self.phases.items(), key=lambda p: p[1]["seconds"], reverse=True
+        ):
+            out.write(
+                f"{name:<20} {phase['seconds']:>9.3f} {phase['calls']:>9} "
+                f"{phase['peak'] / 2**20:>12.2f} {phase['net'] / 2**20:>11.2f}\n"
+            )
+
+        combined = None
+        for name, phase in self.phases.items():
+            filename = name.replace(" ", "_")
+            stats = pstats.Stats(phase["profile"], stream=out)
+            stats.dump_stats(os.path.join(self.output_dir, f"{filename}.prof"))
+            if combined is None:
+                combined = pstats.Stats(phase["profile"], stream=out)
+            else:
+                combined.add(phase["profile"])
+
+            out.write(f"\n=== {name}: hottest functions ===\n")
+            stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+
+        if combined is not None:
+            combined.dump_stats(os.path.join(self.output_dir, "run.prof"))
+
+        out.write("\n=== Largest live allocations at the end of the run ===\n")
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+            out.write(f"{stat}\n")
+
+        path = os.path.join(self.output_dir, "profile.txt")
+        with open(path, "w") as f:
+            f.write(out.getvalue())
+        print(f"\nProfile written to {path} (cProfile files: {self.output_dir}/*.prof)")
+        return path
@@ -0,0 +1,221 @@
+"""
+Reconcile mode: bring Clockify in line with the sources for a window.
+
+The entries ClockiPush created are known from the journal by their stable
+source key (event:<calendar event id>, issue:<org/repo#n>:<date>). Reconcile
+compares them with the items the sources produce now and makes only the
+changes needed:
+
+    new key                     -> create (matched by AI as usual)
+    same key, moved or renamed  -> update the existing entry
+    key gone (cancelled event)  -> delete
+
+Unchanged entries cost neither AI nor Clockify calls. Creates and updates run
+`concurrency` at a time and deletes go out in bulk requests; the journal is
+only written from the calling thread.
+"""
+
+import concurrent.futures
+import contextlib
+import functools
+
+from src import pipeline
+from src.pipeline import CYAN, GREEN, RESET
+
+DEFAULT_CONCURRENCY = 4
+DELETE_BATCH_SIZE = 50
+# Entries are deleted only for sources that are fully re-read for the window.
+# Issue entries of earlier days are not produced again by a later sync, so
+# they are never deleted.
+DELETABLE_TYPES = ("event",)
+
+
+def diff(items, records, time_min, time_max, allow_delete=True):
+    """
+    Compares the desired items of a window with the journaled entries.
+
+    :param records: Confirmed journal records (see `Journal.confirmed`).
+    :param time_min, time_max: The window as ISO strings; only entries that
+        start inside it can be deleted.
+    :param allow_delete: False when `items` may be incomplete (a source could
+        not be read in full), so missing keys must not be taken as deletions.
+    :return: Dict with 'create' (items), 'update' ((item, record) pairs),
+        'delete' (records) and 'unchanged' (count).
+    """
+    by_key = {record["k"]: record for record in records}
+    changes = {"create": [], "update": [], "delete": [], "unchanged": 0}
+    desired = set()
+
+    for item in items:
+        desired.add(item.key)
+        record = by_key.get(item.key)
+        if not record:
+            changes["create"].append(item)
+        elif (record["st"], record["en"], record["d"]) == (
+            item.start_iso,
+            item.end_iso,
+            item.description,
+        ):
+            changes["unchanged"] += 1
+        else:
+            changes["update"].append((item, record))
+
+    for key, record in by_key.items():
+        if (
+            allow_delete
+            and key not in desired
+            and key.split(":", 1)[0] in DELETABLE_TYPES
+            and time_min <= record["st"] < time_max
+        ):
+            changes["delete"].append(record)
+    return changes
+
+
+def _run_bounded(calls, concurrency):
+    """Runs (key, fn) calls on a thread pool, yielding (key, result, error)."""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(fn): key for key, fn in calls}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+def reconcile_sink(
+    changes,
+    clockify_client,
+    matcher,
+    catalog,
+    journal,
+    load_signatures,
+    store=None,
+    dry_run=False,
+    concurrency=DEFAULT_CONCURRENCY,
+    chunk_size=pipeline.DEFAULT_CHUNK_SIZE,
+    phase=None,
+):
+    """
+    Applies the changes computed by `diff` to Clockify.
+
+    New items are checked against `load_signatures` (entries created before the
+    journal knew them) and matched; renamed entries are matched again, moved
+    ones keep their project and task. With a store (`EntryStore`), the local
+    mirror is updated as entries are written and deleted.
+
+    :param phase: Returns a context manager for each step by name ('existing
+        entries', 'matching', 'writes'), e.g. to profile them.
+    :return: Dict of counters {'created', 'updated', 'deleted', 'unchanged', 'failed'}
+    """
+    summary = {
+        "created": 0,
+        "updated": 0,
+        "deleted": 0,
+        "unchanged": changes["unchanged"],
+        "failed": 0,
+    }
+    print(
+        f"\nReconcile: {len(changes['create'])} new, {len(changes['update'])} "
+        f"changed, {len(changes['delete'])} removed, {changes['unchanged']} unchanged"
+    )
+
+    phase = phase or (lambda name: contextlib.nullcontext())
+    with phase("existing entries"):
+        creates = list(pipeline.dedupe(changes["create"], load_signatures))
+    renamed = [
+        item for item, record in changes["update"] if item.description != record["d"]
+    ]
+    with phase("matching"):
+        matches = {
+            item.key: item_match
+            for item, item_match in pipeline.match(
+                creates + renamed, matcher, catalog, chunk_size=chunk_size
+            )
+        }
+
+    # (item, project_id, task_id, existing entry id or None)
+    writes = []
+    for item in creates:
+        item_match = matches.get(item.key)
+        if not (item_match and item_match["project_id"] and item_match["task_id"]):
+            print(f"\nItem: {CYAN}{item.description}{RESET}")
+            print("  -> No suitable match found.")
+            continue
+        writes.append((item, item_match["project_id"], item_match["task_id"], None))
+    for item, record in changes["update"]:
+        item_match = matches.get(item.key)
+        if item_match and item_match["project_id"] and item_match["task_id"]:
+            writes.append(
+                (item, item_match["project_id"], item_match["task_id"], record["id"])
+            )
+        else:
+            writes.append((item, record["p"], record["t"], record["id"]))
+
+    for item, project_id, task_id, entry_id in writes:
+        p_name, t_name = catalog.names(project_id, task_id)
+        action = "Update" if entry_id else "Create"
+        print(
+            f"\n{action}: {CYAN}{item.description}{RESET} "
+            f"({item.start_iso} - {item.end_iso}) -> "
+            f"Project='{p_name}', Task='{GREEN}{t_name}{RESET}'"
+        )
+    for record in changes["delete"]:
+        print(f"\nDelete: {CYAN}{record['d']}{RESET} ({record['st']} - {record['en']})")
+
+    if dry_run:
+        print("\nDry run: Skipping writes.")
+        return summary
+
+    with phase("writes"):
+        calls = []
+        for item, project_id, task_id, entry_id in writes:
+            journal.plan(item, project_id, task_id, entry_id=entry_id)
+            fields = {
+                "description": item.description,
+                "start_time": item.start_iso,
+                "end_time": item.end_iso,
+                "project_id": project_id,
+                "task_id": task_id,
+            }
+            if entry_id:
+                call = functools.partial(
+                    clockify_client.update_time_entry, entry_id, **fields
+                )
+            else:
+                call = functools.partial(clockify_client.add_time_entry, **fields)
+            calls.append(((item.key, bool(entry_id)), call))
+
+        for (key, updated), entry, error in _run_bounded(calls, concurrency):
+            if error:
+                summary["failed"] += 1
+                print(f"  -> Failed to write entry for {key}: {error}")
+                if pipeline.rejected(error, updated):
+                    journal.fail(key)
+                elif updated:
+                    journal.abort_update(key)
+                continue
+            journal.confirm(key, entry.get("id"))
+            if store:
+                store.add(entry)
+            summary["updated" if updated else "created"] += 1
+
+        deletes = changes["delete"]
+        for batch in pipeline.chunked(deletes, DELETE_BATCH_SIZE):
+            try:
+                clockify_client.delete_time_entries([record["id"] for record in batch])
+            except Exception as e:
+                summary["failed"] += len(batch)
+                print(f"  -> Failed to delete {len(batch)} entries: {e}")
+                continue
+            if store:
+                store.delete([record["id"] for record in batch])
+            for record in batch:
+                journal.delete(record["k"])
+            summary["deleted"] += len(batch)
+
+        print(
+            f"\nReconciled: {summary['created']} created, {summary['updated']} updated, "
+            f"{summary['deleted']} deleted, {summary['unchanged']} unchanged, "
+            f"{summary['failed']} failed"
+        )
+    return summary
@@ -0,0 +1,82 @@
+"""
+Keyword rules for matching items without calling OpenAI.
+
+The rules are the guidelines given to the AI in its prompt, applied locally.
+They are much less accurate than a model, so they are only used when the AI
+budget is spent (see `src.usage`).
+"""
+
+import re
+
+from src.catalog import Catalog
+
+# (pattern on the description, task name prefixes to try in order)
+RULES = [
+    (
+        re.compile(
+            r"\b(standup|stand-up|sync|discussion|call|retro|retrospective|"
+            r"refinement|sprint)\b",
+            re.IGNORECASE,
+        ),
+        ("meetings - internal", "meetings"),
+    ),
+    (re.compile(r"\b(update|upgrade|deploy)", re.IGNORECASE), ("deployments",)),
+    (re.compile(r"\b[A-Z][A-Z0-9]+-\d+\b"), ("consultancy", "support")),
+    (
+        re.compile(r"\b(research|analy[sz]e|investigate)", re.IGNORECASE),
+        ("research",),
+    ),
+]
+# Tasks for items no rule matches, by item type
+DEFAULT_TASKS = {"issue": ("backlog",), "event": ("meetings",)}
+
+
+class RuleMatcher:
+    def __init__(self):
+        self.stats = {"items": 0, "matched": 0}
+
+    @property
+    def name(self):
+        return "rules"
+
+    def _find_task(self, catalog, prefixes):
+        for prefix in prefixes:
+            task_ids = catalog.find_tasks_by_prefix(prefix)
+            if task_ids:
+                return catalog.task_project(task_ids[0]), task_ids[0]
+        return None, None
+
+    def match(self, item, catalog):
+        """Returns the match for one item; ids are None when no rule applies."""
+        for pattern, prefixes in RULES:
+            found = pattern.search(item.description)
+            if found:
+                project_id, task_id = self._find_task(catalog, prefixes)
+                if task_id:
+                    return {
+                        "project_id": project_id,
+                        "task_id": task_id,
+                        "reasoning": f"Rule: '{found.group(0)}'.",
+                        "confidence": 0.5,
+                    }
+
+        project_id, task_id = self._find_task(catalog, DEFAULT_TASKS.get(item.type, ()))
+        return {
+            "project_id": project_id,
+            "task_id": task_id,
+            "reasoning": f"Rule: default for {item.type}." if task_id else "No rule.",
+            "confidence": 0.5 if task_id else None,
+        }
+
+    def iter_match_tasks(self, items, catalog):
+        """Same interface as `AIMatcher.iter_match_tasks`."""
+        catalog = Catalog.coerce(catalog)
+        for item in items:
+            match = self.match(item, catalog)
+            self.stats["items"] += 1
+            if match["task_id"]:
+                self.stats["matched"] += 1
+            yield item.id, match
+
+    def batch_match_tasks(self, items, catalog):
+        return dict(self.iter_match_tasks(items, catalog))
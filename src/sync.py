@@ -0,0 +1,682 @@
+import contextlib
+import datetime
+import getpass
+import itertools
+import os
+import time
+
+from src.calendar_client import CalendarClient
+from src.clockify_client import ClockifyClient
+from src.ai_matcher import AIMatcher
+from src.ai_batch import collect_batch_job, read_batch_job, submit_batch_job
+from src.catalog import Catalog
+from src.entry_store import EntryStore
+from src.history_matcher import HistoryMatcher
+from src.journal import Journal
+from src.models import ExistingEntry, format_iso
+from src.usage import Usage, parse_prices
+from src.plan import plan_sink, read_plan
+from src.reconcile import diff, reconcile_sink
+from src import concurrency, pipeline
+
+
+def load_config():
+    """Reads the sync configuration from the environment."""
+    return {
+        "clockify_api_key": os.getenv("CLOCKIFY_API_KEY"),
+        "clockify_workspace_id": os.getenv("CLOCKIFY_WORKSPACE_ID"),
+        "openai_api_key": os.getenv("OPENAI_API_KEY"),
+        "openai_base_url": os.getenv("OPENAI_BASE_URL"),
+        "service_account_file": os.getenv(
+            "GOOGLE_SERVICE_ACCOUNT_FILE", "service_account.json"
+        ),
+        "calendar_id": os.getenv("GOOGLE_CALENDAR_ID", "primary"),
+        "target_project_name": os.getenv("CLOCKIFY_PROJECT_NAME"),
+        "ai_model": os.getenv("AI_MODEL", "gpt-4o"),
+        "ai_fast_model": os.getenv("AI_FAST_MODEL", "gpt-4o-mini"),
+        "ai_confidence_threshold": float(os.getenv("AI_CONFIDENCE_THRESHOLD", 0.7)),
+        "ai_stream": os.getenv("AI_STREAM", "0") == "1",
+        "ai_usage_file": os.getenv("AI_USAGE_FILE", ".clockipush/usage.jsonl"),
+        "ai_run_budget": float(os.getenv("AI_RUN_BUDGET", 0)),
+        "ai_daily_budget": float(os.getenv("AI_DAILY_BUDGET", 0)),
+        "ai_prices": parse_prices(os.getenv("AI_PRICES", "")),
+        "user": os.getenv("CLOCKIPUSH_USER") or getpass.getuser(),
+        "ai_chunk_size": int(os.getenv("AI_CHUNK_SIZE", pipeline.DEFAULT_CHUNK_SIZE)),
+        "ai_batch_file": os.getenv("AI_BATCH_FILE", ".clockipush/batch.json"),
+        "ai_batch_poll_interval": int(os.getenv("AI_BATCH_POLL_INTERVAL", 60)),
+        "catalog_ttl": int(os.getenv("CATALOG_TTL", 3600)),
+        "catalog_file": os.getenv("CATALOG_FILE", ".clockipush/catalog.json"),
+        "history_matcher": os.getenv("HISTORY_MATCHER", "1") == "1",
+        "history_model_file": os.getenv(
+            "HISTORY_MODEL_FILE", ".clockipush/history.npz"
+        ),
+        "history_days": int(os.getenv("HISTORY_DAYS", 365)),
+        "history_overlap_days": int(os.getenv("HISTORY_OVERLAP_DAYS", 7)),
+        "github_scopes": [
+            s.strip() for s in os.getenv("GITHUB_SCOPES", "").split(",") if s.strip()
+        ],
+        "github_concurrency": int(os.getenv("GITHUB_CONCURRENCY", 4)),
+        "history_threshold": float(os.getenv("HISTORY_THRESHOLD", 0.6)),
+        "journal_file": os.getenv("JOURNAL_FILE", ".clockipush/journal.jsonl"),
+        "journal_retention_days": int(os.getenv("JOURNAL_RETENTION_DAYS", 180)),
+        "reconcile_concurrency": int(os.getenv("RECONCILE_CONCURRENCY", 4)),
+        "entry_store": os.getenv("ENTRY_STORE", "1") == "1",
+        "entry_store_file": os.getenv(
+            "ENTRY_STORE_FILE", ".clockipush/entries.sqlite3"
+        ),
+        "entry_store_overlap_days": int(os.getenv("ENTRY_STORE_OVERLAP_DAYS", 3)),
+    }
+
+
+def to_iso(dt):
+    return dt.isoformat().replace("+00:00", "Z")
+
+
+def get_time_window(now, days=1, today=False):
+    """Returns (time_min, time_max, buffer_min) as UTC datetimes."""
+    if today:
+        # Start of today (00:00:00 UTC)
+        time_min = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        # Buffer min is 1 day before start of day
+        buffer_min = time_min - datetime.timedelta(days=1)
+    else:
+        time_min = now - datetime.timedelta(days=days)
+        buffer_min = now - datetime.timedelta(days=days + 1)
+    return time_min, now, buffer_min
+
+
+def get_day_window(day, now):
+    """Returns (time_min, time_max, buffer_min) covering a single UTC day."""
+    time_min = datetime.datetime.combine(day, datetime.time(), datetime.timezone.utc)
+    time_max = min(now, time_min + datetime.timedelta(days=1))
+    return time_min, time_max, time_min - datetime.timedelta(days=1)
+
+
+class SyncSession:
+    """
+    Clients and caches shared between syncs.
+
+    A one-off run uses a single session for a single sync. In daemon mode the
+    session stays alive, so Google credentials, HTTP connections and the
+    Clockify project catalog are reused by every sync it runs.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.calendar_client = CalendarClient(
+            service_account_file=config["service_account_file"]
+        )
+        self.clockify_client = ClockifyClient(
+            api_key=config["clockify_api_key"],
+            workspace_id=config["clockify_workspace_id"],
+        )
+        # Matchers form a cascade: history -> fast model -> strong model, each
+        # passing the items it is unsure about to the next.
+        self.usage = Usage(
+            path=config["ai_usage_file"],
+            user=config["user"],
+            run_budget=config["ai_run_budget"],
+            daily_budget=config["ai_daily_budget"],
+            prices=config["ai_prices"],
+        )
+        self.ai_matcher = None
+        self.matcher = None
+        if config["openai_api_key"]:
+            self.ai_matcher = AIMatcher(
+                api_key=config["openai_api_key"],
+                model=config["ai_model"],
+                stream=config["ai_stream"],
+                base_url=config["openai_base_url"],
+                usage=self.usage,
+            )
+            self.matcher = self.ai_matcher
+            if config["ai_fast_model"]:
+                self.matcher = AIMatcher(
+                    api_key=config["openai_api_key"],
+                    model=config["ai_fast_model"],
+                    stream=config["ai_stream"],
+                    base_url=config["openai_base_url"],
+                    fallback=self.ai_matcher,
+                    threshold=config["ai_confidence_threshold"],
+                    usage=self.usage,
+                )
+        self.history_matcher = None
+        if config["history_matcher"] and self.ai_matcher:
+            self.history_matcher = HistoryMatcher(
+                fallback=self.matcher,
+                path=config["history_model_file"],
+                threshold=config["history_threshold"],
+                before_match=self._update_history,
+            )
+            self.matcher = self.history_matcher
+        # The history model is updated once per sync, when first needed
+        self._history_stale = True
+        self.journal = Journal(
+            config["journal_file"], retention_days=config["journal_retention_days"]
+        )
+        self._catalog = None
+        self._catalog_fetched_at = 0
+        self._entry_store = None
+        # A `PhaseProfiler` when running with --profile
+        self.profiler = None
+
+    def _phase(self, name):
+        """Profiles a block as phase `name` when profiling."""
+        if self.profiler:
+            return self.profiler.phase(name)
+        return contextlib.nullcontext()
+
+    def _stage(self, iterable, name, maxsize):
+        """
+        Runs a pipeline stage in a background thread, or, when profiling, in
+        this thread as phase `name` so its cost is attributed to it.
+        """
+        if self.profiler:
+            return self.profiler.wrap(iterable, name)
+        return pipeline.prefetch(iterable, maxsize=maxsize)
+
+    @property
+    def entry_store(self):
+        """The local mirror of Clockify entries, or None if disabled."""
+        if self._entry_store is None and self.config["entry_store"]:
+            owner = (
+                f"{self.config['clockify_workspace_id']}/"
+                f"{self.clockify_client.get_current_user_id()}"
+            )
+            self._entry_store = EntryStore(
+                self.config["entry_store_file"],
+                owner=owner,
+                overlap_days=self.config["entry_store_overlap_days"],
+            )
+        return self._entry_store
+
+    def _load_cached_catalog(self):
+        """
+        The catalog saved by an earlier run, if still fresh and for the same
+        workspace and project filter.
+        """
+        path = self.config["catalog_file"]
+        try:
+            fetched_at = os.path.getmtime(path)
+            if time.time() - fetched_at > self.config["catalog_ttl"]:
+                return None, 0
+            catalog, meta = Catalog.load(path)
+        except (OSError, ValueError, KeyError):
+            return None, 0
+        if (
+            meta.get("workspace_id") != self.config["clockify_workspace_id"]
+            or meta.get("project_name") != self.config["target_project_name"]
+        ):
+            return None, 0
+        return catalog, fetched_at
+
+    def get_catalog(self, refresh=False):
+        """
+        Returns the Clockify project/task catalog.
+
+        Cached in memory and in `catalog_file` for `catalog_ttl` seconds, so
+        neither daemon syncs nor back-to-back runs download it again.
+        """
+        if not refresh and self._catalog is None:
+            self._catalog, self._catalog_fetched_at = self._load_cached_catalog()
+
+        age = time.time() - self._catalog_fetched_at
+        if refresh or self._catalog is None or age > self.config["catalog_ttl"]:
+            print("Fetching Clockify projects and tasks...")
+            target_project_name = self.config["target_project_name"]
+            projects_with_tasks = []
+            for project in self.clockify_client.get_projects(
+                name=target_project_name, hydrated=True
+            ):
+                # Keep the exact check in case the server-side search is looser
+                if target_project_name and project["name"] != target_project_name:
+                    continue
+
+                if project.get("tasks") is None:
+                    project["tasks"] = self.clockify_client.get_tasks(project["id"])
+                projects_with_tasks.append(project)
+
+            self._catalog = Catalog(projects_with_tasks)
+            self._catalog_fetched_at = time.time()
+            try:
+                if self._catalog:
+                    self._catalog.save(
+                        self.config["catalog_file"],
+                        workspace_id=self.config["clockify_workspace_id"],
+                        project_name=target_project_name,
+                    )
+            except OSError as e:
+                print(f"Warning: Could not cache the catalog ({e}).")
+        return self._catalog
+
+    def _update_history(self):
+        """
+        Brings the history model up to date, at most once per sync. Reads the
+        local entry mirror when enabled, which dedupe has just refreshed.
+        """
+        if not self._history_stale:
+            return
+        self._history_stale = False
+        days = self.config["history_days"]
+        overlap_days = self.config["history_overlap_days"]
+        try:
+            with self._phase("history"):
+                if self.entry_store:
+                    self.history_matcher.update_from_store(
+                        self.entry_store,
+                        self.clockify_client,
+                        days=days,
+                        overlap_days=overlap_days,
+                    )
+                else:
+                    self.history_matcher.update_from_clockify(
+                        self.clockify_client, days=days, overlap_days=overlap_days
+                    )
+        except Exception as e:
+            print(f"Warning: Could not update the history model ({e}).")
+
+    def get_existing_signatures(self, buffer_min, time_max):
+        """Returns the set of (start, description) already booked in Clockify."""
+        try:
+            if self.entry_store:
+                self.entry_store.refresh(self.clockify_client, buffer_min, time_max)
+                return self.entry_store.signatures(buffer_min, time_max)
+
+            print("Fetching existing time entries...")
+            existing_entries = self.clockify_client.get_time_entries(
+                buffer_min, time_max
+            )
+        except Exception as e:
+            print(
+                f"Warning: Could not fetch existing entries ({e}). Duplicate prevention might fail."
+            )
+            return set()
+
+        # Signatures are (start_time, description)
+        return {ExistingEntry.from_api(entry).signature for entry in existing_entries}
+
+    def sync(
+        self,
+        time_min_dt,
+        time_max_dt,
+        buffer_min_dt,
+        dry_run=False,
+        predicate=None,
+        now=None,
+        plan_path=None,
+        ai_batch=False,
+    ):
+        """
+        Runs one sync over the window.
+
+        :param predicate: Optional filter on sync items, used to re-sync a single
+            item (e.g. one GitHub issue) instead of everything in the window.
+        :param plan_path: Write the matched items to this plan file instead of
+            creating time entries.
+        :param ai_batch: Submit the items as an OpenAI batch job instead of
+            matching them now; see `collect_batch`.
+        :return: The sink summary, or None if the catalog is empty.
+        """
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        chunk_size = self.config["ai_chunk_size"]
+        target_project_name = self.config["target_project_name"]
+
+        with self._phase("catalog"):
+            catalog = self.get_catalog()
+        if not catalog:
+            print(
+                f"Error: No projects found matching '{target_project_name}'"
+                if target_project_name
+                else "Error: No projects found."
+            )
+            return None
+
+        self._history_stale = True
+        time_min = to_iso(time_min_dt)
+        time_max = to_iso(time_max_dt)
+
+        # Buffer by 1 extra day to catch events that started before time_min but overlap
+        def load_signatures():
+            return self.get_existing_signatures(to_iso(buffer_min_dt), time_max)
+
+        # sources -> normalize -> dedupe -> match -> sink
+        items = self._source_items(time_min_dt, time_max_dt, now)
+        if predicate:
+            items = pipeline.select(items, predicate)
+        items = self._stage(
+            pipeline.dedupe(items, load_signatures, journal=self.journal),
+            "existing entries",
+            chunk_size,
+        )
+        if ai_batch:
+            with self._phase("matching"):
+                return self._submit_batch(
+                    list(items),
+                    catalog,
+                    {"time_min": time_min, "time_max": time_max},
+                    dry_run=dry_run,
+                )
+
+        matched = self._stage(
+            pipeline.match(items, self.matcher, catalog, chunk_size=chunk_size),
+            "matching",
+            chunk_size,
+        )
+        if plan_path:
+            with self._phase("writes"):
+                summary = plan_sink(
+                    matched,
+                    plan_path,
+                    catalog,
+                    meta={"time_min": time_min, "time_max": time_max},
+                )
+            pipeline.report_tiers(self.matcher)
+            self.usage.report()
+            concurrency.report()
+            return summary
+
+        with self._phase("writes"):
+            summary = pipeline.clockify_sink(
+                matched,
+                self.clockify_client,
+                catalog,
+                dry_run=dry_run,
+                journal=self.journal,
+                store=self.entry_store,
+            )
+        pipeline.report_tiers(self.matcher)
+        self.usage.report()
+        concurrency.report()
+        self.journal.maybe_compact()
+        return summary
+
+    def _source_items(self, time_min_dt, time_max_dt, now, stats=None):
+        """
+        The normalized calendar and GitHub items of the window.
+
+        :param stats: Dict the stages add their counters to, e.g.
+            'calendar_incomplete' when events had to be skipped.
+        """
+        stats = {} if stats is None else stats
+        events = pipeline.normalize_events(
+            pipeline.calendar_source(
+                self.calendar_client,
+                to_iso(time_min_dt),
+                to_iso(time_max_dt),
+                calendar_id=self.config["calendar_id"],
+                stats=stats,
+            ),
+            stats,
+        )
+        issues = pipeline.normalize_issues(
+            pipeline.github_source(
+                self.config["github_scopes"],
+                concurrency=self.config["github_concurrency"],
+            ),
+            stats,
+            time_min_dt,
+            time_max_dt,
+            target_project_name=self.config["target_project_name"],
+            now=now,
+        )
+        if self.profiler:
+            events = self.profiler.wrap(events, "calendar")
+            issues = self.profiler.wrap(issues, "github")
+        return itertools.chain(events, issues)
+
+    def reconcile(
+        self, time_min_dt, time_max_dt, buffer_min_dt, dry_run=False, now=None
+    ):
+        """
+        Makes the entries ClockiPush created for the window match the sources:
+        creates new items, updates moved or renamed ones and deletes those whose
+        calendar event is gone. See `src.reconcile`.
+
+        :return: The reconcile summary, or None if the catalog is empty.
+        """
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        self._history_stale = True
+        with self._phase("catalog"):
+            catalog = self.get_catalog()
+        if not catalog:
+            print("Error: No projects found.")
+            return None
+
+        stats = {}
+        items = list(self._source_items(time_min_dt, time_max_dt, now, stats=stats))
+        if stats.get("calendar_incomplete"):
+            print(
+                "Warning: Some calendar events could not be read; "
+                "no entries will be deleted in this run."
+            )
+        changes = diff(
+            items,
+            self.journal.confirmed(),
+            format_iso(time_min_dt),
+            format_iso(time_max_dt),
+            allow_delete=not stats.get("calendar_incomplete"),
+        )
+
+        def load_signatures():
+            return self.get_existing_signatures(
+                to_iso(buffer_min_dt), to_iso(time_max_dt)
+            )
+
+        summary = reconcile_sink(
+            changes,
+            self.clockify_client,
+            self.matcher,
+            catalog,
+            self.journal,
+            load_signatures,
+            store=self.entry_store,
+            dry_run=dry_run,
+            concurrency=self.config["reconcile_concurrency"],
+            chunk_size=self.config["ai_chunk_size"],
+            phase=self._phase,
+        )
+        pipeline.report_tiers(self.matcher)
+        self.usage.report()
+        concurrency.report()
+        self.journal.maybe_compact()
+        return summary
+
+    def _submit_batch(self, items, catalog, meta, dry_run=False):
+        local_matches = {}
+        if self.history_matcher and items:
+            local_matches, _ = self.history_matcher.split(items, catalog)
+        if self.usage.exhausted():
+            # Out of budget: the keyword rules answer instead of a batch
+            rest = [item for item in items if item.id not in local_matches]
+            local_matches.update(self.ai_matcher.rules.batch_match_tasks(rest, catalog))
+        return submit_batch_job(
+            items,
+            self.ai_matcher,
+            catalog,
+            self.config["ai_batch_file"],
+            self.config["ai_chunk_size"],
+            local_matches=local_matches,
+            meta=meta,
+            dry_run=dry_run,
+        )
+
+    def has_pending_batch(self):
+        return os.path.exists(self.config["ai_batch_file"])
+
+    def collect_batch(self, dry_run=False, plan_path=None, wait=False):
+        """
+        Writes the entries of the batch job submitted by an earlier `--ai-batch`
+        run, once OpenAI has finished it.
+
+        :param wait: Poll every `ai_batch_poll_interval` seconds until the
+            batch is done, instead of returning while it is still running.
+        :return: The sink summary, or None if the batch is not done yet.
+        """
+        path = self.config["ai_batch_file"]
+        state, items = read_batch_job(path)
+        with self._phase("catalog"):
+            catalog = self.get_catalog()
+
+        while True:
+            with self._phase("matching"):
+                status, matches = collect_batch_job(
+                    state, items, self.ai_matcher, catalog
+                )
+            if matches is not None:
+                break
+            print(f"Batch {state['batch_id']} is {status}.")
+            if not wait:
+                return None
+            time.sleep(self.config["ai_batch_poll_interval"])
+        print(f"Batch {state['batch_id'] or '(local only)'} is {status}.")
+
+        if plan_path:
+            summary = plan_sink(
+                ((item, matches.get(item.id)) for item in items),
+                plan_path,
+                catalog,
+                meta={
+                    "time_min": state.get("time_min"),
+                    "time_max": state.get("time_max"),
+                },
+            )
+        else:
+
+            def load_signatures():
+                return self.get_existing_signatures(
+                    format_iso(min(item.start for item in items)),
+                    format_iso(max(item.end for item in items)),
+                )
+
+            # Entries may have been booked since the batch was submitted
+            deduped = pipeline.dedupe(items, load_signatures, journal=self.journal)
+            with self._phase("writes"):
+                summary = pipeline.clockify_sink(
+                    ((item, matches.get(item.id)) for item in deduped),
+                    self.clockify_client,
+                    catalog,
+                    dry_run=dry_run,
+                    journal=self.journal,
+                    store=self.entry_store,
+                )
+            self.journal.maybe_compact()
+
+        self.usage.report()
+        concurrency.report()
+        if not dry_run:
+            os.remove(path)
+        return summary
+
+    def apply(self, plan_path, dry_run=False):
+        """
+        Creates the time entries of a plan written with `plan_path`.
+
+        Nothing is fetched from Google Calendar, GitHub or OpenAI. Items the
+        journal already confirms are skipped; the rest are checked against the
+        existing entries over the plan's span, fetched once.
+        """
+        print(f"Applying plan {plan_path}...")
+        items, matches, catalog = read_plan(plan_path)
+        if not items:
+            print("\nNo items to sync.")
+            return None
+
+        def load_signatures():
+            return self.get_existing_signatures(
+                format_iso(min(item.start for item in items)),
+                format_iso(max(item.end for item in items)),
+            )
+
+        items = pipeline.dedupe(items, load_signatures, journal=self.journal)
+        with self._phase("writes"):
+            summary = pipeline.clockify_sink(
+                ((item, matches[item.key]) for item in items),
+                self.clockify_client,
+                catalog,
+                dry_run=dry_run,
+                journal=self.journal,
+                store=self.entry_store,
+            )
+        self.journal.maybe_compact()
+        return summary
+
+    def resume(self, dry_run=False):
+        """
+        Replays journaled entries that were planned but never confirmed.
+
+        No calendar, GitHub or AI calls are made. The process may have died after
+        Clockify accepted an entry but before it was confirmed, so the span of
+        the pending entries is looked up once before anything is re-submitted.
+        """
+        pending = self.journal.unconfirmed()
+        if not pending:
+            print("Journal: nothing to resume.")
+            return
+
+        print(f"Resuming {len(pending)} unconfirmed entries from the journal...")
+        with self._phase("existing entries"):
+            existing_ids = self._existing_ids(pending)
+        with self._phase("writes"):
+            self._replay(pending, existing_ids, dry_run)
+
+    def _existing_ids(self, pending):
+        """
+        Looks up the span of the pending records in Clockify.
+
+        :return: {(start, description): entry id}, or None if the entry store
+            holds them.
+        """
+        span = (min(r["st"] for r in pending), max(r["en"] for r in pending))
+        if self.entry_store:
+            # Re-read the span so entries accepted before a crash are found
+            self.entry_store.replace_range(
+                span[0], span[1], self.clockify_client.iter_time_entries(*span)
+            )
+            return None
+        existing = self.clockify_client.get_time_entries(*span)
+        return {
+            entry.signature: entry.id for entry in map(ExistingEntry.from_api, existing)
+        }
+
+    def _replay(self, pending, existing_ids, dry_run):
+        """Writes the pending records that did not reach Clockify."""
+        store = self.entry_store
+        for record in pending:
+            print(f"\nItem: {pipeline.CYAN}{record['d']}{pipeline.RESET}")
+            if store:
+                entry_id = store.find(record["st"], record["d"])
+            else:
+                entry_id = existing_ids.get((record["st"], record["d"]))
+            if entry_id:
+                print("  -> Already in Clockify, confirming.")
+                self.journal.confirm(record["k"], entry_id)
+                continue
+            if dry_run:
+                print("  -> Dry run: Skipping write.")
+                continue
+
+            # A record with an id is an interrupted update of a moved or
+            # renamed entry; it is created again if the entry is gone
+            entry_id = record.get("id")
+            try:
+                entry = pipeline._write_entry(
+                    self.clockify_client,
+                    entry_id,
+                    description=record["d"],
+                    start_time=record["st"],
+                    end_time=record["en"],
+                    project_id=record["p"],
+                    task_id=record["t"],
+                )
+            except Exception as e:
+                print(f"  -> Failed to add time entry: {e}")
+                if pipeline.rejected(e, bool(entry_id)):
+                    self.journal.fail(record["k"])
+                continue
+            self.journal.confirm(record["k"], entry.get("id"))
+            if store:
+                store.add(entry)
+            if entry_id and entry.get("id") == entry_id:
+                print("  -> Time entry updated successfully.")
+            else:
+                print("  -> Time entry added successfully.")
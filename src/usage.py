@@ -0,0 +1,272 @@
+"""
+Token, latency and cost accounting for OpenAI calls, with budget limits.
+
+Every call the AI matcher makes is recorded with its prompt, cached and
+completion tokens, latency and estimated cost, and appended to a JSON lines
+ledger so spend can be aggregated per run, per day and per user:
+
+    {"ts": unix_time, "day": "2026-10-18", "user": "...", "model": "...",
+     "pt": prompt_tokens, "ct": completion_tokens, "cached": cached_tokens,
+     "latency": seconds, "cost": usd, "batch": false}
+
+Once the run or daily budget is spent, `exhausted()` turns true and the
+matcher stops calling OpenAI (see `AIMatcher`).
+
+`python -m src.usage [--days N]` prints the ledger per day, user and model.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import time
+
+from src.files import ensure_dir
+
+# USD per 1M tokens: (input, cached input, output). Longest matching prefix
+# wins. Other models can be priced with AI_PRICES (see `parse_prices`).
+PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+}
+BATCH_DISCOUNT = 0.5
+
+
+def _today():
+    return datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+
+
+def _token_counts(usage):
+    """(prompt, completion, cached) tokens from an API usage object or dict."""
+    if usage is None:
+        return 0, 0, 0
+    if isinstance(usage, dict):
+        details = usage.get("prompt_tokens_details") or {}
+        return (
+            usage.get("prompt_tokens") or 0,
+            usage.get("completion_tokens") or 0,
+            details.get("cached_tokens") or 0,
+        )
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (
+        getattr(usage, "prompt_tokens", 0) or 0,
+        getattr(usage, "completion_tokens", 0) or 0,
+        getattr(details, "cached_tokens", 0) or 0,
+    )
+
+
+def parse_prices(text):
+    """
+    Parses extra model prices, e.g. "o4-mini=1.10/0.275/4.40,local=0/0/0"
+    (USD per 1M input, cached input and output tokens).
+    """
+    prices = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        try:
+            model, values = part.split("=")
+            input_price, cached_price, output_price = map(float, values.split("/"))
+        except ValueError:
+            raise ValueError(f"Invalid AI_PRICES entry '{part.strip()}'")
+        prices[model.strip()] = (input_price, cached_price, output_price)
+    return prices
+
+
+def price_for(model, prices=None):
+    """(input, cached input, output) prices of `model`, or None if unknown."""
+    prices = PRICES if prices is None else prices
+    prefixes = [p for p in prices if model.startswith(p)]
+    if not prefixes:
+        return None
+    return prices[max(prefixes, key=len)]
+
+
+def estimate_cost(
+    model, prompt_tokens, completion_tokens, cached_tokens=0, batch=False, prices=None
+):
+    """Estimated USD cost of one call; 0 for models without a price."""
+    price = price_for(model, prices)
+    if price is None:
+        return 0.0
+    input_price, cached_price, output_price = price
+    cost = (
+        (prompt_tokens - cached_tokens) * input_price
+        + cached_tokens * cached_price
+        + completion_tokens * output_price
+    ) / 1_000_000
+    return cost * BATCH_DISCOUNT if batch else cost
+
+
+class Usage:
+    def __init__(self, path=None, user=None, run_budget=0, daily_budget=0, prices=None):
+        """
+        :param path: Ledger file (JSON lines), or None to keep nothing on disk.
+        :param user: Who the calls are accounted to.
+        :param run_budget: Max USD per run (0 for no limit).
+        :param daily_budget: Max USD per user and UTC day (0 for no limit).
+        :param prices: Prices of models not in (or overriding) `PRICES`.
+        """
+        self.path = path
+        self.prices = dict(PRICES, **(prices or {}))
+        self._unpriced = set()
+        self.user = user
+        self.run_budget = run_budget
+        self.daily_budget = daily_budget
+        self.run = self._empty()
+        self.day = _today()
+        self.day_cost = self._load_day_cost()
+        self._warned = False
+
+    @staticmethod
+    def _empty():
+        return {
+            "calls": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cached_tokens": 0,
+            "latency": 0.0,
+            "cost": 0.0,
+        }
+
+    def _load_day_cost(self):
+        """Today's spend for this user, from the ledger."""
+        if not self.path or not os.path.exists(self.path):
+            return 0.0
+        cost = 0.0
+        for record in read_ledger(self.path):
+            if record.get("day") == self.day and record.get("user") == self.user:
+                cost += record.get("cost", 0.0)
+        return cost
+
+    def record(self, model, usage, latency=None, batch=False):
+        """Accounts one API call. :return: Its estimated cost."""
+        prompt_tokens, completion_tokens, cached_tokens = _token_counts(usage)
+        cost = estimate_cost(
+            model,
+            prompt_tokens,
+            completion_tokens,
+            cached_tokens,
+            batch=batch,
+            prices=self.prices,
+        )
+        if price_for(model, self.prices) is None and model not in self._unpriced:
+            self._unpriced.add(model)
+            print(
+                f"Warning: No price known for model '{model}'; its calls count as "
+                f"$0 and budgets can't limit them. Set AI_PRICES to price it."
+            )
+
+        if _today() != self.day:
+            self.day = _today()
+            self.day_cost = 0.0
+        self.day_cost += cost
+        self.run["calls"] += 1
+        self.run["prompt_tokens"] += prompt_tokens
+        self.run["completion_tokens"] += completion_tokens
+        self.run["cached_tokens"] += cached_tokens
+        self.run["latency"] += latency or 0.0
+        self.run["cost"] += cost
+
+        print(
+            f"  -> {model}: {prompt_tokens} prompt ({cached_tokens} cached) + "
+            f"{completion_tokens} completion tokens"
+            + (f", {latency:.1f}s" if latency is not None else "")
+            + f", ${cost:.4f}"
+        )
+        if self.path:
+            record = {
+                "ts": int(time.time()),
+                "day": self.day,
+                "user": self.user,
+                "model": model,
+                "pt": prompt_tokens,
+                "ct": completion_tokens,
+                "cached": cached_tokens,
+                "latency": round(latency, 3) if latency is not None else None,
+                "cost": round(cost, 6),
+                "batch": batch,
+            }
+            ensure_dir(self.path)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        return cost
+
+    def exhausted(self):
+        """True once the run or daily budget is spent."""
+        over = (self.run_budget and self.run["cost"] >= self.run_budget) or (
+            self.daily_budget and self.day_cost >= self.daily_budget
+        )
+        if over and not self._warned:
+            print(
+                f"Warning: AI budget reached (run ${self.run['cost']:.2f}, "
+                f"today ${self.day_cost:.2f}); matching without OpenAI."
+            )
+            self._warned = True
+        return bool(over)
+
+    def report(self):
+        """Prints the totals of this run, then starts a new one."""
+        run = self.run
+        if run["calls"]:
+            cached_share = run["cached_tokens"] / max(1, run["prompt_tokens"])
+            print(
+                f"AI usage: {run['calls']} calls, {run['prompt_tokens']} prompt "
+                f"({run['cached_tokens']} cached, {cached_share:.0%}) + "
+                f"{run['completion_tokens']} "
+                f"completion tokens, {run['latency']:.1f}s, ${run['cost']:.4f} "
+                f"(today: ${self.day_cost:.4f})"
+            )
+        self.run = self._empty()
+        self._warned = False
+
+
+def read_ledger(path):
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def summarize(records, since=None):
+    """Totals per (day, user, model), for days on or after `since`."""
+    totals = {}
+    for record in records:
+        if since and record["day"] < since:
+            continue
+        key = (record["day"], record["user"], record["model"])
+        total = totals.setdefault(key, Usage._empty())
+        total["calls"] += 1
+        total["prompt_tokens"] += record["pt"]
+        total["completion_tokens"] += record["ct"]
+        total["cached_tokens"] += record["cached"]
+        total["latency"] += record["latency"] or 0.0
+        total["cost"] += record["cost"]
+    return totals
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Summarize AI usage.")
+    arg_parser.add_argument("--days", type=int, default=30)
+    arg_parser.add_argument(
+        "--file", default=os.getenv("AI_USAGE_FILE", ".clockipush/usage.jsonl")
+    )
+    args = arg_parser.parse_args()
+
+    since = (
+        datetime.datetime.now(datetime.timezone.utc).date()
+        - datetime.timedelta(days=args.days)
+    ).isoformat()
+    totals = summarize(read_ledger(args.file), since=since)
+    for (day, user, model), total in sorted(totals.items()):
+        print(
+            f"{day}  {user}  {model}: {total['calls']} calls, "
+            f"{total['prompt_tokens']} prompt ({total['cached_tokens']} cached) + "
+            f"{total['completion_tokens']} completion tokens, "
+            f"{total['latency']:.1f}s, ${total['cost']:.4f}"
+        )
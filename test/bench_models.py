@@ -0,0 +1,82 @@
+"""
+Benchmark: dateutil vs parse_iso, and dict items vs TimeItem.
+
+Run with: python test/bench_models.py
+"""
+
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import datetime
+import timeit
+import tracemalloc
+from dateutil import parser
+from src.models import TimeItem, parse_iso
+
+N = 20000
+
+timestamps = [
+    "2026-10-18T09:00:00Z",  # Clockify / GitHub
+    "2026-10-18T09:00:00+02:00",  # Google Calendar
+    "2026-10-18T09:00:00.123Z",
+]
+
+
+def dateutil_parse():
+    for value in timestamps:
+        parser.parse(value).astimezone(datetime.timezone.utc)
+
+
+def fast_parse():
+    for value in timestamps:
+        parse_iso(value)
+
+
+def dict_items(count):
+    start = datetime.datetime(2026, 10, 18, 9, tzinfo=datetime.timezone.utc)
+    return [
+        {
+            "id": f"evt_{i}",
+            "key": f"event:{i}",
+            "type": "event",
+            "description": "Daily Standup",
+            "start_iso": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "end_iso": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "start": start,
+            "end": start,
+        }
+        for i in range(count)
+    ]
+
+
+def typed_items(count):
+    start = datetime.datetime(2026, 10, 18, 9, tzinfo=datetime.timezone.utc)
+    return [
+        TimeItem(f"evt_{i}", f"event:{i}", "event", "Daily Standup", start, start)
+        for i in range(count)
+    ]
+
+
+def allocated(build):
+    tracemalloc.start()
+    items = build(N)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del items
+    return size
+
+
+if __name__ == "__main__":
+    slow = timeit.timeit(dateutil_parse, number=N) / (N * len(timestamps))
+    fast = timeit.timeit(fast_parse, number=N) / (N * len(timestamps))
+    print(f"dateutil.parser.parse: {slow * 1e6:.2f} us per timestamp")
+    print(f"parse_iso:             {fast * 1e6:.2f} us per timestamp")
+    print(f"  -> {slow / fast:.1f}x faster")
+
+    dict_size = allocated(dict_items)
+    typed_size = allocated(typed_items)
+    print(f"dict items: {dict_size / N:.0f} bytes per item")
+    print(f"TimeItem:   {typed_size / N:.0f} bytes per item")
+    print(f"  -> {dict_size / typed_size:.1f}x smaller")
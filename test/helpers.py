@@ -0,0 +1,42 @@
+"""Fixtures shared by the tests: the DevOps catalog and a `TimeItem` factory."""
+
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.catalog import Catalog
+from src.models import TimeItem, parse_iso
+
+projects_with_tasks = [
+    {
+        "id": "proj_1",
+        "name": "DevOps",
+        "tasks": [
+            {"id": "task_1a", "name": "Deployments"},
+            {"id": "task_1b", "name": "Backlog"},
+            {"id": "task_1c", "name": "Meetings"},
+        ],
+    }
+]
+catalog = Catalog(projects_with_tasks)
+
+
+def item(
+    i,
+    description,
+    start="2026-10-18T07:00:00Z",
+    end="2026-10-18T07:30:00Z",
+    type="event",
+    key=None,
+):
+    """An item with id evt_<i> (iss_<i> for issues) and key <type>:<i>."""
+    prefix = "evt" if type == "event" else "iss"
+    return TimeItem(
+        id=f"{prefix}_{i}",
+        key=key or f"{type}:{i}",
+        type=type,
+        description=description,
+        start=parse_iso(start),
+        end=parse_iso(end),
+    )
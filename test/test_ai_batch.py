@@ -0,0 +1,186 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import re
+import tempfile
+from types import SimpleNamespace
+import openai
+from src import concurrency
+from src.ai_batch import collect_batch_job, read_batch_job, submit_batch_job
+from src.ai_matcher import AIMatcher
+from helpers import catalog, item
+
+standups = [item(i, f"Standup {i}") for i in range(5)]
+
+
+class LocalBatchAPI:
+    """Stand-in for the files and batches endpoints of an OpenAI-compatible API."""
+
+    def __init__(self):
+        self.uploads = {}
+        self.batch = None
+        self.errors = []  # Raised by the next batch calls, one per call
+        self.files = SimpleNamespace(
+            create=self.create_file, content=self.content, delete=self.delete_file
+        )
+        self.batches = SimpleNamespace(create=self.create_batch, retrieve=self.retrieve)
+
+    def _fail(self):
+        if self.errors:
+            raise self.errors.pop(0)
+
+    def create_file(self, file, purpose):
+        file_id = f"file-{len(self.uploads)}"
+        self.uploads[file_id] = file[1].decode()
+        return SimpleNamespace(id=file_id)
+
+    def content(self, file_id):
+        return SimpleNamespace(text=self.uploads[file_id])
+
+    def delete_file(self, file_id):
+        del self.uploads[file_id]
+
+    def create_batch(self, input_file_id, endpoint, completion_window):
+        self._fail()
+        self.batch = SimpleNamespace(
+            id="batch-1",
+            status="in_progress",
+            input_file_id=input_file_id,
+            output_file_id=None,
+            errors=None,
+        )
+        return self.batch
+
+    def retrieve(self, batch_id):
+        self._fail()
+        return self.batch
+
+    def finish(self):
+        """Answers every request, matching all items to Meetings."""
+        output = []
+        for line in self.uploads[self.batch.input_file_id].splitlines():
+            request = json.loads(line)
+            prompt = request["body"]["messages"][1]["content"]
+            ids = re.findall(r"- ID: (\S+) \|", prompt)
+            content = {
+                item_id: {"projectId": "proj_1", "taskId": "task_1c"} for item_id in ids
+            }
+            output.append(
+                {
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {
+                            "choices": [{"message": {"content": json.dumps(content)}}]
+                        },
+                    },
+                    "error": None,
+                }
+            )
+        self.uploads["file-out"] = "\n".join(json.dumps(o) for o in output)
+        self.batch.status = "completed"
+        self.batch.output_file_id = "file-out"
+
+
+def test_batch_job_round_trip():
+    api = LocalBatchAPI()
+    matcher = AIMatcher(api_key="test")
+    matcher.client = api
+    items = standups
+    local = {"evt_0": {"project_id": "proj_1", "task_id": "task_1c"}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "batch.json")
+        summary = submit_batch_job(
+            items, matcher, catalog, path, chunk_size=2, local_matches=local
+        )
+        assert summary == {"items": 5, "submitted": 4}
+        # One request per chunk, locally matched items are not sent
+        requests = api.uploads["file-0"].splitlines()
+        assert len(requests) == 2
+        assert "evt_0" not in api.uploads["file-0"]
+
+        state, loaded = read_batch_job(path)
+        assert [i.id for i in loaded] == [i.id for i in items]
+        assert loaded[1].start_iso == items[1].start_iso
+
+        status, matches = collect_batch_job(state, loaded, matcher, catalog)
+        assert (status, matches) == ("in_progress", None)
+
+        api.finish()
+        status, matches = collect_batch_job(state, loaded, matcher, catalog)
+        assert status == "completed"
+        assert set(matches) == {i.id for i in items}
+        assert all(m["task_id"] == "task_1c" for m in matches.values())
+
+
+def test_dry_run_submits_nothing():
+    api = LocalBatchAPI()
+    matcher = AIMatcher(api_key="test")
+    matcher.client = api
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "batch.json")
+        summary = submit_batch_job(
+            standups[:3], matcher, catalog, path, 2, dry_run=True
+        )
+        assert summary == {"items": 3, "submitted": 0}
+        assert not api.uploads and api.batch is None
+        assert not os.path.exists(path)
+
+
+def test_failed_batch_leaves_items_unmatched():
+    api = LocalBatchAPI()
+    matcher = AIMatcher(api_key="test")
+    matcher.client = api
+    items = standups[:3]
+    local = {"evt_0": {"project_id": "proj_1", "task_id": "task_1c"}}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "batch.json")
+        submit_batch_job(items, matcher, catalog, path, 2, local_matches=local)
+        state, loaded = read_batch_job(path)
+
+        api.batch.status = "failed"
+        api.batch.errors = {"data": [{"code": "invalid_request"}]}
+        status, matches = collect_batch_job(state, loaded, matcher, catalog)
+        # No exception: the job can be written out and dropped like an expired one
+        assert status == "failed"
+        assert matches == local
+
+
+def test_batch_calls_are_retried():
+    api = LocalBatchAPI()
+    matcher = AIMatcher(api_key="test")
+    matcher.client = api
+    concurrency.BASE_BACKOFF, backoff = 0.01, concurrency.BASE_BACKOFF
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "batch.json")
+            # A rejected batch doesn't leave its upload behind
+            api.errors = [ValueError("invalid batch")]
+            try:
+                submit_batch_job(standups[:3], matcher, catalog, path, 2)
+                assert False, "expected the batch to be rejected"
+            except ValueError:
+                pass
+            assert not api.uploads
+
+            # Connection errors are retried
+            api.errors = [openai.APIConnectionError(request=None)]
+            submit_batch_job(standups[:3], matcher, catalog, path, 2)
+            state, loaded = read_batch_job(path)
+            api.errors = [openai.APIConnectionError(request=None)]
+            status, matches = collect_batch_job(state, loaded, matcher, catalog)
+            assert (status, matches) == ("in_progress", None)
+    finally:
+        concurrency.BASE_BACKOFF = backoff
+
+
+if __name__ == "__main__":
+    test_batch_job_round_trip()
+    test_dry_run_submits_nothing()
+    test_failed_batch_leaves_items_unmatched()
+    test_batch_calls_are_retried()
+    print("ok")
@@ -0,0 +1,77 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import re
+from types import SimpleNamespace
+from src.ai_matcher import AIMatcher
+from src.pipeline import report_tiers
+from helpers import catalog, item
+
+
+class LocalChatAPI:
+    """Stand-in for chat completions; `answer(item_id)` gives each result."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, **kwargs):
+        prompt = messages[1]["content"]
+        self.prompts.append(prompt)
+        ids = re.findall(r"- ID: (\S+) \|", prompt)
+        content = json.dumps({item_id: self.answer(item_id) for item_id in ids})
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+
+def fast_answer(item_id):
+    if item_id == "evt_0":
+        return {"projectId": "proj_1", "taskId": "task_1c", "confidence": 0.95}
+    if item_id == "evt_1":
+        return {"projectId": "proj_1", "taskId": "task_1a", "confidence": 0.3}
+    if item_id == "evt_2":
+        return {"projectId": "proj_1", "taskId": "made_up", "confidence": 0.9}
+    return None
+
+
+def strong_answer(item_id):
+    return {"projectId": "proj_1", "taskId": "task_1a", "confidence": 0.8}
+
+
+def test_cascade_escalates_uncertain_items():
+    strong = AIMatcher(api_key="test", model="strong")
+    strong.client = LocalChatAPI(strong_answer)
+    fast = AIMatcher(api_key="test", model="fast", fallback=strong, threshold=0.7)
+    fast.client = LocalChatAPI(fast_answer)
+
+    items = [
+        item(0, "Daily Standup"),
+        item(1, "Deploy v2"),
+        item(2, "Mystery"),
+        item(3, "Unknown"),
+    ]
+    pairs = list(fast.iter_match_tasks(items, catalog))
+
+    # The confident match comes first, then what the strong model answered
+    assert [item_id for item_id, _ in pairs] == ["evt_0", "evt_1", "evt_2", "evt_3"]
+    matches = dict(pairs)
+    assert matches["evt_0"]["task_id"] == "task_1c"
+    assert all(matches[i]["task_id"] == "task_1a" for i in ("evt_1", "evt_2", "evt_3"))
+
+    # Only the low-confidence, invalid and unmatched items were escalated
+    assert "evt_0" not in strong.client.prompts[0]
+    assert fast.stats == {"items": 4, "matched": 1}
+    assert strong.stats == {"items": 3, "matched": 3}
+
+    report_tiers(fast)
+    assert fast.stats == {"items": 0, "matched": 0}
+
+
+if __name__ == "__main__":
+    test_cascade_escalates_uncertain_items()
+    print("ok")
@@ -3,9 +3,10 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-import json
+import datetime
 from dotenv import load_dotenv
 from src.ai_matcher import AIMatcher
+from src.models import TimeItem
 
 # Load environment variables
 load_dotenv()
@@ -54,17 +55,27 @@ matcher = AIMatcher(api_key=api_key)
 print("Running AI Matcher Tests (Batch)...")
 
 # Prepare items for batch matching
+now = datetime.datetime.now(datetime.timezone.utc)
 items_to_match = []
 for i, event in enumerate(test_events):
-    items_to_match.append({"id": f"item_{i}", "description": event})
+    items_to_match.append(
+        TimeItem(
+            id=f"item_{i}",
+            key=f"test:{i}",
+            type="event",
+            description=event,
+            start=now,
+            end=now,
+        )
+    )
 
 print(f"Batch matching {len(items_to_match)} items...")
 matches = matcher.batch_match_tasks(items_to_match, projects_with_tasks)
 
 print("\nResults:")
 for item in items_to_match:
-    item_id = item["id"]
-    description = item["description"]
+    item_id = item.id
+    description = item.description
     match = matches.get(item_id)
 
     print(f"\nEvent: {CYAN}{description}{RESET}")
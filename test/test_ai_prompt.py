@@ -0,0 +1,41 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.ai_matcher import AIMatcher
+from src.catalog import Catalog
+from helpers import item
+
+projects = [
+    {
+        "id": "proj_2",
+        "name": "Support",
+        "tasks": [{"id": "t3", "name": "Tickets"}, {"id": "t2", "name": "Calls"}],
+    },
+    {"id": "proj_1", "name": "DevOps", "tasks": [{"id": "t1", "name": "Deployments"}]},
+]
+
+
+def test_requests_share_a_stable_prefix():
+    matcher = AIMatcher(api_key="test")
+    first = matcher._request_body([item(0, "Quarterly planning")], Catalog(projects))
+    # Same catalog in another order, other items
+    second = matcher._request_body(
+        [item(1, "Deploy"), item(2, "Retro")], Catalog(list(reversed(projects)))
+    )
+
+    system, user = first["messages"]
+    assert system == second["messages"][0]
+    assert "Quarterly planning" not in system["content"]
+    assert user["content"].startswith("Items to Match:")
+    assert "evt_0" in user["content"]
+
+    catalog_text = system["content"].split("Available Projects and Tasks:\n")[1]
+    assert catalog_text.index("DevOps") < catalog_text.index("Support")
+    assert catalog_text.index("Calls") < catalog_text.index("Tickets")
+
+
+if __name__ == "__main__":
+    test_requests_share_a_stable_prefix()
+    print("ok")
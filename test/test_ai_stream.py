@@ -0,0 +1,107 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import json
+from types import SimpleNamespace
+from src.ai_matcher import AIMatcher, JSONObjectStream
+from helpers import catalog, item
+
+
+class LocalStreamAPI:
+    """
+    Stand-in for streamed chat completions: sends `answers` as JSON in small
+    deltas, then a usage chunk. With `drop_after`, the connection is lost
+    after that many deltas.
+    """
+
+    def __init__(self, answers, drop_after=None):
+        self.content = json.dumps(answers)
+        self.drop_after = drop_after
+        self.sent = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, stream=False, **kwargs):
+        assert stream
+        return self.chunks()
+
+    def chunks(self):
+        for i in range(0, len(self.content), 8):
+            if self.sent == self.drop_after:
+                raise ConnectionError("connection reset")
+            self.sent += 1
+            delta = SimpleNamespace(content=self.content[i : i + 8])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        yield SimpleNamespace(choices=[], usage=None)
+
+
+items = [item(0, "Daily Standup"), item(1, "Deploy v2"), item(2, "Mystery")]
+answers = {
+    "evt_0": {"projectId": "proj_9", "taskId": "task_1c", "confidence": 0.9},
+    "evt_1": {"projectId": "proj_1", "taskId": "made_up", "confidence": 0.8},
+    "evt_7": {"projectId": "proj_1", "taskId": "task_1a", "confidence": 0.8},
+}
+
+
+def test_members_complete_across_chunks():
+    text = (
+        '{"evt_0": {"project_id": "p1", "task_id": "t1", "reasoning": "a \\"b\\" {c}"},'
+        ' "evt_1": null, "iss_2": {"project_id": "p2", "task_id": "t2",'
+        ' "nested": [1, {"x": 2}]}, "n": 3}'
+    )
+    stream = JSONObjectStream()
+    members = []
+    for i in range(0, len(text), 7):
+        members.extend(stream.feed(text[i : i + 7]))
+
+    assert [key for key, _ in members] == ["evt_0", "evt_1", "iss_2", "n"]
+    assert members[0][1]["reasoning"] == 'a "b" {c}'
+    assert members[1][1] is None
+    assert members[2][1]["nested"] == [1, {"x": 2}]
+    assert members[3][1] == 3
+
+
+def test_member_is_emitted_before_object_ends():
+    stream = JSONObjectStream()
+    assert stream.feed('{"evt_0": {"task_id": "t1"') == []
+    assert stream.feed('}, "evt_1": {') == [("evt_0", {"task_id": "t1"})]
+
+
+def test_stream_validates_each_match():
+    matcher = AIMatcher(api_key="test", model="fast", stream=True)
+    matcher.client = LocalStreamAPI(answers)
+    pairs = matcher._iter_chunk(items, catalog)
+
+    # The first match arrives before the response is complete
+    item_id, match = next(pairs)
+    assert item_id == "evt_0"
+    assert matcher.client.sent < len(matcher.client.content) / 8
+    # The project follows the task
+    assert (match["project_id"], match["task_id"]) == ("proj_1", "task_1c")
+
+    matches = dict(pairs)
+    # A task outside the catalog is dropped, unknown ids are ignored and
+    # skipped items get a no-match
+    assert list(matches) == ["evt_1", "evt_2"]
+    assert matches["evt_1"]["task_id"] is None
+    assert matches["evt_2"]["task_id"] is None
+
+
+def test_dropped_stream_keeps_partial_results():
+    matcher = AIMatcher(api_key="test", model="fast", stream=True)
+    first = json.dumps(answers).index('"evt_1"')
+    matcher.client = LocalStreamAPI(answers, drop_after=first // 8 + 1)
+
+    # Items after the drop are left out, so a fallback can retry them
+    matches = dict(matcher._iter_chunk(items, catalog))
+    assert list(matches) == ["evt_0"]
+    assert matches["evt_0"]["task_id"] == "task_1c"
+
+
+if __name__ == "__main__":
+    test_members_complete_across_chunks()
+    test_member_is_emitted_before_object_ends()
+    test_stream_validates_each_match()
+    test_dropped_stream_keeps_partial_results()
+    print("ok")
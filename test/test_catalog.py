@@ -0,0 +1,63 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import tempfile
+from src.catalog import Catalog
+
+# Mock Data
+projects_with_tasks = [
+    {
+        "id": "proj_1",
+        "name": "DevOps",
+        "tasks": [
+            {"id": "task_1a", "name": "Deployments"},
+            {"id": "task_1b", "name": "Backlog"},
+            {"id": "task_1c", "name": "Meetings - internal"},
+            {"id": "task_1d", "name": "Meetings - external"},
+        ],
+    },
+    {
+        "id": "proj_2",
+        "name": "Support",
+        "tasks": [{"id": "task_2a", "name": "Backlog"}],
+    },
+]
+
+
+def test_lookups():
+    catalog = Catalog(projects_with_tasks)
+    assert len(catalog) == 2
+    assert catalog.task_project("task_2a") == "proj_2"
+    assert catalog.task_project("task_x") is None
+    assert catalog.names("proj_1", "task_1a") == ("DevOps", "Deployments")
+    # A task of another project is not resolved
+    assert catalog.names("proj_1", "task_2a") == ("DevOps", "Unknown")
+    assert catalog.find_project(" devops ") == "proj_1"
+    assert catalog.find_tasks("BACKLOG") == ["task_1b", "task_2a"]
+    assert catalog.find_tasks_by_prefix("meetings") == ["task_1d", "task_1c"]
+
+
+def test_prompt_fragment():
+    catalog = Catalog(projects_with_tasks)
+    fragment = catalog.prompt_fragment
+    assert "Project: DevOps (ID: proj_1)" in fragment
+    assert "  - Task: Deployments (ID: task_1a)" in fragment
+    assert catalog.prompt_fragment is fragment
+
+
+def test_save_load():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "catalog.json")
+        Catalog(projects_with_tasks).save(path, project_name="DevOps")
+        catalog, meta = Catalog.load(path)
+        assert meta == {"project_name": "DevOps"}
+        assert catalog.to_list() == projects_with_tasks
+
+
+if __name__ == "__main__":
+    test_lookups()
+    test_prompt_fragment()
+    test_save_load()
+    print("Catalog tests passed.")
@@ -0,0 +1,54 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from types import SimpleNamespace
+from src.clockify_client import ClockifyClient
+
+
+class PagedSession:
+    """Stand-in for requests.Session serving `total` projects in pages."""
+
+    def __init__(self, total):
+        self.total = total
+        self.requests = []
+
+    def get(self, url, params=None):
+        self.requests.append(params)
+        start = (params["page"] - 1) * params["page-size"]
+        end = min(self.total, start + params["page-size"])
+        projects = [
+            {"id": f"p{i}", "name": f"Project {i}", "tasks": []}
+            for i in range(start, end)
+        ]
+        return SimpleNamespace(raise_for_status=lambda: None, json=lambda: projects)
+
+
+def test_get_projects_pages_through_all_results():
+    client = ClockifyClient(api_key="test", workspace_id="ws")
+    client.session = PagedSession(total=5)
+
+    projects = client.get_projects(page_size=2)
+    assert [p["id"] for p in projects] == ["p0", "p1", "p2", "p3", "p4"]
+    assert [r["page"] for r in client.session.requests] == [1, 2, 3]
+    # Archived projects are filtered out by default
+    assert client.session.requests[0]["archived"] == "false"
+
+
+def test_get_projects_filters_on_the_server():
+    client = ClockifyClient(api_key="test", workspace_id="ws")
+    client.session = PagedSession(total=1)
+
+    client.get_projects(name="DevOps", hydrated=True, archived=None)
+    params = client.session.requests[0]
+    assert params["name"] == "DevOps"
+    assert params["strict-name-search"] == "true"
+    assert params["hydrated"] == "true"
+    assert "archived" not in params
+
+
+if __name__ == "__main__":
+    test_get_projects_pages_through_all_results()
+    test_get_projects_filters_on_the_server()
+    print("ok")
@@ -0,0 +1,167 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import threading
+import time
+from types import SimpleNamespace
+from src import concurrency
+from src.concurrency import Limiter
+
+
+def response(status, headers=None):
+    return SimpleNamespace(status_code=status, headers=headers or {})
+
+
+def test_limit_grows_on_success_and_halves_on_throttling():
+    limiter = Limiter("test", initial=4, maximum=6)
+    for _ in range(40):
+        limiter.record(0.1)
+    assert limiter.limit == 6
+
+    limiter.record(0.1, throttled=True, pause=0.2)
+    # A burst of 429s within one round trip only halves once
+    limiter.record(0.1, throttled=True, pause=0.2)
+    assert limiter.limit == 3
+    assert limiter.paused_until > time.monotonic()
+
+    # A jump in latency shrinks the limit too
+    limiter = Limiter("test", initial=8, maximum=8)
+    limiter.record(0.01)
+    for _ in range(10):
+        limiter.record(1.0)
+    assert limiter.limit < 8
+
+
+def test_call_retries_after_retry_after():
+    limiter = Limiter("test", initial=2)
+    replies = [response(429, {"Retry-After": "0.05"}), response(200)]
+    started = time.monotonic()
+    result = limiter.call(lambda: replies.pop(0))
+    assert result.status_code == 200
+    assert time.monotonic() - started >= 0.05
+    assert limiter.stats["throttled"] == 1
+
+    # Raised errors (e.g. OpenAI's RateLimitError) carry the response
+    class RateLimitError(Exception):
+        response = response(429, {"retry-after": "0"})
+
+    def fail():
+        raise RateLimitError()
+
+    try:
+        limiter.call(fail)
+        assert False, "expected the error once the retries are used up"
+    except RateLimitError:
+        pass
+    assert limiter.stats["throttled"] == 1 + 1 + concurrency.MAX_RETRIES
+
+
+def test_failures_never_grow_the_limit():
+    limiter = Limiter("test", initial=4)
+    limiter.record(0.1, failed=True)
+    assert limiter.limit == 4
+    limiter.record(0.1, failed=True, overloaded=True)
+    assert limiter.limit < 4
+    assert limiter.stats["failed"] == 2
+
+    # A 500 response counts as a failure, and is not retried
+    assert limiter.call(lambda: response(500)).status_code == 500
+    assert limiter.stats["failed"] == 3
+
+
+def test_writes_are_only_retried_when_refused():
+    limiter = Limiter("test", initial=4)
+    replies = [response(503), response(201)]
+    # A 503 without Retry-After may follow a write that went through
+    result = limiter.call(lambda: replies.pop(0), idempotent=False)
+    assert result.status_code == 503
+    assert limiter.stats["throttled"] == 1
+
+    replies = [response(429, {"Retry-After": "0"}), response(201)]
+    assert limiter.call(lambda: replies.pop(0), idempotent=False).status_code == 201
+    replies = [response(503, {"Retry-After": "0"}), response(201)]
+    assert limiter.call(lambda: replies.pop(0), idempotent=False).status_code == 201
+
+
+def test_transient_errors_are_retried():
+    concurrency.BASE_BACKOFF, backoff = 0.01, concurrency.BASE_BACKOFF
+    try:
+        limiter = Limiter("test")
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ConnectionError("reset")
+            return response(200)
+
+        assert limiter.call(flaky, transient=(ConnectionError,)).status_code == 200
+        assert len(attempts) == 3
+
+        # Without `transient`, errors are raised right away
+        attempts.clear()
+        try:
+            limiter.call(flaky)
+            assert False
+        except ConnectionError:
+            pass
+        assert len(attempts) == 1
+    finally:
+        concurrency.BASE_BACKOFF = backoff
+
+
+def test_stream_holds_its_slot_until_read():
+    limiter = Limiter("test", initial=1, maximum=1)
+    in_flight = []
+
+    def chunks():
+        for i in range(3):
+            in_flight.append(limiter.in_flight)
+            yield i
+
+    assert list(limiter.stream(chunks)) == [0, 1, 2]
+    assert in_flight == [1, 1, 1]
+    assert limiter.in_flight == 0
+    assert limiter.stats["calls"] == 1
+
+
+def test_in_flight_never_exceeds_limit():
+    limiter = Limiter("test", initial=2, maximum=2)
+    active = []
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            active.append(limiter.in_flight)
+        time.sleep(0.01)
+        return response(200)
+
+    threads = [threading.Thread(target=limiter.call, args=(work,)) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(active) == 2
+    assert limiter.stats["peak"] == 2
+
+
+def test_report_lists_used_services():
+    lim = concurrency.limiter("clockify")
+    assert concurrency.limiter("clockify") is lim
+    lim.call(lambda: response(200))
+    concurrency.report()
+    assert lim.stats["calls"] == 0
+
+
+if __name__ == "__main__":
+    test_limit_grows_on_success_and_halves_on_throttling()
+    test_call_retries_after_retry_after()
+    test_failures_never_grow_the_limit()
+    test_writes_are_only_retried_when_refused()
+    test_transient_errors_are_retried()
+    test_stream_holds_its_slot_until_read()
+    test_in_flight_never_exceeds_limit()
+    test_report_lists_used_services()
+    print("ok")
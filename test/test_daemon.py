@@ -0,0 +1,90 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import datetime
+import hashlib
+import hmac
+import queue
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+from src import daemon
+from src.models import TimeItem, parse_iso
+
+DAY = datetime.date(2026, 10, 18)
+DAY_START = parse_iso("2026-10-18")
+
+
+def test_coalesce():
+    pending = daemon.coalesce(
+        [(DAY, "org/repo#1"), (DAY, "org/repo#2"), (DAY + datetime.timedelta(1), None)]
+    )
+    assert pending == {
+        DAY: {"org/repo#1", "org/repo#2"},
+        DAY + datetime.timedelta(1): None,
+    }
+
+    # A whole-day trigger swallows item triggers for the same day
+    assert daemon.coalesce([(DAY, "org/repo#1"), (DAY, None), (DAY, "org/repo#2")]) == {
+        DAY: None
+    }
+
+
+def test_github_triggers():
+    payload = {"issue": {"number": 650}, "repository": {"full_name": "org/repo"}}
+    [(_, ref)] = daemon.github_triggers("issues", payload)
+    assert ref == "org/repo#650"
+    assert daemon.github_triggers("ping", {}) == []
+
+    def item(key):
+        return TimeItem("iss_0", key, "issue", "", DAY_START, DAY_START)
+
+    predicate = daemon.issue_predicate({ref})
+    assert predicate(item("issue:org/repo#650:2026-10-18"))
+    assert not predicate(item("issue:org/repo#6500:2026-10-18"))
+    assert not predicate(item("event:abc"))
+
+
+def test_github_signature():
+    body = b'{"zen": "Keep it logically awesome."}'
+    signature = "sha256=" + hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+    assert daemon.verify_github_signature("secret", body, signature)
+    assert not daemon.verify_github_signature("other", body, signature)
+    assert not daemon.verify_github_signature("secret", body, None)
+
+
+def post(server, path):
+    url = f"http://127.0.0.1:{server.server_address[1]}{path}"
+    request = urllib.request.Request(url, data=b"{}", method="POST")
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_public_server_refuses_unauthenticated_webhooks():
+    for public, expected in ((False, 202), (True, 403)):
+        triggers = queue.Queue()
+        server = ThreadingHTTPServer(
+            ("127.0.0.1", 0), daemon.make_handler(triggers, public=public)
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            assert post(server, "/calendar") == expected
+            assert post(server, "/github") == expected
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert triggers.empty() == public
+
+
+if __name__ == "__main__":
+    test_coalesce()
+    test_github_triggers()
+    test_github_signature()
+    test_public_server_refuses_unauthenticated_webhooks()
+    print("Daemon tests passed.")
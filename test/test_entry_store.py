@@ -0,0 +1,103 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import sqlite3
+import tempfile
+from src.entry_store import EntryStore
+
+
+def entry(entry_id, description, start, end):
+    return {
+        "id": entry_id,
+        "description": description,
+        "projectId": "proj_1",
+        "taskId": "task_1",
+        "timeInterval": {"start": start, "end": end},
+    }
+
+
+class FakeClockify:
+    def __init__(self, entries):
+        self.entries = entries
+        self.fetches = []
+
+    def iter_time_entries(self, start, end):
+        self.fetches.append((start, end))
+        return [e for e in self.entries if start <= e["timeInterval"]["start"] < end]
+
+
+def test_refresh_is_incremental():
+    clockify = FakeClockify(
+        [
+            entry("a", "Standup", "2026-10-01T07:00:00Z", "2026-10-01T07:15:00Z"),
+            entry("b", "Review", "2026-10-15T10:00:00Z", "2026-10-15T11:00:00Z"),
+        ]
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        store = EntryStore(os.path.join(tmp, "entries.sqlite3"), owner="ws/u1")
+        store.refresh(clockify, "2026-09-18T00:00:00Z", "2026-10-18T00:00:00Z")
+        assert store.signatures("2026-09-18T00:00:00Z", "2026-10-18T00:00:00Z") == {
+            ("2026-10-01T07:00:00Z", "Standup"),
+            ("2026-10-15T10:00:00Z", "Review"),
+        }
+
+        # Review was deleted in Clockify; only the last 3 days are re-read
+        del clockify.entries[1]
+        store.refresh(clockify, "2026-09-20T00:00:00Z", "2026-10-18T12:00:00Z")
+        assert clockify.fetches[-1] == ("2026-10-15T00:00:00Z", "2026-10-18T12:00:00Z")
+        assert store.find("2026-10-15T10:00:00Z", "Review") is None
+        assert store.find("2026-10-01T07:00:00Z", "Standup") == "a"
+        assert store.span == ("2026-09-18T00:00:00Z", "2026-10-18T12:00:00Z")
+
+        # Created entries are added locally
+        store.add(entry("c", "Retro", "2026-10-18T09:00:00Z", "2026-10-18T10:00:00Z"))
+        assert store.find("2026-10-18T09:00:00Z", "Retro") == "c"
+
+        # A refresh keeps entries Clockify still has
+        clockify.entries.append(
+            entry("c", "Retro", "2026-10-18T09:00:00Z", "2026-10-18T10:00:00Z")
+        )
+        store.refresh(clockify, "2026-10-17T00:00:00Z", "2026-10-18T12:00:00Z")
+        assert store.find("2026-10-18T09:00:00Z", "Retro") == "c"
+        store.close()
+
+        # Another user's mirror starts empty
+        store = EntryStore(os.path.join(tmp, "entries.sqlite3"), owner="ws/u2")
+        assert store.span is None
+        assert store.find("2026-10-01T07:00:00Z", "Standup") is None
+        store.close()
+
+
+def test_old_mirror_is_rebuilt():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "entries.sqlite3")
+        db = sqlite3.connect(path)
+        db.executescript(
+            "CREATE TABLE entries (id TEXT PRIMARY KEY, description TEXT, "
+            "start TEXT, end TEXT, project_id TEXT, task_id TEXT, source_key TEXT);"
+            "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);"
+            "INSERT INTO meta VALUES ('covered_from', '2026-10-01T00:00:00Z');"
+            "INSERT INTO meta VALUES ('covered_to', '2026-10-18T00:00:00Z');"
+        )
+        db.close()
+
+        store = EntryStore(path, owner="ws/u1")
+        assert store.span is None
+        columns = [row[1] for row in store._db.execute("PRAGMA table_info(entries)")]
+        assert "source_key" not in columns
+        store.close()
+
+        # The current schema is kept on reopening
+        store = EntryStore(path, owner="ws/u1")
+        store._set_meta("covered_from", "2026-10-01T00:00:00Z")
+        store._set_meta("covered_to", "2026-10-18T00:00:00Z")
+        store.close()
+        assert EntryStore(path, owner="ws/u1").span is not None
+
+
+if __name__ == "__main__":
+    test_refresh_is_incremental()
+    test_old_mirror_is_rebuilt()
+    print("ok")
@@ -0,0 +1,30 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import tempfile
+from src.files import atomic_write
+
+
+def test_atomic_write():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state", "catalog.json")
+        with atomic_write(path, durable=True) as tmp_path, open(tmp_path, "w") as f:
+            f.write("old")
+
+        # A failed write leaves the previous file and no temporary file behind
+        try:
+            with atomic_write(path) as tmp_path, open(tmp_path, "w") as f:
+                f.write("half")
+                raise RuntimeError("disk full")
+        except RuntimeError:
+            pass
+        with open(path) as f:
+            assert f.read() == "old"
+        assert os.listdir(os.path.dirname(path)) == ["catalog.json"]
+
+
+if __name__ == "__main__":
+    test_atomic_write()
+    print("ok")
@@ -23,7 +23,7 @@ def test_github():
         print(f"Successfully fetched {len(issues)} issues.")
         if issues:
             print("Sample issue:")
-            print(json.dumps(issues[0], indent=2))
+            print(json.dumps(issues[0].to_dict(), indent=2))
     except Exception as e:
         print(f"Failed to fetch issues: {e}")
 
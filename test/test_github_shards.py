@@ -0,0 +1,106 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import datetime
+import re
+import threading
+from src import github_client
+from src.models import parse_iso
+
+
+def node(org, repo, number, updated_at):
+    return {
+        "title": f"Issue {number}",
+        "number": number,
+        "state": "OPEN",
+        "updatedAt": updated_at,
+        "repository": {"name": repo, "owner": {"login": org}},
+        "projectItems": {"nodes": []},
+    }
+
+
+class FakeSearch:
+    """GitHub search over `nodes`, including its 1000 result cap."""
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def __call__(self, query, variables):
+        q = variables["q"]
+        with self.lock:
+            self.queries.append(q)
+        hits = self.nodes
+        for org in re.findall(r"(?<!-)org:(\S+)", q):
+            hits = [n for n in hits if n["repository"]["owner"]["login"] == org]
+        for org in re.findall(r"-org:(\S+)", q):
+            hits = [n for n in hits if n["repository"]["owner"]["login"] != org]
+        updated = re.search(r"updated:(\S+)\.\.(\S+)", q)
+        if updated:
+            start, end = (parse_iso(t) for t in updated.groups())
+            hits = [n for n in hits if start <= parse_iso(n["updatedAt"]) <= end]
+        hits = sorted(hits, key=lambda n: n["updatedAt"], reverse=True)
+
+        offset = int(variables["cursor"] or 0)
+        reachable = min(len(hits), github_client.SEARCH_RESULT_CAP)
+        page = hits[offset : min(offset + 100, reachable)]
+        return {
+            "data": {
+                "search": {
+                    "issueCount": len(hits),
+                    "pageInfo": {
+                        "hasNextPage": offset + 100 < reachable,
+                        "endCursor": str(offset + 100),
+                    },
+                    "nodes": page,
+                }
+            }
+        }
+
+
+def test_sharded_fetch_gets_past_search_cap():
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    nodes = [
+        node(
+            "acme" if i % 3 else "other",
+            "api",
+            i,
+            (start + datetime.timedelta(hours=7 * i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        )
+        for i in range(2500)
+    ]
+    search = FakeSearch(nodes)
+    original = github_client.run_query
+    github_client.run_query = search
+    try:
+        issues = github_client.get_issues(["acme"], concurrency=4)
+    finally:
+        github_client.run_query = original
+
+    # Every issue exactly once, newest first
+    assert len(issues) == 2500
+    assert len({(i.org, i.repo, i.number) for i in issues}) == 2500
+    assert issues[0].number == 2499
+    # Shards were split until none needed more than a few pages
+    assert any("updated:" in q for q in search.queries)
+    assert any(q.startswith("is:issue assignee:@me org:acme") for q in search.queries)
+    assert any("-org:acme" in q for q in search.queries)
+
+
+def test_initial_shards():
+    assert github_client.initial_shards() == [("", None)]
+    assert github_client.initial_shards(["acme", "acme/api", "me/dots"]) == [
+        ("org:acme -repo:acme/api", None),
+        ("repo:acme/api", None),
+        ("repo:me/dots", None),
+        ("-org:acme -repo:me/dots", None),
+    ]
+
+
+if __name__ == "__main__":
+    test_sharded_fetch_gets_past_search_cap()
+    test_initial_shards()
+    print("ok")
@@ -0,0 +1,162 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import datetime
+import tempfile
+import time
+from src.entry_store import EntryStore
+from src.history_matcher import HistoryMatcher
+from src.models import ExistingEntry, TimeItem, format_iso, parse_iso
+from helpers import catalog
+
+NOW = datetime.datetime(2026, 10, 18, 9, tzinfo=datetime.timezone.utc)
+
+# Mock Data
+history = [
+    ("Fluxygen daily standup", "task_1c"),
+    ("Fluxygen daily standup", "task_1c"),
+    ("Daily standup", "task_1c"),
+    ("Deploy new version to prod", "task_1a"),
+    ("Update server from 4.17.8 to 4.17.9", "task_1a"),
+    ("#650 [report-service] cpu % shall be absolute", "task_1b"),
+    ("Old task that was deleted", "task_gone"),
+]
+
+
+def entries():
+    return [
+        ExistingEntry(
+            id=f"entry_{i}",
+            description=description,
+            start=parse_iso(f"2026-10-{i + 1:02d}T09:00:00Z"),
+            end=parse_iso(f"2026-10-{i + 1:02d}T10:00:00Z"),
+            project_id="proj_1",
+            task_id=task_id,
+        )
+        for i, (description, task_id) in enumerate(history)
+    ]
+
+
+def item(i, description):
+    return TimeItem(f"item_{i}", f"test:{i}", "event", description, NOW, NOW)
+
+
+class FakeFallback:
+    def __init__(self):
+        self.items = []
+
+    def iter_match_tasks(self, items, catalog):
+        self.items.extend(items)
+        for i in items:
+            yield i.id, {"project_id": None, "task_id": None}
+
+
+def test_history_matcher():
+    fallback = FakeFallback()
+    matcher = HistoryMatcher(fallback=fallback, threshold=0.5)
+    assert matcher.add_entries(entries()) == len(history)
+    # Seen entries are not added twice
+    assert matcher.add_entries(entries()) == 0
+    assert len(matcher) == len(history) - 1
+
+    items = [
+        item(0, "Fluxygen Daily Standup"),
+        item(1, "Deploy new version to staging"),
+        item(2, "Lunch with the board"),
+        item(3, "Old task that was deleted"),
+    ]
+    matches = matcher.batch_match_tasks(items, catalog)
+    assert matches["item_0"]["task_id"] == "task_1c"
+    assert matches["item_1"]["task_id"] == "task_1a"
+    # Unrelated items and tasks that no longer exist go to the fallback
+    assert [i.id for i in fallback.items] == ["item_2", "item_3"]
+
+
+def test_corrections_move_the_weight():
+    matcher = HistoryMatcher(threshold=0.5)
+    matcher.add_entries(entries())
+    assert matcher.query(["Deploy new version to prod"], catalog)[0][1] == "task_1a"
+
+    # The user moves the deploy entry to Backlog in Clockify
+    corrected = [
+        ExistingEntry(e.id, e.description, e.start, e.end, e.project_id, "task_1b")
+        for e in entries()
+        if e.description == "Deploy new version to prod"
+    ]
+    assert matcher.add_entries(corrected) == 1
+    assert matcher.add_entries(corrected) == 0
+    assert matcher.query(["Deploy new version to prod"], catalog)[0][1] == "task_1b"
+
+
+def test_save_load():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.npz")
+        matcher = HistoryMatcher(path=path)
+        matcher.add_entries(entries())
+        matcher.save(path)
+
+        loaded = HistoryMatcher(path=path)
+        assert len(loaded) == len(matcher)
+        assert loaded.trained_until == "2026-10-07T09:00:00Z"
+        assert loaded.add_entries(entries()) == 0
+        assert loaded.entry_rows == matcher.entry_rows
+        assert loaded.query(["daily standup"], catalog)[0][1] == "task_1c"
+
+
+class FakeClockify:
+    def __init__(self):
+        self.fetches = []
+
+    def iter_time_entries(self, start, end):
+        self.fetches.append((start, end))
+        return [
+            {
+                "id": e.id,
+                "description": e.description,
+                "projectId": e.project_id,
+                "taskId": e.task_id,
+                "timeInterval": {"start": e.start_iso, "end": format_iso(e.end)},
+            }
+            for e in entries()
+            if start <= e.start_iso < end
+        ]
+
+
+def test_update_from_store():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.npz")
+        store = EntryStore(os.path.join(tmp, "entries.sqlite3"))
+        clockify = FakeClockify()
+        matcher = HistoryMatcher(path=path)
+        assert matcher.update_from_store(store, clockify, days=365) == len(history)
+        assert len(clockify.fetches) == 1
+
+        # The mirror covers the update now: nothing is fetched and, with
+        # nothing new, the model is not saved again
+        os.remove(path)
+        assert matcher.update_from_store(store, clockify, days=365) == 0
+        assert len(clockify.fetches) == 1
+        assert not os.path.exists(path)
+        store.close()
+
+
+def test_speed():
+    matcher = HistoryMatcher()
+    matcher.add_entries(entries())
+    descriptions = [f"#{i} daily standup {i}" for i in range(5000)]
+    started = time.perf_counter()
+    results = matcher.query(descriptions, catalog)
+    elapsed = time.perf_counter() - started
+    print(f"Matched {len(results)} items in {elapsed * 1000:.0f} ms")
+    assert len(results) == len(descriptions)
+
+
+if __name__ == "__main__":
+    test_history_matcher()
+    test_corrections_move_the_weight()
+    test_save_load()
+    test_update_from_store()
+    test_speed()
+    print("History matcher tests passed.")
@@ -0,0 +1,154 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import dataclasses
+import tempfile
+from types import SimpleNamespace
+import requests
+from src.journal import Journal
+from src.sync import SyncSession
+from src.models import TimeItem, parse_iso
+
+item = TimeItem(
+    id="evt_0",
+    key="event:abc123",
+    type="event",
+    description="Daily Standup",
+    start=parse_iso("2026-10-18T07:00:00Z"),
+    end=parse_iso("2026-10-18T07:30:00Z"),
+)
+
+
+def test_journal_resume_and_skip():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "journal.jsonl")
+
+        journal = Journal(path)
+        journal.plan(item, "proj_1", "task_1")
+        journal.close()
+
+        # Simulate a crash: planned but never confirmed, plus a torn write
+        with open(path, "a") as f:
+            f.write('{"k": "event:torn", "s"')
+
+        journal = Journal(path)
+        assert [r["k"] for r in journal.unconfirmed()] == ["event:abc123"]
+        assert not journal.is_synced(item)
+
+        journal.confirm(item.key, "entry_1")
+        journal.close()
+
+        journal = Journal(path)
+        assert journal.unconfirmed() == []
+        assert journal.is_synced(item)
+        # Same key at a different time is not the same entry
+        moved = dataclasses.replace(item, start=parse_iso("2026-10-18T08:00:00Z"))
+        assert not journal.is_synced(moved)
+
+
+def test_journal_compact():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "journal.jsonl")
+
+        journal = Journal(path)
+        for i in range(3):
+            journal.plan(
+                dataclasses.replace(item, key=f"event:{i}"), "proj_1", "task_1"
+            )
+            journal.confirm(f"event:{i}", f"entry_{i}")
+        journal.compact()
+
+        with open(path) as f:
+            assert len(f.readlines()) == 3
+        assert Journal(path).is_synced(dataclasses.replace(item, key="event:2"))
+
+
+def test_journal_shared_between_processes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "journal.jsonl")
+        daemon, run = Journal(path), Journal(path)
+
+        daemon.plan(dataclasses.replace(item, key="event:1"), "proj_1", "task_1")
+        run.plan(dataclasses.replace(item, key="event:2"), "proj_1", "task_1")
+        # Compaction keeps the records the other journal appended...
+        daemon.compact()
+        assert set(daemon.records) == {"event:1", "event:2"}
+        # ...and the other journal appends to the compacted file, not the old one
+        run.confirm("event:2", "entry_2")
+        run.close()
+
+        journal = Journal(path)
+        assert journal.entry_id("event:2") == "entry_2"
+        assert [r["k"] for r in journal.unconfirmed()] == ["event:1"]
+
+
+class FakeClockify:
+    """Rejects "Rejected" entries; entry "gone" was deleted in Clockify."""
+
+    def __init__(self):
+        self.created = []
+        self.updated = []
+
+    @staticmethod
+    def _error(status):
+        response = SimpleNamespace(status_code=status)
+        return requests.exceptions.HTTPError(f"{status}", response=response)
+
+    def get_time_entries(self, start, end):
+        return []
+
+    def add_time_entry(self, description, **fields):
+        if description == "Rejected":
+            raise self._error(400)
+        self.created.append(description)
+        return {"id": f"new_{len(self.created)}"}
+
+    def update_time_entry(self, entry_id, description, **fields):
+        if entry_id == "gone":
+            raise self._error(404)
+        self.updated.append(entry_id)
+        return {"id": entry_id}
+
+
+def test_resume_writes_like_the_sink():
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = Journal(os.path.join(tmp, "journal.jsonl"))
+        for key, description, entry_id in [
+            ("event:1", "Rejected", None),
+            ("event:2", "Moved", "gone"),
+            ("event:3", "Renamed", "entry_3"),
+        ]:
+            journal.plan(
+                dataclasses.replace(item, key=key, description=description),
+                "proj_1",
+                "task_1",
+                entry_id=entry_id,
+            )
+
+        session = SyncSession.__new__(SyncSession)
+        session.config = {"entry_store": False}
+        session._entry_store = None
+        session.profiler = None
+        session.journal = journal
+        session.clockify_client = clockify = FakeClockify()
+        session.resume()
+
+        # The rejected entry is not re-submitted by the next --resume, the
+        # deleted one is created again and the other one is updated
+        assert journal.unconfirmed() == []
+        assert journal.records["event:1"]["s"] == "f"
+        assert clockify.created == ["Moved"]
+        assert journal.entry_id("event:2") == "new_1"
+        assert clockify.updated == ["entry_3"]
+        assert journal.entry_id("event:3") == "entry_3"
+        journal.close()
+
+
+if __name__ == "__main__":
+    test_journal_resume_and_skip()
+    test_journal_compact()
+    test_journal_shared_between_processes()
+    test_resume_writes_like_the_sink()
+    print("Journal tests passed.")
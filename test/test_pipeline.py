@@ -0,0 +1,154 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import datetime
+import itertools
+import threading
+import time
+from src import pipeline
+from src.models import (
+    CalendarEvent,
+    ExistingEntry,
+    Issue,
+    IssueProject,
+    TimeItem,
+    parse_iso,
+)
+
+NOW = datetime.datetime(2026, 10, 18, 20, 0, tzinfo=datetime.timezone.utc)
+
+# Mock Data
+events = [
+    CalendarEvent.from_api(
+        {
+            "id": "abc123",
+            "summary": "Daily Standup",
+            "start": {"dateTime": "2026-10-18T09:00:00+02:00"},
+            "end": {"dateTime": "2026-10-18T09:30:00+02:00"},
+        }
+    ),
+    CalendarEvent.from_api(
+        {
+            "summary": "Public Holiday",
+            "start": {"date": "2026-10-18"},
+            "end": {"date": "2026-10-19"},
+        }
+    ),
+]
+
+issues = [
+    Issue(
+        number=650,
+        title="[report-service] cpu % shall be absolute",
+        state="OPEN",
+        updated_at=parse_iso("2026-10-18T10:00:00Z"),
+        org="org",
+        repo="report-service",
+        projects=(IssueProject("DevOps", "In Progress", False),),
+    ),
+    Issue(
+        number=554,
+        title="[Epic] Memory limitations",
+        state="CLOSED",
+        updated_at=parse_iso("2026-01-01T10:00:00Z"),
+        org="org",
+        repo="report-service",
+        projects=(IssueProject("DevOps", "Done", False),),
+    ),
+]
+
+
+class FakeMatcher:
+    def __init__(self):
+        self.calls = 0
+
+    def iter_match_tasks(self, items, catalog):
+        self.calls += 1
+        # Answer out of order and skip the last item, like a streamed response
+        for item in reversed(items[:-1]):
+            yield item.id, {"project_id": "proj_1", "task_id": "task_1"}
+
+
+def build_items():
+    stats = {}
+    return itertools.chain(
+        pipeline.normalize_events(iter(events), stats),
+        pipeline.normalize_issues(
+            iter(issues), stats, NOW - datetime.timedelta(days=1), NOW, now=NOW
+        ),
+    )
+
+
+def test_normalize():
+    items = list(build_items())
+    assert [item.key for item in items] == [
+        "event:abc123",
+        "issue:org/report-service#650:2026-10-18",
+    ]
+    assert items[0].start_iso == "2026-10-18T07:00:00Z"
+    # 8h work day minus the 30 minute standup goes to the only eligible issue
+    assert items[1].start_iso == "2026-10-18T09:00:00Z"
+    assert items[1].end_iso == "2026-10-18T16:30:00Z"
+
+
+def test_dedupe():
+    # Clockify may return fractional seconds or an offset
+    entry = ExistingEntry.from_api(
+        {
+            "id": "e1",
+            "description": "Daily Standup",
+            "timeInterval": {"start": "2026-10-18T09:00:00.000+02:00", "end": None},
+        }
+    )
+    existing = {entry.signature}
+    assert existing == {("2026-10-18T07:00:00Z", "Daily Standup")}
+    items = list(pipeline.dedupe(build_items(), lambda: existing))
+    assert [item.type for item in items] == ["issue"]
+
+
+def test_match_chunks_and_prefetch():
+    matcher = FakeMatcher()
+    items = [
+        TimeItem(f"item_{i}", f"test:{i}", "event", str(i), NOW, NOW) for i in range(5)
+    ]
+    matched = list(pipeline.prefetch(pipeline.match(items, matcher, [], 2), 1))
+    assert matcher.calls == 3
+    assert sorted(item.id for item, _ in matched) == [item.id for item in items]
+    # Skipped items come out unmatched
+    assert [item.id for item, m in matched if m is None] == [
+        "item_1",
+        "item_3",
+        "item_4",
+    ]
+
+
+def test_prefetch_stops_when_consumer_stops():
+    producer_closed = threading.Event()
+
+    def endless():
+        try:
+            for i in itertools.count():
+                yield i
+        finally:
+            producer_closed.set()
+
+    before = threading.active_count()
+    stage = pipeline.prefetch(endless(), maxsize=2)
+    assert next(stage) == 0
+    # The consumer gives up (e.g. the sink raised) while the queue is full
+    stage.close()
+    assert producer_closed.wait(timeout=2)
+    deadline = time.monotonic() + 2
+    while threading.active_count() > before and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert threading.active_count() == before
+
+
+if __name__ == "__main__":
+    test_normalize()
+    test_dedupe()
+    test_match_chunks_and_prefetch()
+    test_prefetch_stops_when_consumer_stops()
+    print("Pipeline tests passed.")
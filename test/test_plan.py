@@ -0,0 +1,55 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import tempfile
+from src.plan import plan_sink, read_plan
+from helpers import catalog, item
+
+matched = [
+    (
+        item(0, "Daily Standup", key="event:abc123"),
+        {"project_id": "proj_1", "task_id": "task_1c", "reasoning": "Standup"},
+    ),
+    (
+        item(
+            0,
+            "#650 Something unrelated",
+            "2026-10-18T09:00:00Z",
+            "2026-10-18T16:30:00Z",
+            type="issue",
+            key="issue:org/repo#650:2026-10-18",
+        ),
+        None,
+    ),
+]
+
+
+def test_plan_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "plan.json")
+        summary = plan_sink(iter(matched), path, catalog)
+        assert summary == {"items": 2, "matched": 1}
+
+        with open(path) as f:
+            assert json.load(f)["version"] == 1
+
+        items, matches, planned = read_plan(path)
+        assert [i.key for i in items] == [m[0].key for m in matched]
+        assert items[0].start_iso == "2026-10-18T07:00:00Z"
+        assert matches["event:abc123"]["task_id"] == "task_1c"
+        assert matches["issue:org/repo#650:2026-10-18"]["task_id"] is None
+        assert planned.to_list() == [
+            {
+                "id": "proj_1",
+                "name": "DevOps",
+                "tasks": [{"id": "task_1c", "name": "Meetings"}],
+            }
+        ]
+
+
+if __name__ == "__main__":
+    test_plan_round_trip()
+    print("Plan tests passed.")
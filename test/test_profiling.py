@@ -0,0 +1,41 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import tempfile
+import time
+from src.profiling import PhaseProfiler
+
+
+def source():
+    for i in range(3):
+        time.sleep(0.02)
+        yield i
+
+
+def test_nested_phases_are_exclusive():
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler = PhaseProfiler(tmp)
+        doubled = (i * 2 for i in profiler.wrap(source(), "calendar"))
+        with profiler.phase("writes"):
+            assert list(profiler.wrap(doubled, "matching")) == [0, 2, 4]
+
+        phases = profiler.phases
+        assert phases["calendar"]["calls"] == 4
+        # The sleeps are accounted to the source, not to the stages pulling it
+        assert phases["calendar"]["seconds"] >= 0.06
+        assert phases["matching"]["seconds"] < 0.03
+        assert phases["writes"]["seconds"] < 0.03
+
+        path = profiler.report()
+        with open(path) as f:
+            text = f.read()
+        assert "calendar" in text and "hottest functions" in text
+        for name in ("calendar", "matching", "writes", "run"):
+            assert os.path.exists(os.path.join(tmp, f"{name}.prof"))
+
+
+if __name__ == "__main__":
+    test_nested_phases_are_exclusive()
+    print("ok")
@@ -0,0 +1,282 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import contextlib
+import tempfile
+import threading
+import requests
+from types import SimpleNamespace
+from src import pipeline
+from src.calendar_client import CalendarClient
+from src.journal import Journal
+from src.reconcile import diff, reconcile_sink
+from helpers import catalog, item
+
+
+class FakeMatcher:
+    def __init__(self):
+        self.items = []
+
+    def iter_match_tasks(self, items, catalog):
+        self.items.extend(items)
+        for i in items:
+            yield i.id, {"project_id": "proj_1", "task_id": "task_1a"}
+
+
+class FakeClockify:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.created = []
+        self.updated = []
+        self.deleted = []
+        self.update_status = None
+
+    def add_time_entry(self, description, start_time, end_time, project_id, task_id):
+        with self.lock:
+            self.created.append(description)
+            return {"id": f"new_{len(self.created)}"}
+
+    def update_time_entry(self, entry_id, **fields):
+        if self.update_status:
+            response = SimpleNamespace(status_code=self.update_status)
+            raise requests.exceptions.HTTPError("update failed", response=response)
+        with self.lock:
+            self.updated.append((entry_id, fields["start_time"], fields["task_id"]))
+            return {"id": entry_id}
+
+    def delete_time_entries(self, entry_ids):
+        self.deleted.extend(entry_ids)
+        return []
+
+
+def synced(journal, item, project_id, task_id, entry_id):
+    journal.plan(item, project_id, task_id)
+    journal.confirm(item.key, entry_id)
+
+
+def test_reconcile_applies_minimal_diff():
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = Journal(os.path.join(tmp, "journal.jsonl"))
+        standup = item("a", "Standup", "2026-10-18T07:00:00Z", "2026-10-18T07:15:00Z")
+        review = item("b", "Review", "2026-10-18T10:00:00Z", "2026-10-18T11:00:00Z")
+        cancelled = item("c", "Demo", "2026-10-18T13:00:00Z", "2026-10-18T14:00:00Z")
+        old_issue = item(
+            1,
+            "#1 Fix",
+            "2026-10-18T09:00:00Z",
+            "2026-10-18T10:00:00Z",
+            type="issue",
+            key="issue:o/r#1:2026-10-18",
+        )
+        for i, entry in enumerate([standup, review, cancelled, old_issue]):
+            synced(journal, entry, "proj_1", "task_1c", f"id_{i}")
+
+        # Review moved an hour later, Demo cancelled, a new Retro, issue not re-read
+        desired = [
+            standup,
+            item("b", "Review", "2026-10-18T11:00:00Z", "2026-10-18T12:00:00Z"),
+            item("d", "Retro", "2026-10-18T15:00:00Z", "2026-10-18T16:00:00Z"),
+        ]
+        changes = diff(
+            desired, journal.confirmed(), "2026-10-18T00:00:00Z", "2026-10-19T00:00:00Z"
+        )
+        assert changes["unchanged"] == 1
+        assert [i.key for i in changes["create"]] == ["event:d"]
+        assert [i.key for i, _ in changes["update"]] == ["event:b"]
+        assert [r["k"] for r in changes["delete"]] == ["event:c"]
+
+        matcher = FakeMatcher()
+        clockify = FakeClockify()
+        phases = []
+
+        def phase(name):
+            phases.append(name)
+            return contextlib.nullcontext()
+
+        summary = reconcile_sink(
+            changes,
+            clockify,
+            matcher,
+            catalog,
+            journal,
+            lambda: set(),
+            concurrency=2,
+            phase=phase,
+        )
+        # Each step can be profiled
+        assert phases == ["existing entries", "matching", "writes"]
+        assert summary == {
+            "created": 1,
+            "updated": 1,
+            "deleted": 1,
+            "unchanged": 1,
+            "failed": 0,
+        }
+        # Only the new item was matched; the moved one keeps its task
+        assert [i.key for i in matcher.items] == ["event:d"]
+        assert clockify.created == ["Retro"]
+        assert clockify.updated == [("id_1", "2026-10-18T11:00:00Z", "task_1c")]
+        assert clockify.deleted == ["id_2"]
+
+        # Running it again changes nothing
+        changes = diff(
+            desired, journal.confirmed(), "2026-10-18T00:00:00Z", "2026-10-19T00:00:00Z"
+        )
+        assert changes["unchanged"] == 3
+        assert not (changes["create"] or changes["update"] or changes["delete"])
+        journal.close()
+
+
+def test_sync_updates_moved_meeting_so_reconcile_can_delete_it():
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = Journal(os.path.join(tmp, "journal.jsonl"))
+        clockify = FakeClockify()
+        match = {"project_id": "proj_1", "task_id": "task_1c"}
+        standup = item("a", "Standup", "2026-10-18T07:00:00Z", "2026-10-18T07:15:00Z")
+        pipeline.clockify_sink([(standup, match)], clockify, catalog, journal=journal)
+        assert clockify.created == ["Standup"]
+
+        # The daemon syncs again after the meeting moved: same entry, updated
+        moved = item("a", "Standup", "2026-10-18T09:00:00Z", "2026-10-18T09:15:00Z")
+        summary = pipeline.clockify_sink(
+            [(moved, match)], clockify, catalog, journal=journal
+        )
+        assert summary["written"] == 1
+        assert clockify.created == ["Standup"]
+        assert clockify.updated == [("new_1", "2026-10-18T09:00:00Z", "task_1c")]
+        assert journal.entry_id("event:a") == "new_1"
+
+        # Once cancelled, reconcile still knows the entry and deletes it
+        changes = diff(
+            [], journal.confirmed(), "2026-10-18T00:00:00Z", "2026-10-19T00:00:00Z"
+        )
+        reconcile_sink(
+            changes, clockify, FakeMatcher(), catalog, journal, lambda: set()
+        )
+        assert clockify.deleted == ["new_1"]
+        journal.close()
+
+
+def test_failed_update_keeps_the_entry():
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = Journal(os.path.join(tmp, "journal.jsonl"))
+        clockify = FakeClockify()
+        match = {"project_id": "proj_1", "task_id": "task_1c"}
+        standup = item("a", "Standup", "2026-10-18T07:00:00Z", "2026-10-18T07:15:00Z")
+        pipeline.clockify_sink([(standup, match)], clockify, catalog, journal=journal)
+
+        # A server error on the update leaves the old entry known...
+        moved = item("a", "Standup", "2026-10-18T09:00:00Z", "2026-10-18T09:15:00Z")
+        clockify.update_status = 500
+        summary = pipeline.clockify_sink(
+            [(moved, match)], clockify, catalog, journal=journal
+        )
+        assert summary["failed"] == 1
+        assert journal.entry_id("event:a") == "new_1"
+        assert not journal.is_synced(moved)
+        assert journal.unconfirmed() == []
+
+        # ...so the next run updates it instead of creating a second one
+        clockify.update_status = None
+        pipeline.clockify_sink([(moved, match)], clockify, catalog, journal=journal)
+        assert clockify.created == ["Standup"]
+        assert clockify.updated == [("new_1", "2026-10-18T09:00:00Z", "task_1c")]
+
+        # An entry deleted in Clockify is created again
+        clockify.update_status = 404
+        pipeline.clockify_sink([(standup, match)], clockify, catalog, journal=journal)
+        assert clockify.created == ["Standup", "Standup"]
+        assert journal.entry_id("event:a") == "new_2"
+        journal.close()
+
+
+class PagedEvents:
+    """Stand-in for the Calendar API's events() serving `per_page` events a page."""
+
+    def __init__(self, events, per_page):
+        self.events = events
+        self.per_page = per_page
+        self.tokens = []
+
+    def events_(self):
+        return self
+
+    def list(self, pageToken=None, **params):
+        self.tokens.append(pageToken)
+        start = int(pageToken or 0)
+        page = {"items": self.events[start : start + self.per_page]}
+        if start + self.per_page < len(self.events):
+            page["nextPageToken"] = str(start + self.per_page)
+        return SimpleNamespace(execute=lambda: page)
+
+
+def api_event(i):
+    return {
+        "id": f"e{i}",
+        "summary": f"Meeting {i}",
+        "start": {"dateTime": f"2026-10-18T{8 + i // 60:02d}:{i % 60:02d}:00Z"},
+        "end": {"dateTime": f"2026-10-18T{8 + i // 60:02d}:{i % 60:02d}:30Z"},
+    }
+
+
+def test_calendar_is_read_in_full_before_deleting():
+    api = PagedEvents([api_event(i) for i in range(5)], per_page=2)
+    client = CalendarClient()
+    client.service = SimpleNamespace(events=api.events_)
+    events = client.get_events("2026-10-18T00:00:00Z", "2026-10-19T00:00:00Z")
+    assert [e["id"] for e in events] == ["e0", "e1", "e2", "e3", "e4"]
+    assert api.tokens == [None, "2", "4"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = Journal(os.path.join(tmp, "journal.jsonl"))
+        stats = {}
+        items = list(
+            pipeline.normalize_events(
+                pipeline.calendar_source(
+                    client, "2026-10-18T00:00:00Z", "2026-10-19T00:00:00Z"
+                ),
+                stats,
+            )
+        )
+        for i, entry in enumerate(items):
+            synced(journal, entry, "proj_1", "task_1c", f"id_{i}")
+        # Events past the first page are still there, so nothing is deleted
+        changes = diff(
+            items, journal.confirmed(), "2026-10-18T00:00:00Z", "2026-10-19T00:00:00Z"
+        )
+        assert changes["unchanged"] == 5 and not changes["delete"]
+
+        # An event that can't be parsed makes the fetch incomplete
+        api.events[3] = dict(api.events[3], start={"dateTime": "not a date"})
+        stats = {}
+        items = list(
+            pipeline.normalize_events(
+                pipeline.calendar_source(
+                    client,
+                    "2026-10-18T00:00:00Z",
+                    "2026-10-19T00:00:00Z",
+                    stats=stats,
+                ),
+                stats,
+            )
+        )
+        assert stats["calendar_incomplete"]
+        changes = diff(
+            items,
+            journal.confirmed(),
+            "2026-10-18T00:00:00Z",
+            "2026-10-19T00:00:00Z",
+            allow_delete=not stats.get("calendar_incomplete"),
+        )
+        assert not changes["delete"]
+        journal.close()
+
+
+if __name__ == "__main__":
+    test_reconcile_applies_minimal_diff()
+    test_sync_updates_moved_meeting_so_reconcile_can_delete_it()
+    test_failed_update_keeps_the_entry()
+    test_calendar_is_read_in_full_before_deleting()
+    print("ok")
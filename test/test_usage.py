@@ -0,0 +1,88 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import json
+import tempfile
+from types import SimpleNamespace
+from src.ai_matcher import AIMatcher
+from src.usage import Usage, estimate_cost, parse_prices, read_ledger, summarize
+from helpers import catalog, item
+
+
+class PricedChatAPI:
+    """Stand-in for chat completions that reports token usage."""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, **kwargs):
+        self.calls += 1
+        usage = SimpleNamespace(
+            prompt_tokens=1_000_000,
+            completion_tokens=100_000,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=0),
+        )
+        content = json.dumps({"evt_0": {"projectId": "proj_1", "taskId": "task_1a"}})
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=usage,
+        )
+
+
+def test_estimate_cost():
+    assert estimate_cost("gpt-4o", 1_000_000, 0) == 2.50
+    # The longest price prefix wins, so mini is not priced as gpt-4o
+    assert estimate_cost("gpt-4o-mini-2024-07-18", 1_000_000, 1_000_000) == 0.75
+    assert estimate_cost("gpt-4o", 1_000_000, 0, cached_tokens=1_000_000) == 1.25
+    assert estimate_cost("gpt-4o", 1_000_000, 0, batch=True) == 1.25
+    assert estimate_cost("local-model", 1_000_000, 1_000_000) == 0.0
+    prices = parse_prices("local-model=1/0.5/2, o4-mini=1.10/0.275/4.40")
+    assert prices["o4-mini"] == (1.10, 0.275, 4.40)
+    assert estimate_cost("local-model", 1_000_000, 1_000_000, prices=prices) == 3.0
+
+    # Extra prices make budgets work for other models
+    usage = Usage(run_budget=2.0, prices=prices)
+    usage.record("local-model", {"prompt_tokens": 1_000_000})
+    assert not usage.exhausted()
+    usage.record("local-model", {"prompt_tokens": 1_000_000})
+    assert usage.exhausted()
+
+
+def test_budget_falls_back_to_rules():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "usage.jsonl")
+        usage = Usage(path=path, user="alice", run_budget=3.0)
+        matcher = AIMatcher(api_key="test", usage=usage)
+        matcher.client = PricedChatAPI()
+
+        # 1M prompt + 100k completion tokens of gpt-4o cost $3.50
+        first = matcher.batch_match_tasks([item(0, "Anything")], catalog)
+        assert first["evt_0"]["task_id"] == "task_1a"
+        assert round(usage.run["cost"], 2) == 3.50
+        assert usage.exhausted()
+
+        items = [
+            item(1, "Daily Standup"),
+            item(2, "Upgrade the cluster"),
+            item(3, "#12 Fix login", type="issue"),
+        ]
+        matches = matcher.batch_match_tasks(items, catalog)
+        assert matcher.client.calls == 1
+        assert matches["evt_1"]["task_id"] == "task_1c"
+        assert matches["evt_2"]["task_id"] == "task_1a"
+        assert matches["iss_3"]["task_id"] == "task_1b"
+
+        # Today's spend is per user and survives restarts
+        assert round(Usage(path=path, user="alice").day_cost, 2) == 3.50
+        assert Usage(path=path, user="bob").day_cost == 0.0
+        totals = summarize(read_ledger(path))
+        assert [key[1:] for key in totals] == [("alice", "gpt-4o")]
+
+
+if __name__ == "__main__":
+    test_estimate_cost()
+    test_budget_falls_back_to_rules()
+    print("ok")